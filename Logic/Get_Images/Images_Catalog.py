@@ -0,0 +1,133 @@
+import os
+import heapq
+import random
+import sqlite3
+from contextlib import closing
+from typing import Dict, List
+from Logic.Tools import params
+
+
+"""
+Catalog of the images of each theme (clean_data/<Theme>) for the selection of the images of the videos.
+
+The theme folders rarely change, but every video listed its whole folder to choose 30 images.
+The catalog (images_catalog.sqlite in the cache folder, shared by all the influencers and production processes) keeps:
+    - The eligible images of each theme folder, and the modification time of the folder when it was scanned
+        (a folder is only listed again if an image was added, removed or renamed: its modification time changed)
+    - How many videos used each image: the least used images are preferred, so the videos have more variety
+
+Functions:
+    - connect_images_catalog: Opens the catalog, creating it the first time.
+    - catalog_images: Eligible images of a theme folder with their number of uses (scanning the folder only if it changed).
+    - select_images: Chooses images of a theme folder preferring the least used ones, and counts the new uses.
+"""
+
+
+CATALOG_FILE = os.path.join(params.CACHE_FOLDER, "images_catalog.sqlite")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg")
+USAGE_WEIGHT_POWER = 2  # Weight of an image: 1 / (1 + uses above the least used image) ** power
+
+
+
+
+def connect_images_catalog() -> sqlite3.Connection:
+    """
+    Opens the catalog of images, creating it the first time.
+
+    Returns:
+        sqlite3.Connection: Connection to the catalog.
+    """
+    os.makedirs(params.CACHE_FOLDER, exist_ok=True)
+
+    connection = sqlite3.connect(CATALOG_FILE, timeout=30)  # Several production processes can select images at the same time
+    with connection:
+        connection.execute("""CREATE TABLE IF NOT EXISTS themes (
+                                  folder TEXT PRIMARY KEY,
+                                  mtime INTEGER NOT NULL)""")
+        connection.execute("""CREATE TABLE IF NOT EXISTS images (
+                                  folder TEXT NOT NULL,
+                                  file TEXT NOT NULL,
+                                  uses INTEGER NOT NULL DEFAULT 0,
+                                  PRIMARY KEY (folder, file))""")
+
+    return connection
+
+
+
+
+
+def scan_theme_folder(connection: sqlite3.Connection, folder: os.path, folder_mtime: int) -> None:
+    """
+    Lists a theme folder and updates its images in the catalog (single transaction).
+    The uses of the images that still exist are kept, new images start with 0 uses.
+    """
+    files = [entry.name for entry in os.scandir(folder) if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()]
+
+    with connection:
+        cataloged = {file for (file,) in connection.execute("SELECT file FROM images WHERE folder = ?", (folder,))}
+        connection.executemany("DELETE FROM images WHERE folder = ? AND file = ?", [(folder, file) for file in cataloged.difference(files)])
+        connection.executemany("INSERT INTO images (folder, file) VALUES (?, ?)", [(folder, file) for file in set(files).difference(cataloged)])
+        connection.execute("INSERT OR REPLACE INTO themes (folder, mtime) VALUES (?, ?)", (folder, folder_mtime))
+
+    print(f"\n🗂️ Catalog of images updated: {len(files)} images in {folder}")
+
+
+
+
+
+def catalog_images(connection: sqlite3.Connection, theme_folder: os.path) -> Dict[str, int]:
+    """
+    Eligible images of a theme folder with their number of uses.
+    The folder is only listed if it changed since the last time (or if it was never cataloged).
+
+    Args:
+        connection (sqlite3.Connection): Connection to the catalog.
+        theme_folder (str): Path of the theme folder (ex: clean_data/Lion).
+
+    Returns:
+        Dict[str, int]: {file name: number of videos that used it}
+    """
+    folder = os.path.abspath(theme_folder)
+    folder_mtime = os.stat(folder).st_mtime_ns  # Raises FileNotFoundError like os.listdir if the theme does not exist
+
+    row = connection.execute("SELECT mtime FROM themes WHERE folder = ?", (folder,)).fetchone()
+    if row is None or row[0] != folder_mtime:
+        scan_theme_folder(connection, folder, folder_mtime)
+
+    return dict(connection.execute("SELECT file, uses FROM images WHERE folder = ?", (folder,)))
+
+
+
+
+
+def select_images(theme_folder: os.path, number_of_images: int) -> List[str]:
+    """
+    Chooses images of a theme folder at random, preferring the ones used in fewer videos, and counts the new uses.
+    Weighted sampling without replacement (each image gets the key random ** (1 / weight), the biggest keys are chosen).
+
+    Args:
+        theme_folder (str): Path of the theme folder (ex: clean_data/Lion).
+        number_of_images (int): Number of images to choose (all of them if the folder has fewer).
+
+    Returns:
+        List[str]: Names of the chosen images, in random order.
+    """
+    folder = os.path.abspath(theme_folder)
+
+    with closing(connect_images_catalog()) as connection:
+        images = catalog_images(connection, folder)
+        if not images:
+            return []
+
+        least_uses = min(images.values())
+        chosen = heapq.nlargest(
+            number_of_images,
+            images,
+            key=lambda file: random.random() ** ((1 + images[file] - least_uses) ** USAGE_WEIGHT_POWER)
+        )
+
+        with connection:
+            connection.executemany("UPDATE images SET uses = uses + 1 WHERE folder = ? AND file = ?", [(folder, file) for file in chosen])
+
+    random.shuffle(chosen)  # The least used images would come first
+    return chosen
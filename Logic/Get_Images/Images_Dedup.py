@@ -0,0 +1,209 @@
+import os
+import glob
+import shutil
+import threading
+from typing import List, Optional, Tuple
+
+from Logic.Get_Images.Images_Index import load_images_index, save_images_index, update_images_index, image_entry, hamming_distance, index_lock
+
+
+"""
+Removal of near-duplicate images (the same photo returned by several pages or several runs of the downloads).
+
+Images are compared by their perceptual hash (Images_Index.py), stored in a BK-tree:
+    - Finding the images at less than N bits of a hash only visits a small part of the tree (no comparison of every pair of images)
+
+Functions:
+    - BKTree: Tree of hashes to find the similar ones.
+    - DuplicateFilter: Thread-safe filter used while downloading: rejects an image if a similar one was already kept.
+    - download_duplicate_filter: Filter for a new download, with the images of the previous downloads of the same query.
+    - dedup_folder: Moves the near-duplicates of a folder (ex: clean_data/<Theme>) to its "duplicates" subfolder.
+"""
+
+
+DUPLICATE_DISTANCE = 6  # Maximum number of different bits (of 64) to consider two images the same photo
+
+
+
+
+class BKTree:
+    """
+    BK-tree of hashes with the Hamming distance: each child is stored under its distance to the parent,
+    so a search only follows the branches that can contain hashes within the maximum distance (triangle inequality).
+    """
+
+    def __init__(self) -> None:
+        self.root = None  # (hash, value, {distance: child})
+        self.size = 0
+
+
+    def add(self, item_hash: int, value: str) -> None:
+        """
+        Adds a hash with its value (ex: the name of the image).
+        """
+        self.size += 1
+        if self.root is None:
+            self.root = (item_hash, value, {})
+            return
+
+        node = self.root
+        while True:
+            distance = hamming_distance(item_hash, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (item_hash, value, {})
+                return
+            node = child
+
+
+    def search(self, item_hash: int, max_distance: int) -> List[Tuple[int, str]]:
+        """
+        Finds the values whose hash is at max_distance bits or less.
+
+        Returns:
+            List[Tuple[int, str]]: (distance, value) of each similar hash, from the most similar.
+        """
+        if self.root is None:
+            return []
+
+        found = []
+        pending = [self.root]
+        while pending:
+            node_hash, value, children = pending.pop()
+            distance = hamming_distance(item_hash, node_hash)
+            if distance <= max_distance:
+                found.append((distance, value))
+
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+
+        return sorted(found)
+
+
+
+
+class DuplicateFilter:
+    """
+    Filter of near-duplicates shared by the download threads.
+    """
+
+    def __init__(self, max_distance: int = DUPLICATE_DISTANCE) -> None:
+        self.tree = BKTree()
+        self.max_distance = max_distance
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+
+    def add_if_new(self, item_hash: int, value: str) -> Optional[str]:
+        """
+        Adds the hash if there is no similar one (check and add are atomic).
+
+        Returns:
+            Optional[str]: Value of the similar image already kept, None if the image is new.
+        """
+        with self.lock:
+            similar = self.tree.search(item_hash, self.max_distance)
+            if similar:
+                self.rejected += 1
+                return similar[0][1]
+            self.tree.add(item_hash, value)
+            return None
+
+
+
+
+def download_duplicate_filter(download_folder: os.path, query: str, max_distance: int = DUPLICATE_DISTANCE) -> DuplicateFilter:
+    """
+    Creates the filter for a new download (raw_data/<query>_<ts>), with the images of the previous downloads
+    of the same query (raw_data/<query>_*, including their "extra" subfolders). Their hashes come from their indexes.
+
+    Args:
+        download_folder (str): Folder of the new download.
+        query (str): Image search query.
+        max_distance (int): Maximum number of different bits to consider two images the same photo.
+
+    Returns:
+        DuplicateFilter: Filter with the images already downloaded.
+    """
+    duplicate_filter = DuplicateFilter(max_distance)
+    raw_data_folder = os.path.dirname(os.path.abspath(download_folder))
+
+    previous_folders = glob.glob(os.path.join(glob.escape(raw_data_folder), f"{glob.escape(query)}_*"))
+    previous_folders += [os.path.join(folder, "extra") for folder in previous_folders]
+
+    for folder in previous_folders:
+        if not os.path.isdir(folder):
+            continue
+        for file, entry in update_images_index(folder, with_hash="YES").items():
+            duplicate_filter.add_if_new(int(entry["phash"], 16), os.path.join(folder, file))
+
+    print(f"\n🔎 {duplicate_filter.tree.size} images of previous downloads of {query} will not be downloaded again")
+    return duplicate_filter
+
+
+
+
+
+def reject_if_duplicate(path: os.path, duplicate_filter: DuplicateFilter) -> Optional[str]:
+    """
+    Checks a new downloaded image against the filter: deletes it if it is a near-duplicate,
+        or saves its entry in the index of its folder if it is new.
+
+    Args:
+        path (str): Path of the downloaded image.
+        duplicate_filter (DuplicateFilter): Filter of the download.
+
+    Returns:
+        Optional[str]: Path of the similar image already kept, None if the image was kept.
+    """
+    entry = image_entry(path, with_hash="YES")
+    duplicate = duplicate_filter.add_if_new(int(entry["phash"], 16), path)
+
+    if duplicate:
+        os.remove(path)
+        return duplicate
+
+    folder, file = os.path.split(path)
+    with index_lock:  # The entry is saved now, so the hash is not calculated again later
+        index = load_images_index(folder)
+        index[file] = entry
+        save_images_index(folder, index)
+    return None
+
+
+
+
+
+def dedup_folder(folder: os.path, max_distance: int = DUPLICATE_DISTANCE) -> List[str]:
+    """
+    Moves the near-duplicates of a folder (ex: clean_data/<Theme>) to its "duplicates" subfolder.
+    Of each group of similar images, the biggest file (usually the best quality) is kept.
+
+    Args:
+        folder (str): Folder with the images.
+        max_distance (int): Maximum number of different bits to consider two images the same photo.
+
+    Returns:
+        List[str]: Names of the images moved.
+    """
+    index = update_images_index(folder, with_hash="YES")
+    duplicates_folder = os.path.join(folder, "duplicates")
+
+    tree = BKTree()
+    moved = []
+    for file, entry in sorted(index.items(), key=lambda item: item[1]["bytes"], reverse=True):
+        item_hash = int(entry["phash"], 16)
+        similar = tree.search(item_hash, max_distance)
+
+        if similar:
+            os.makedirs(duplicates_folder, exist_ok=True)
+            shutil.move(os.path.join(folder, file), os.path.join(duplicates_folder, file))  # Moved, not deleted: they can be checked
+            moved.append(file)
+            print(f"♻️ {file} is a duplicate of {similar[0][1]} ({similar[0][0]} bits of difference)")
+        else:
+            tree.add(item_hash, file)
+
+    update_images_index(folder)  # Remove the moved images from the index
+    print(f"\n✅ {len(moved)} duplicates moved to {duplicates_folder}\n")
+    return moved
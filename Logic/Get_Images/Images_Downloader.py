@@ -1,27 +1,44 @@
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
+from urllib3.util.retry import Retry
 from PIL import Image
-from io import BytesIO
 import time
 import os
 from datetime import datetime
-import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 from Logic.Tools import params
 
 
 import threading
-import time
 
-from pyunsplash import PyUnsplash
 import pixabay.core
 from Logic.Tools.Shuffle_pics import sort_by_aspect
+from Logic.Get_Images.Images_Dedup import DuplicateFilter, download_duplicate_filter, reject_if_duplicate
 
 
 
 """
 Script to download images based on a query using multiple APIs (Pexels and Unsplash).
 
+Downloads are concurrent:
+    - A single requests.Session with a pool of connections is shared by all the downloads (no new connection per image)
+    - The images are downloaded by a pool of threads (DOWNLOAD_WORKERS) while the APIs are still being searched
+    - Each provider has token buckets: one for its API (tuned to its published quota) and one for the files of its CDN
+    - Rate limits (429) and server errors are retried by the session with exponential backoff;
+      if a search of an API still fails after the retries, the error is raised by pexels_download_manager (not lost in its thread)
+
+Images are streamed to disk:
+    - The original bytes are written in chunks (the image is never decoded and encoded again, no quality lost)
+    - Only the header is read to validate the image (format and dimensions), and the size is checked against Content-Length
+    - Images are only decoded to resize them if a maximum resolution is set (params.IMAGES_MAX_SIZE), or to convert them if they are not JPEG
+
+Near-duplicates are rejected while downloading (Images_Dedup):
+    - The perceptual hash of each new image is compared with the images already kept in this download and in the previous downloads of the same query
+    - The hashes are saved in the index of each folder (Images_Index), so they are calculated only once
+
 Functions:
 
 1. pexels_download_manager:
@@ -39,67 +56,172 @@ Functions:
 4. download_from_Unsplash:
     - Downloads images from the Unsplash API based on a search query.
     - Saves images in a specified folder.
+
+5. TokenBucket / create_session:
+    - Rate limiter shared by the threads of a provider, and session with a pool of connections and retries.
+
+6. validate_image:
+    - Checks the header of a downloaded image and resizes it only if it is bigger than the maximum resolution.
 """
 
 
+# Requests allowed to each API: (requests, seconds) from their published quotas
+API_QUOTAS = {
+    "pexels": (200, 3600),  # 200 requests per hour
+    "unsplash": (50, 3600),  # 50 requests per hour (demo applications)
+}
+# The image files are served by CDNs that do not count against the API quotas: only a polite limit
+CDN_QUOTAS = {
+    "pexels": (10, 1),
+    "unsplash": (10, 1),
+}
+DOWNLOAD_WORKERS = 16  # Images downloaded at the same time (and connections kept in the pool)
+REQUEST_TIMEOUT = 30  # Seconds
+CHUNK_SIZE = 64 * 1024  # Bytes written to disk each time
+
+# Maximum resolution of the images (width x height of a vertical image), None to keep the original resolution
+IMAGES_MAX_SIZE = tuple(int(side) for side in params.IMAGES_MAX_SIZE.lower().split("x")) if params.IMAGES_MAX_SIZE else None
+
+
+
+
+class TokenBucket:
+    """
+    Token bucket shared by several threads: allows bursts of up to `capacity` requests
+    and then `requests` every `seconds`.
+    """
+
+    def __init__(self, requests: int, seconds: float, capacity: Optional[int] = None) -> None:
+        self.rate = requests / seconds
+        self.capacity = capacity or requests
+        self.tokens = float(self.capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+
+    def acquire(self) -> None:
+        """
+        Takes a token, waiting until there is one available.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_time)  # Wait outside the lock so other threads can refill and check
+
+
+
+
+api_buckets = {provider: TokenBucket(*quota) for provider, quota in API_QUOTAS.items()}
+cdn_buckets = {provider: TokenBucket(*quota) for provider, quota in CDN_QUOTAS.items()}
+
+
+
+
+def create_session() -> requests.Session:
+    """
+    Creates a session with a pool of connections for all the download threads,
+    retrying rate limits (429) and server errors with exponential backoff (respecting Retry-After).
+
+    :return: Session ready to be shared by the threads.
+    """
+    retries = Retry(total=5, backoff_factor=2, status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["GET"], respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=DOWNLOAD_WORKERS, max_retries=retries)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+
+
 def pexels_download_manager(query: str, download_folder: os.path, k: int) -> None:
     """
     Function to manage image downloads using multiple APIs:
     - Using the APIs of Pexels and Unsplash.
     - Images are stored in specific folders.
+    - Both APIs are searched at the same time, and their images are downloaded by a shared pool of threads.
 
     :param query: Image search query.
     :param download_folder: Folder where images will be saved.
     :param k: Number of pages of results to download.
     :return: None
+    :raises requests.HTTPError: If the search of an API failed (after the images already found are downloaded).
     """
 
     bonus_download_folder = os.path.join(download_folder, "extra")
     os.makedirs(bonus_download_folder, exist_ok=True)
 
-    try:
-        thread_Pexels = threading.Thread(target=download_from_Pexels, args=(query, download_folder, k))
-        thread_Pexels.start()
-    except Exception as e:
-        print(f"Error downloading {e}")
-
-    try:
-        thread_Unsplash = threading.Thread(target=download_from_Unsplash, args=(query, bonus_download_folder, k))
-        thread_Unsplash.start()
-    except Exception as e:
-        print(f"Error downloading {e}")
-
-    try:
-        thread_Pexels.join()
-    except Exception as e:
-        print(f"Error downloading {e}")
+    session = create_session()
+    duplicate_filter = download_duplicate_filter(download_folder, query)  # Shared by both providers
+    start = time.time()
 
     try:
-        thread_Unsplash.join()
-    except Exception as e:
-        print(f"Error downloading {e}")
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor, ThreadPoolExecutor(max_workers=2) as search_executor:
+            searches = [
+                search_executor.submit(download_from_Pexels, query, download_folder, k, session, executor, duplicate_filter),
+                search_executor.submit(download_from_Unsplash, query, bonus_download_folder, k, session, executor, duplicate_filter),
+            ]
+            for search in searches:
+                search.result()  # The error of a search is raised here
+            # Leaving the with block waits for the images still downloading
+    finally:
+        session.close()
+
+    print(f"\n✅ Downloads for {query} finished in {time.time() - start:.0f} seconds ({duplicate_filter.rejected} near-duplicates rejected)\n")
 
     sort_by_aspect(bonus_download_folder)
 
 
 
 
-def download_image(url: str, full_path: os.path) -> str:
+def download_image(url: str, full_path: os.path, session: Optional[requests.Session] = None, provider: str = "",
+                   max_size: Optional[Tuple[int, int]] = IMAGES_MAX_SIZE, duplicate_filter: Optional[DuplicateFilter] = None) -> str:
     """
     Function to download an image from a specific URL and save it in a given folder.
+    The bytes are streamed to a temporary file and the image only appears with its final name once it is complete and valid.
 
     :param url: URL of the image to download.
     :param full_path: Full path where the image will be saved.
+    :param session: Session with a pool of connections (a plain request is used if None).
+    :param provider: Name of the provider, to respect the rate limit of its CDN.
+    :param max_size: Maximum resolution (width, height of a vertical image). None to keep the original image.
+    :param duplicate_filter: Filter of near-duplicates of the download (the image is deleted if a similar one was already kept).
     :return: "stop" if the download should be stopped, None otherwise.
     """
+    temporary_path = f"{full_path}.part"
 
     try:
-        image_response = requests.get(url)
-        image_response.raise_for_status()  # This will raise an error if the status is not 200
+        if provider in cdn_buckets:
+            cdn_buckets[provider].acquire()
+
+        with (session or requests).get(url, stream=True, timeout=REQUEST_TIMEOUT) as image_response:
+            image_response.raise_for_status()  # This will raise an error if the status is not 200
+
+            written = 0
+            with open(temporary_path, "wb") as file:
+                for chunk in image_response.iter_content(chunk_size=CHUNK_SIZE):
+                    file.write(chunk)
+                    written += len(chunk)
+
+            expected = image_response.headers.get("Content-Length")
+            if expected and "Content-Encoding" not in image_response.headers and int(expected) != written:
+                raise IOError(f"incomplete download ({written} of {expected} bytes)")
+
+        validate_image(temporary_path, max_size)
+        os.replace(temporary_path, full_path)
 
-        image_data = BytesIO(image_response.content)
-        image = Image.open(image_data)
-        image.save(full_path)
+        if duplicate_filter and reject_if_duplicate(full_path, duplicate_filter):
+            return
 
     except HTTPError as e:  # Check if the status code is 404, and if so, DO NOT stop the script
         if e.response.status_code == 404:
@@ -111,18 +233,92 @@ def download_image(url: str, full_path: os.path) -> str:
     except Exception as e:  # Other errors (e.g., problems opening the image, errors saving the image)
         print(f"❌ Could not download the image. Error: {e}")
 
+    finally:
+        if os.path.exists(temporary_path):  # Never leave half downloaded images
+            os.remove(temporary_path)
+
+
+
+
+def validate_image(path: os.path, max_size: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+    """
+    Checks a downloaded image reading only its header (format and dimensions).
+    The image is only decoded and saved again if it is bigger than max_size or if it is not a JPEG.
+
+    :param path: Path of the image.
+    :param max_size: Maximum resolution (width, height of a vertical image; swapped for horizontal images). None to keep the original.
+    :return: Final (width, height) of the image.
+    """
+    with Image.open(path) as image:  # Lazy: only the header is read
+        width, height = image.size
+        image_format = image.format
+
+    if width <= 0 or height <= 0:
+        raise ValueError(f"invalid dimensions {width}x{height}")
 
+    box = None
+    if max_size:
+        box = max_size if height >= width else (max_size[1], max_size[0])  # Same orientation as the image
+        if width <= box[0] and height <= box[1]:
+            box = None
 
+    if image_format not in ("JPEG", "MPO") or box:
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+            if box:
+                image.thumbnail(box, Image.LANCZOS)
+            image.save(path, "JPEG", quality=95)
+            width, height = image.size
 
-def download_from_Pexels(query: str, download_folder: os.path, k: int) -> None:
+    return width, height
+
+
+
+
+def submit_downloads(executor: ThreadPoolExecutor, downloads: List[Tuple[str, os.path]], session: requests.Session,
+                     provider: str, stop_event: threading.Event, duplicate_filter: Optional[DuplicateFilter] = None) -> None:
+    """
+    Sends the images of a page to the pool of threads.
+    If one of them returns "stop" (HTTP error that is not a 404), the rest of the images of the provider are skipped.
+
+    :param executor: Pool of threads where the images are downloaded.
+    :param downloads: (url, full_path) of each image.
+    :param session: Session with a pool of connections.
+    :param provider: Name of the provider.
+    :param stop_event: Event set when the downloads of the provider must stop.
+    :param duplicate_filter: Filter of near-duplicates shared by the downloads (None to keep every image).
+    """
+    def download(url: str, full_path: os.path) -> None:
+        if stop_event.is_set():
+            return
+        if download_image(url, full_path, session, provider, duplicate_filter=duplicate_filter):
+            stop_event.set()
+
+    for url, full_path in downloads:
+        executor.submit(download, url, full_path)
+
+
+
+
+def download_from_Pexels(query: str, download_folder: os.path, k: int,
+                         session: Optional[requests.Session] = None, executor: Optional[ThreadPoolExecutor] = None,
+                         duplicate_filter: Optional[DuplicateFilter] = None) -> None:
     """
     Function to download images through the Pexels API.
 
     :param query: Image search query.
     :param download_folder: Folder where images will be saved.
     :param k: Number of pages of results to download.
+    :param session: Session with a pool of connections (a new one if None).
+    :param executor: Pool of threads for the images (a new one if None, waiting for all the images).
+    :param duplicate_filter: Filter of near-duplicates (None to keep every image).
     :return: None
     """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as new_executor:
+            return download_from_Pexels(query, download_folder, k, session or create_session(), new_executor, duplicate_filter)
+
+    session = session or create_session()
     num_results = 80  # maximum
     api_key = params.Pexels_key
 
@@ -131,61 +327,81 @@ def download_from_Pexels(query: str, download_folder: os.path, k: int) -> None:
     }
 
     linux_seconds = datetime.now().strftime("%s")
+    stop_event = threading.Event()
 
     for j in range(k):
-        qurl = f"https://api.pexels.com/v1/search?query={query}&page={j+1}&per_page={num_results}"
-        r = requests.get(qurl, headers=headers)
+        if stop_event.is_set():
+            break
+
+        api_buckets["pexels"].acquire()
+        search_parameters = {"query": query, "page": j + 1, "per_page": num_results}
+        r = session.get("https://api.pexels.com/v1/search", params=search_parameters, headers=headers, timeout=REQUEST_TIMEOUT)
+        r.raise_for_status()  # The session already retried rate limits (429) and server errors
         response = r.json()
         photo_list = response["photos"]
 
-        i = 1
-        for photo in photo_list:
+        downloads = []
+        for i, photo in enumerate(photo_list, start=1):
             source = photo["src"]
             vertical_link = source["portrait"]
             
             file_name = f"{query}_Pexels_{j}_{i}_{linux_seconds}.jpg"
-            full_path = os.path.join(download_folder, file_name)
+            downloads.append((vertical_link, os.path.join(download_folder, file_name)))
 
-            stop = download_image(vertical_link, full_path)
-            if stop:
-                break
-            i += 1
-            time.sleep(3)
+        submit_downloads(executor, downloads, session, "pexels", stop_event, duplicate_filter)
 
-    sys.exit("Pexels finished")
+    print("\nPexels search finished")
 
 
 
 
-def download_from_Unsplash(query: str, download_folder: os.path, k: int) -> None:
+def download_from_Unsplash(query: str, download_folder: os.path, k: int,
+                           session: Optional[requests.Session] = None, executor: Optional[ThreadPoolExecutor] = None,
+                           duplicate_filter: Optional[DuplicateFilter] = None) -> None:
     """
     Function to download images through the Unsplash API.
 
     :param query: Image search query.
     :param download_folder: Folder where images will be saved.
     :param k: Number of pages of results to download.
+    :param session: Session with a pool of connections (a new one if None).
+    :param executor: Pool of threads for the images (a new one if None, waiting for all the images).
+    :param duplicate_filter: Filter of near-duplicates (None to keep every image).
     :return: None
     """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as new_executor:
+            return download_from_Unsplash(query, download_folder, k, session or create_session(), new_executor, duplicate_filter)
 
-    pu = PyUnsplash(api_key=params.Unsplash_key)
+    session = session or create_session()
+    headers = {
+        "Authorization": f"Client-ID {params.Unsplash_key}",
+        "Accept-Version": "v1",
+    }
     linux_seconds = datetime.now().strftime("%s")
+    stop_event = threading.Event()
 
     for j in range(k + 1):
-        photos = pu.photos(type_='random', count=30, featured=True, query=query, orientation="portrait")
-        list_photos = photos.body
-
-        i = 1
-        for photo in list_photos:
+        if stop_event.is_set():
+            break
+
+        # Same request as PyUnsplash photos(type_='random', ...), through the shared session
+        api_buckets["unsplash"].acquire()
+        search_parameters = {"count": 30, "featured": "true", "query": query, "orientation": "portrait"}
+        r = session.get("https://api.unsplash.com/photos/random", params=search_parameters, headers=headers, timeout=REQUEST_TIMEOUT)
+        r.raise_for_status()  # The session already retried rate limits (429) and server errors
+        list_photos = r.json()
+
+        downloads = []
+        for i, photo in enumerate(list_photos, start=1):
             urls = photo["urls"]
             high_quality_link = urls["full"]
             file_name = f"{query}_Unsplash_{j}_{i}_{linux_seconds}.jpg"
-            full_path = os.path.join(download_folder, file_name)
+            downloads.append((high_quality_link, os.path.join(download_folder, file_name)))
+
+        submit_downloads(executor, downloads, session, "unsplash", stop_event, duplicate_filter)
 
-            stop = download_image(high_quality_link, full_path)
-            if stop:
-                break
-            i += 1
-            time.sleep(3)
+    print("\nUnsplash search finished")
 
 
 
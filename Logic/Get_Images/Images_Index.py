@@ -0,0 +1,280 @@
+import os
+import json
+import threading
+import numpy as np
+from PIL import Image
+from typing import Any, Dict, List
+
+
+"""
+Index of the images of a folder (hidden file .images_index.json inside the folder).
+
+Each image is analysed only once: its entry is kept while the file does not change (same size and modification time).
+    - {"image.jpg": {"bytes", "mtime", "width", "height", "aspect", "orientation", "exif_orientation", "phash"}, ...}
+    - width, height: read from the header of the file (the image is not decoded), as the image is shown (rotated by its EXIF orientation)
+    - aspect: height / width (the bigger, the more vertical), orientation: "vertical", "horizontal" or "square"
+    - phash: perceptual hash of 64 bits (hexadecimal), similar images have hashes that differ in few bits
+        Only calculated when the duplicates are searched (with_hash): it decodes the image, sorting or classifying images never needs it
+
+Functions:
+    - perceptual_hash: pHash of an image (DCT of the image reduced to 32x32 in grays).
+    - hamming_distance: Number of different bits between two hashes.
+    - load_images_index: Reads the index of a folder.
+    - save_images_index: Saves the index of a folder (atomic write).
+    - update_images_index: Adds the images that are not in the index (or changed) and removes the ones that do not exist.
+        With with_hash, it also adds the perceptual hash of the images that do not have it yet.
+    - images_with_orientation: Images of an index that can be used with an orientation (square images are valid for both).
+    - rename_indexed_images: Renames images keeping their entries in the index (nothing is analysed again).
+"""
+
+
+INDEX_FILE = ".images_index.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+HASH_SIZE = 8  # The hash has HASH_SIZE x HASH_SIZE bits
+HASH_IMAGE_SIZE = 32  # Size of the image used for the DCT
+ENTRY_FIELDS = ("bytes", "mtime", "width", "height", "aspect", "orientation", "exif_orientation")  # The phash is optional
+EXIF_ORIENTATION_TAG = 0x0112
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)  # EXIF orientations that turn the image 90 degrees: width and height are swapped
+
+index_lock = threading.Lock()  # Downloads of several threads can write the same index
+
+
+
+
+def dct_matrix(size: int) -> np.ndarray:
+    """
+    Orthonormal matrix of the DCT-II: dct(x) = M @ x.
+    """
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT_MATRIX = dct_matrix(HASH_IMAGE_SIZE)
+
+
+
+
+def perceptual_hash(path: os.path) -> int:
+    """
+    pHash of an image: the low frequencies of its DCT compared with their median.
+    Resizing, recompression or small changes of color keep the hash almost the same.
+
+    Args:
+        path (str): Path of the image.
+
+    Returns:
+        int: Hash of HASH_SIZE x HASH_SIZE bits.
+    """
+    with Image.open(path) as image:
+        return image_perceptual_hash(image)
+
+
+def image_perceptual_hash(image: Image.Image) -> int:
+    """
+    pHash of an image already opened (only the reduced version needed for the hash is decoded).
+    """
+    image.draft("L", (HASH_IMAGE_SIZE * 4, HASH_IMAGE_SIZE * 4))  # JPEGs are decoded directly at a reduced scale
+    pixels = np.asarray(image.convert("L").resize((HASH_IMAGE_SIZE, HASH_IMAGE_SIZE), Image.LANCZOS), dtype=np.float64)
+
+    frequencies = (DCT_MATRIX @ pixels @ DCT_MATRIX.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    bits = frequencies > np.median(frequencies)
+
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """
+    Number of different bits between two hashes (0 = identical images).
+    """
+    return bin(hash_a ^ hash_b).count("1")
+
+
+
+
+
+def load_images_index(folder: os.path) -> Dict[str, Dict[str, Any]]:
+    """
+    Reads the index of the images of a folder.
+
+    Args:
+        folder (str): Folder with the images.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: {file name: entry}, empty if the folder does not have an index.
+    """
+    index_path = os.path.join(folder, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return {}
+
+    try:
+        with open(index_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except ValueError:  # Damaged index: the images are analysed again
+        return {}
+
+
+
+
+
+def save_images_index(folder: os.path, index: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Saves the index of the images of a folder (temporary file and replace: never half written).
+
+    Args:
+        folder (str): Folder with the images.
+        index (Dict[str, Dict[str, Any]]): {file name: entry}.
+    """
+    index_path = os.path.join(folder, INDEX_FILE)
+    temporary_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump(index, file, indent=1)
+    os.replace(temporary_path, index_path)
+
+
+
+
+
+def same_file(entry: Dict[str, Any], path: os.path) -> bool:
+    """
+    Checks that an entry of the index was made from the current file (same size and modification time).
+    """
+    stat = os.stat(path)
+    return entry.get("bytes") == stat.st_size and entry.get("mtime") == stat.st_mtime
+
+
+def entry_is_valid(entry: Dict[str, Any], path: os.path, with_hash: str = "") -> bool:
+    """
+    Checks that an entry of the index still describes the file (same file, and every field, the phash too if with_hash).
+    """
+    fields = ENTRY_FIELDS + ("phash",) if with_hash else ENTRY_FIELDS
+    return same_file(entry, path) and all(field in entry for field in fields)
+
+
+def image_entry(path: os.path, with_hash: str = "") -> Dict[str, Any]:
+    """
+    Analyses an image: size, modification time, dimensions (from the header, rotated by the EXIF orientation)
+        and, only if with_hash, its perceptual hash (the only field that decodes the image).
+    """
+    stat = os.stat(path)
+    with Image.open(path) as image:  # Lazy: the size and the EXIF come from the header
+        width, height = image.size
+        if width <= 0 or height <= 0:
+            raise ValueError(f"invalid dimensions {width}x{height}")
+        exif_orientation = image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+        phash = image_perceptual_hash(image) if with_hash else None
+
+    if exif_orientation in ROTATED_ORIENTATIONS:
+        width, height = height, width
+
+    orientation = "vertical" if height > width else "horizontal" if width > height else "square"
+    entry = {
+        "bytes": stat.st_size,
+        "mtime": stat.st_mtime,
+        "width": width,
+        "height": height,
+        "aspect": round(height / width, 4),
+        "orientation": orientation,
+        "exif_orientation": exif_orientation,
+    }
+    if phash is not None:
+        entry["phash"] = format(phash, "016x")
+    return entry
+
+
+
+
+
+def update_images_index(folder: os.path, with_hash: str = "") -> Dict[str, Dict[str, Any]]:
+    """
+    Updates the index of a folder: analyses only the images that are new or changed,
+        and removes the entries of the images that do not exist anymore.
+
+    Args:
+        folder (str): Folder with the images (subfolders are not included).
+        with_hash (str, optional): If not empty, every entry gets its perceptual hash (to search duplicates).
+            The hash of an image is calculated only once: it is kept in the index for the next searches.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: {file name: entry} of every image of the folder.
+    """
+    with index_lock:
+        index = load_images_index(folder)
+        updated = {}
+        changed = False
+
+        for file in sorted(os.listdir(folder)):
+            path = os.path.join(folder, file)
+            if not file.lower().endswith(IMAGE_EXTENSIONS) or not os.path.isfile(path):
+                continue
+
+            entry = index.get(file)
+            if entry is None or not entry_is_valid(entry, path, with_hash):
+                try:
+                    if entry is not None and entry_is_valid(entry, path):  # Only the hash is missing
+                        entry = dict(entry, phash=format(perceptual_hash(path), "016x"))
+                    else:
+                        previous_hash = entry.get("phash") if entry is not None and same_file(entry, path) else None
+                        entry = image_entry(path, "" if previous_hash else with_hash)
+                        if previous_hash:  # Entries of older indexes: the hash of the same file is still valid
+                            entry["phash"] = previous_hash
+                except (IOError, ValueError) as e:  # Not a valid image
+                    print(f"⚠️ Skipping {file}: {e}")
+                    continue
+                changed = True
+            updated[file] = entry
+
+        if changed or len(updated) != len(index):
+            save_images_index(folder, updated)
+
+    return updated
+
+
+
+
+
+def images_with_orientation(index: Dict[str, Dict[str, Any]], orientation: str) -> List[str]:
+    """
+    Images of an index that can be used with an orientation (square images are valid for both).
+
+    Args:
+        index (Dict[str, Dict[str, Any]]): {file name: entry}.
+        orientation (str): "vertical" or "horizontal".
+
+    Returns:
+        List[str]: Names of the images.
+    """
+    return [file for file, entry in index.items() if entry["orientation"] in (orientation, "square")]
+
+
+
+
+
+def rename_indexed_images(folder: os.path, renames: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Renames images of a folder and their entries in the index.
+    A rename keeps the size and modification time of the file, so the images are not analysed again.
+
+    Args:
+        folder (str): Folder with the images.
+        renames (Dict[str, str]): {current name: new name}.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Index of the folder after the renames.
+    """
+    with index_lock:
+        index = load_images_index(folder)
+        entries = {old: index.pop(old, None) for old in renames}
+
+        for old, new in renames.items():
+            os.rename(os.path.join(folder, old), os.path.join(folder, new))
+            if entries[old] is not None:
+                index[new] = entries[old]
+
+        save_images_index(folder, index)
+
+    return index
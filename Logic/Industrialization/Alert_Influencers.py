@@ -6,7 +6,7 @@ from typing import Optional
 import time
 
 from Logic.Uploads.Telegram_Messages import send_telegram
-from Logic.Tools.Folders import select_multiple_folders
+from Logic.Tools.Folders_Index import count_indexed_folders
 
 
 """
@@ -68,15 +68,9 @@ def get_num_videos_ready() -> int:
         int: Number of videos ready to produce.
     """
     
-    video_list = select_multiple_folders([6])
-    
-    if video_list:
-        
-        num_videos_ready = len(video_list)
-        return num_videos_ready
-    
-    else:
-        return 0 
+    num_videos_ready = count_indexed_folders(os.path.join(os.getcwd(), "Outputs"), [6])  # Counted by the index, without listing the folders
+
+    return num_videos_ready
 
 
 
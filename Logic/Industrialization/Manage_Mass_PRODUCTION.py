@@ -1,17 +1,20 @@
 from Influencers.Manage_Influencers import video_production_influencers
-from Logic.Tools.Folders import select_multiple_folders, update_folder_status, set_folder_name, delete_state1_folders 
+from Logic.Tools.Folders import select_multiple_folders, update_folder_status, set_folder_name
+from Logic.Tools.Folders_Index import remove_indexed_folder
 import os
+import json
 import time
 import threading
 import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, List, Optional
 
+from Logic.Tools import params
 from Logic.Videos.Script_Logic import GPT_script_main
-from Logic.Videos.Video_Recording import video_editing_YT
-from Logic.Voiceover.Audio_Editing import audio_editing
-from Logic.Voiceover.Subtitles import get_subtitles, correct_subtitles, phonetic_correction
-from Logic.Videos.Script_Logic import treat_script
-from Logic.Voiceover.Narration import audio_recording
-from Logic.Videos.Thumbnails_Shorts import industrial_thumbnails
+from Logic.Videos.Script_LLM_Interaction import collect_batch_requests, submit_LLM_batch, wait_for_LLM_batch
+from Logic.Videos.LLM_Cache import forget_cached_response
+from Logic.Industrialization.Production_Stages import production_stages, run_stages, print_stage_timings, STAGE_WORKERS
+from Logic.Voiceover.Subtitles import get_subtitles_batch, TranscriptionManager
 
 
 """
@@ -20,6 +23,26 @@ This script is designed to automate video production workflows for influencers,
 From Title to Video:
 - This workflow generates complete videos from a given title with minimal supervision.
 - It is ideal when the title prompt is well-optimized and requires minimal manual intervention.
+- It can run each influencer in its own worker process, so all of them are produced at the same time.
+  The audios of all of them are transcribed by a single process (TranscriptionManager), so Whisper is loaded only once.
+- Inside each video, the stages run as a dependency graph (see Production_Stages), so images and thumbnails do not wait for the voice.
+- Before the first video starts, the scripts of all the titles are asked to the LLM at the same time (prefetch_scripts),
+  so the production of each video never waits for the LLM.
+
+Batch of scripts and descriptions:
+- The scripts of all the titles and the descriptions of the videos waiting for approval (States 4 and 5) are sent in a single job of the Batch API.
+- Cheaper per token; the production finds the scripts already written (State 1 folders) and never waits for the LLM.
+- The job is saved in a_Management/llm_batch.json: if the program is stopped, the next run waits for the same job instead of sending it again.
+- While the job of an influencer is pending, its production is skipped: its titles already have folders waiting for the answers (State 0),
+  asking them again in real time would make each video twice.
+
+Resume Production:
+- Videos that failed or were stopped in the middle (States 1 to 3) are kept, not deleted.
+- They continue from the first missing file, so the LLM script and the TTS audios are never paid twice.
+- The failures of each title are counted (a_Management/title_failures.json): after MAX_TITLE_ATTEMPTS failures,
+  the title is moved to themes_failed.txt, so a video that always fails does not block the rest of the titles.
+- The videos whose audio is finished but have no subtitles yet are transcribed first, all with the same Whisper model (get_subtitles_batch),
+  inside a worker of the stage pool: the main process never loads the model before the pool starts its workers.
 
 Conservative Re-editing:
 - This workflow focuses on re-editing videos that have been sent back for corrections.
@@ -27,104 +50,568 @@ Conservative Re-editing:
 """
 
 
-def from_title_to_video() -> None:
+MAX_TITLE_ATTEMPTS = 3  # Failures of a title before it is moved out of themes_production (to themes_failed.txt)
+
+
+def from_title_to_video(parallel: str = "") -> None:
     """
     Function to industrially produce videos from level 0 to level 4.
 
     Industrial production NOT conservative:
         - Audio is recorded without supervising the text.
+
+    Args:
+        parallel (str, optional): If not empty, each influencer is produced in its own worker process.
+            - Every worker has its own working directory, so the stages (which work with os.getcwd()) do not interfere
+            - A night of production lasts as long as the slowest influencer, not the sum of all of them
+            - The subtitles of every influencer are transcribed by the same process (one Whisper model in memory, not one per stage worker)
     """
 
     base_wd = os.getcwd()
     influencer_list = video_production_influencers()
 
-    def workflow_from_title_to_video(Influencer: object, influencer_wd: os.path) -> None:
-        """
-        This mass production function works from outside the folder.
+    # Resolve the working directory of each influencer before starting, so that workers receive an explicit path
+    production_list = []
+    for Influencer in influencer_list:
+        Influencer.get_correct_wd()
+        production_list.append((Influencer, os.getcwd()))
+        os.chdir(base_wd)
+
+    if parallel:
+        print(f"\n🏭 Producing {len(production_list)} influencers in parallel\n")
+
+        with TranscriptionManager() as manager, ProcessPoolExecutor(max_workers=len(production_list)) as executor:
+            transcriber = manager.Transcriber()
+            futures = {executor.submit(produce_influencer_videos, Influencer, influencer_wd, transcriber): influencer_wd
+                       for Influencer, influencer_wd in production_list}
+
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    print(f"\n✅ Production finished in: {futures[future]}\n")
+                except Exception as e:  # One influencer failing should not stop the rest
+                    print(f"An error occurred in the production of: {futures[future]}\n Error: {e}")
+
+    else:
+        for Influencer, influencer_wd in production_list:
+            produce_influencer_videos(Influencer, influencer_wd)
+            os.chdir(base_wd)
+
+
+
+
+
+def produce_influencer_videos(Influencer: object, influencer_wd: os.path, transcriber: Optional[Any] = None) -> None:
+    """
+    Runs the production of all the pending titles of one influencer, from its own working directory.
+
+    Can be executed in a worker process: the working directory is per process,
+    so each worker can move between the folders of its influencer without affecting the others.
+
+    :param Influencer: Influencer object.
+    :param influencer_wd: Working directory of the influencer.
+    :param transcriber: Proxy of the TranscriptionManager shared by all the influencers (None: each process loads Whisper).
+    :return: None
+    """
+    os.chdir(influencer_wd)
+    workflow_from_title_to_video(Influencer, influencer_wd, transcriber)
+
+
 
-        :param Influencer: Influencer object.
-        :param influencer_wd: Working directory of the influencer.
-        :return: None
-        """
-        production_file = os.path.join(os.getcwd(), "a_Management", "themes_production.txt")
-        old_file = os.path.join(os.getcwd(), "a_Management", "themes_old.txt")
-        
-        if not os.path.exists(old_file):  # Avoid failure the first time a new influencer runs (no old file)
-            open(old_file, 'w').close()
 
-        with open(production_file, 'r') as file:
-            lines_doc1 = file.readlines()
-            num_topics = len(lines_doc1)
 
+def workflow_from_title_to_video(Influencer: object, influencer_wd: os.path, transcriber: Optional[Any] = None) -> None:
+    """
+    This mass production function works from outside the folder.
+
+    If a title already has a folder from a previous run that failed (or was stopped),
+    the video continues from that folder instead of asking the LLM and the TTS again.
+
+    :param Influencer: Influencer object.
+    :param influencer_wd: Working directory of the influencer.
+    :param transcriber: Proxy of a TranscriptionManager that transcribes the audios (None: the stage workers load Whisper).
+    :return: None
+    """
+    production_file = os.path.join(influencer_wd, "a_Management", "themes_production.txt")
+
+    if os.path.exists(batch_job_file(influencer_wd)):  # The scripts of the titles are being written by the Batch API
+        print(f"\n⏸️ A batch job is pending ({batch_job_file(influencer_wd)}): the production of {influencer_wd} waits for it (option 8)\n")
+        return
+
+    prefetch_scripts(Influencer, influencer_wd)  # The folders of the titles are found below as resumable folders
+
+    with open(production_file, 'r') as file:
+        num_topics = len(file.readlines())
+
+    # Workers are kept alive between titles to avoid creating new processes for every video
+    with ProcessPoolExecutor(max_workers=STAGE_WORKERS) as executor:
         for x in range(num_topics):
+            title = None
+            folder = None
             try:
                 with open(production_file, 'r') as file:
                     lines_doc1 = file.readlines()
 
-                with open(old_file, 'r') as file:
-                    lines_doc2 = file.readlines()
+                if not lines_doc1:
+                    break
 
-                title = lines_doc1.pop(0)  # Get the video title from themes_production
+                title = lines_doc1[0]  # Get the video title from themes_production
 
                 print(f"\n\n🎬 Starting to produce Video: {title}\n")
 
-                folder = GPT_script_main(Influencer, title)  # Get script and create folder
-                os.chdir(folder)  # Change directory to folder
-                os.makedirs("images", exist_ok=True)
-                os.makedirs("audios", exist_ok=True)
-
-                treat_script()  # Organize Script
-
-                images_path = os.path.join(folder, "images")  # Fill the video with images
-                Influencer.get_influencer_images(images_path)
+                folder = find_resumable_folder(influencer_wd, title)
+                if folder:
+                    print(f"\n♻️ Resuming the video from the folder: {folder}\n")
+                else:
+                    folder = GPT_script_main(Influencer, title)  # Get script and create folder
+                    save_production_title(folder, title)
 
-                avoid_phonetic_correction_english = Influencer.avoid_phonetic_correction()  # Returns None or not
-                phonetic_correction(avoid_phonetic_correction_english)  # Perform phonetic correction
-                stop = audio_recording(Influencer)  # Record audio
-                
+                stop = produce_video_folder(Influencer, folder, executor, transcriber)
+            
                 if stop:  # Stop execution if the text is not complete
                     print("\nText went wrong, give the API 2 minutes to rest\n")
                     time.sleep(120)
                     os.chdir(influencer_wd)
-                    delete_state1_folders(influencer_wd)
+                    forget_script(folder)  # Otherwise the LLM cache would give the same script again
+                    remove_indexed_folder(folder)  # The script is useless: delete it so it is written again
+                    title_failed(influencer_wd, title)
                     continue
-                
-                audio_editing(Influencer, mass_production="YES")  # Edit Audio
-                get_subtitles()  # Subtitles
-                correct_subtitles(mass_production="YES")  # Correct Subtitles
-
-                video_editing_YT()  # Edit Video
-                industrial_thumbnails(Influencer, folder)  # Create 40 thumbnails, then discard 39
 
                 os.chdir(influencer_wd)  # Logging logic: Perform outside influencer directory
-
-                if lines_doc1:
-                    lines_doc2.insert(0, title)  # Add video title to themes_old
-                    with open(production_file, 'w') as file:  # Remove title from themes_production
-                        file.writelines(lines_doc1)
-                    with open(old_file, 'w') as file:  # Add title to themes_old
-                        file.writelines(lines_doc2)
-                else:
-                    lines_doc2.insert(0, title + "\n")  # Add video title to themes_old and add a newline
-                    with open(production_file, 'w') as file:  # Remove title from themes_production
-                        file.writelines("")
-                    with open(old_file, 'w') as file:  # Add title to themes_old
-                        file.writelines(lines_doc2)
+                archive_title(influencer_wd, title)
+                clear_title_failures(influencer_wd, title)
 
                 folder = set_folder_name(folder)
                 update_folder_status(folder)  # Update folder status after exiting it just in case
-                delete_state1_folders(influencer_wd)
 
             except Exception as e:
                 print(f"An error occurred: {e}\n With the title: {title}")
+                print("The folder is kept: the next run will continue it from the first missing file")
                 traceback.print_exc()
                 os.chdir(influencer_wd)
-                delete_state1_folders(influencer_wd)
+                if title:
+                    title_failed(influencer_wd, title, folder)
+
+
+
+
+
+def prefetch_scripts(Influencer: object, influencer_wd: os.path) -> int:
+    """
+    Asks the LLM the scripts of all the titles of themes_production at the same time (at most params.LLM_CONCURRENCY requests),
+    before the production of the first video starts.
+
+    Each script is saved in the text.txt of a new folder (State 1), with its production_title.txt:
+        - The production of each title finds its folder with find_resumable_folder and goes directly to the stages
+        - Titles that already have a folder (previous runs) are not asked again
+        - If a script fails, its folder is deleted and the title is written during the production, one at a time as before
+
+    :param Influencer: Influencer object.
+    :param influencer_wd: Working directory of the influencer.
+    :return: Number of scripts written.
+    """
+    pending_titles = pending_production_titles(influencer_wd)
+    if not pending_titles:
+        return 0
+
+    print(f"\n🧠 Writing the scripts of {len(pending_titles)} titles at the same time\n")
+
+    folders = {title: Influencer.create_folder() for title in pending_titles}  # One by one: the ids come from the index of folders
+    written = 0
+
+    with ThreadPoolExecutor(max_workers=params.LLM_CONCURRENCY) as executor:
+        futures = {executor.submit(Influencer.main_ScriptGPT, folder, title): title for title, folder in folders.items()}
+
+        for future in as_completed(futures):  # Folders are renamed here, in the main thread
+            title = futures[future]
+            folder = folders[title]
+            try:
+                future.result()
+            except (Exception, SystemExit) as e:  # checking_theme exits if the theme does not have a folder of images
+                print(f"\n❌ The script could not be written: {title.strip()}\n Error: {e}")
+                remove_indexed_folder(folder)
+                continue
+
+            save_production_title(folder, title)
+            update_folder_status(folder)
+            written += 1
+
+    print(f"\n✅ {written} of {len(pending_titles)} scripts written\n")
+    return written
+
+
+
+
+
+def pending_production_titles(influencer_wd: os.path) -> List[str]:
+    """
+    Lines of themes_production that do not have a folder yet (from a previous run, a prefetch or a batch).
+
+    :param influencer_wd: Working directory of the influencer.
+    :return: Lines of themes_production ("Video title / Theme"), without repetitions.
+    """
+    production_file = os.path.join(influencer_wd, "a_Management", "themes_production.txt")
+
+    with open(production_file, 'r') as file:
+        titles = list(dict.fromkeys(line for line in file.readlines() if line.strip()))
+
+    os.makedirs(os.path.join(influencer_wd, "Outputs"), exist_ok=True)  # New influencers do not have folders yet
+    return [title for title in titles if not find_resumable_folder(influencer_wd, title)]
+
+
+
+
+
+def batch_scripts_and_descriptions() -> None:
+    """
+    Function to write, with the Batch API, the scripts of the pending titles and the descriptions of the videos waiting for approval
+    of all the influencers (see batch_influencer_requests).
+    """
+    base_wd = os.getcwd()
+    influencer_list = video_production_influencers()
+
+    for Influencer in influencer_list:
+        Influencer.get_correct_wd()
+        influencer_wd = os.getcwd()
+        try:
+            batch_influencer_requests(Influencer, influencer_wd)
+        except Exception as e:  # One influencer failing should not stop the rest
+            print(f"An error occurred in the batch of: {influencer_wd}\n Error: {e}")
+            traceback.print_exc()
+        os.chdir(base_wd)
+
+
+
+
+
+def batch_influencer_requests(Influencer: object, influencer_wd: os.path) -> None:
+    """
+    Sends in a single job of the Batch API:
+        - The scripts of the titles of themes_production without folder (a new folder is created for each one)
+        - The descriptions of the videos in States 4 and 5 that do not have one yet (Influencer.get_keywords)
+    Then waits for the job and saves each answer in its folder.
+
+    If a job of a previous run is pending (a_Management/llm_batch.json), it waits for that job instead of sending a new one.
+
+    :param Influencer: Influencer object.
+    :param influencer_wd: Working directory of the influencer.
+    """
+    job_file = batch_job_file(influencer_wd)
+
+    if os.path.exists(job_file):
+        print(f"\n♻️ Waiting for the batch of a previous run: {job_file}\n")
+    else:
+        outputs_wd = os.path.join(influencer_wd, "Outputs")
+
+        with collect_batch_requests() as requests:  # The influencer builds its instructions as always, but the LLM is not called
+            for title in pending_production_titles(influencer_wd):
+                folder = Influencer.create_folder()
+                try:
+                    Influencer.main_ScriptGPT(folder, title)
+                except (Exception, SystemExit) as e:  # checking_theme exits if the theme does not have a folder of images
+                    print(f"\n❌ The script cannot be asked: {title.strip()}\n Error: {e}")
+                    remove_indexed_folder(folder)
+                    continue
+                save_production_title(folder, title)
+                if os.path.exists(os.path.join(folder, "text.txt")):  # Script found in the LLM cache: ready to be produced
+                    update_folder_status(folder)
+
+            for folder in select_multiple_folders([4, 5], base_directory=influencer_wd):
+                try:
+                    Influencer.get_keywords(os.path.join(outputs_wd, folder))
+                except Exception as e:
+                    print(f"\n❌ The description cannot be asked: {folder}\n Error: {e}")
+
+        if not requests:
+            print("\n✅ No scripts or descriptions to write\n")
+            return
+        submit_LLM_batch(requests, job_file)
+
+    production_file = os.path.join(influencer_wd, "a_Management", "themes_production.txt")
+
+    for request in wait_for_LLM_batch(job_file):
+        if request["kind"] != "script" or not os.path.isdir(request["folder"]):
+            continue
+
+        with open(os.path.join(request["folder"], "production_title.txt"), "r", encoding="utf-8") as file:
+            title = file.read().strip()
+        with open(production_file, "r") as file:
+            still_pending = title in (line.strip() for line in file)
+
+        if request["saved"] and still_pending and not find_resumable_folder(influencer_wd, title):
+            update_folder_status(request["folder"])  # State 1: the production continues it as a resumable folder
+        else:
+            remove_indexed_folder(request["folder"])  # Empty folder, or the title was already produced meanwhile: never made twice
+
+
+
+
+
+def batch_job_file(influencer_wd: os.path) -> os.path:
+    """
+    File of the pending Batch API job of an influencer (exists only while the job is not finished).
+    """
+    return os.path.join(influencer_wd, "a_Management", "llm_batch.json")
+
+
+
+
+
+def forget_script(folder: os.path) -> None:
+    """
+    Deletes the script of a folder (text.txt) from the LLM cache, so the title is written again by the LLM.
+
+    :param folder: Path of the video folder.
+    """
+    text_file = os.path.join(folder, "text.txt")
+    if os.path.exists(text_file):
+        with open(text_file, "r") as file:
+            forget_cached_response(file.read())
+
+
+
+
+
+def produce_video_folder(Influencer: object, folder: os.path, executor: ProcessPoolExecutor,
+                         transcriber: Optional[Any] = None) -> Optional[str]:
+    """
+    Runs the stages of a video folder that has a script (State 1 or more), skipping the stages already done.
+
+    :param Influencer: Influencer object.
+    :param folder: Path of the video folder.
+    :param executor: Pool of workers where the stages are executed.
+    :param transcriber: Proxy of a TranscriptionManager that transcribes the audio (None: the stage worker loads Whisper).
+    :return: "STOP" if the text is not good enough to record the video, None otherwise.
+    """
+    os.makedirs(os.path.join(folder, "images"), exist_ok=True)
+    os.makedirs(os.path.join(folder, "audios"), exist_ok=True)
+
+    # Script, images, voice, subtitles, video and thumbnails: independent stages run at the same time
+    stages = production_stages(Influencer, folder, resume="YES", transcriber=transcriber)
+    stop, timings = run_stages(stages, folder, executor, resume="YES")
+    print_stage_timings(timings)
+
+    return stop
+
+
+
+
+
+def save_production_title(folder: os.path, title: str) -> None:
+    """
+    Saves in the video folder the line of themes_production that created it,
+        to be able to find the folder again if the production fails.
+
+    :param folder: Path of the video folder.
+    :param title: Line of themes_production ("Video title / Theme").
+    """
+    with open(os.path.join(folder, "production_title.txt"), "w", encoding="utf-8") as file:
+        file.write(title.strip())
+
+
+
+
+
+def find_resumable_folder(influencer_wd: os.path, title: str) -> Optional[str]:
+    """
+    Looks for a folder of a previous run (States 1 to 3) created for this line of themes_production.
+
+    :param influencer_wd: Working directory of the influencer.
+    :param title: Line of themes_production ("Video title / Theme").
+    :return: Path of the folder, or None if the title has never been started.
+    """
+    outputs_wd = os.path.join(influencer_wd, "Outputs")
+
+    for folder in select_multiple_folders([1, 2, 3], base_directory=influencer_wd):
+        title_file = os.path.join(outputs_wd, folder, "production_title.txt")
+        if os.path.exists(title_file):
+            with open(title_file, "r", encoding="utf-8") as file:
+                if file.read().strip() == title.strip():
+                    return os.path.join(outputs_wd, folder)
+
+    return None
+
+
+
+
+
+def archive_title(influencer_wd: os.path, title: str) -> None:
+    """
+    Moves a title from themes_production to themes_old once its video is produced.
+
+    :param influencer_wd: Working directory of the influencer.
+    :param title: Line of themes_production ("Video title / Theme").
+    """
+    move_title(influencer_wd, title, "themes_old.txt")
+
+
+
+
+
+def move_title(influencer_wd: os.path, title: str, destination: str) -> None:
+    """
+    Moves a title from themes_production to the top of another file of a_Management (themes_old.txt or themes_failed.txt).
+
+    :param influencer_wd: Working directory of the influencer.
+    :param title: Line of themes_production ("Video title / Theme").
+    :param destination: Name of the file inside a_Management.
+    """
+    production_file = os.path.join(influencer_wd, "a_Management", "themes_production.txt")
+    old_file = os.path.join(influencer_wd, "a_Management", destination)
+
+    if not os.path.exists(old_file):  # Avoid failure the first time a new influencer runs (no old file)
+        open(old_file, 'w').close()
+
+    with open(production_file, 'r') as file:
+        lines_doc1 = file.readlines()
+
+    with open(old_file, 'r') as file:
+        lines_doc2 = file.readlines()
+
+    for i, line in enumerate(lines_doc1):  # Remove title from themes_production
+        if line.strip() == title.strip():
+            del lines_doc1[i]
+            break
+    lines_doc2.insert(0, title.strip() + "\n")  # Add video title to the destination (themes_old, themes_failed)
+
+    with open(production_file, 'w') as file:
+        file.writelines(lines_doc1)
+    with open(old_file, 'w') as file:
+        file.writelines(lines_doc2)
+
+
+
+
+
+def title_failures_file(influencer_wd: os.path) -> os.path:
+    """
+    File with the number of failures of each title of themes_production ({title: failures}).
+    """
+    return os.path.join(influencer_wd, "a_Management", "title_failures.json")
+
+
+
+
+
+def save_title_failures(influencer_wd: os.path, failures: dict) -> None:
+    """
+    Saves the number of failures of each title (atomic write).
+    """
+    failures_file = title_failures_file(influencer_wd)
+    with open(f"{failures_file}.tmp", "w", encoding="utf-8") as file:
+        json.dump(failures, file, ensure_ascii=False, indent=4)
+    os.replace(f"{failures_file}.tmp", failures_file)
+
+
+
+
+
+def load_title_failures(influencer_wd: os.path) -> dict:
+    """
+    Number of failures of each title of themes_production ({title: failures}).
+    """
+    failures_file = title_failures_file(influencer_wd)
+    if not os.path.exists(failures_file):
+        return {}
+    with open(failures_file, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+
+
+
+def title_failed(influencer_wd: os.path, title: str, folder: Optional[os.path] = None, max_attempts: int = MAX_TITLE_ATTEMPTS) -> int:
+    """
+    Counts a failure of a title. After max_attempts failures the title is moved to themes_failed.txt,
+        so it is not tried again in every run (and the next titles are produced).
+    The folder of the title (if it was kept) stays in Outputs to be reviewed, but its script is removed from the LLM cache
+        (the answer may be the cause of the failures: the title must not get it again if it is put back in themes_production).
+
+    :param influencer_wd: Working directory of the influencer.
+    :param title: Line of themes_production ("Video title / Theme").
+    :param folder: Folder of the title, if it was kept.
+    :param max_attempts: Failures before the title is set aside.
+    :return: Number of failures of the title.
+    """
+    failures = load_title_failures(influencer_wd)
+    attempts = failures.get(title.strip(), 0) + 1
+    failures[title.strip()] = attempts
+
+    if attempts >= max_attempts:
+        move_title(influencer_wd, title, "themes_failed.txt")
+        if folder:
+            forget_script(folder)
+        del failures[title.strip()]
+        print(f"\n🚫 The title failed {attempts} times, moved to themes_failed.txt: {title.strip()}\n")
+    else:
+        print(f"\n⚠️ Failure {attempts} of {max_attempts} of the title: {title.strip()}\n")
+
+    save_title_failures(influencer_wd, failures)
+    return attempts
+
+
+
+
+
+def clear_title_failures(influencer_wd: os.path, title: str) -> None:
+    """
+    Forgets the failures of a title once its video is produced.
+    """
+    failures = load_title_failures(influencer_wd)
+    if failures.pop(title.strip(), None) is not None:
+        save_title_failures(influencer_wd, failures)
+
+
+
+
+
+def resume_production() -> None:
+    """
+    Function to finish the videos that were left in the middle (States 1 to 3) by a failure or a Ctrl-C.
+    Each video continues from its first missing file, so the paid APIs (LLM and TTS) are not called again.
+    """
+
+    base_wd = os.getcwd()
+    influencer_list = video_production_influencers()
 
     for Influencer in influencer_list:
         Influencer.get_correct_wd()
-        influencer_wd = os.getcwd()  # Change directory to influencer directory
-        workflow_from_title_to_video(Influencer, influencer_wd)
+        influencer_wd = os.getcwd()
+        outputs_wd = os.path.join(influencer_wd, "Outputs")
+        folder_list = select_multiple_folders([1, 2, 3])
+
+        with ProcessPoolExecutor(max_workers=STAGE_WORKERS) as executor:
+            if not params.FAST_SUBTITLES:  # Transcribe in a row the audios waiting for subtitles: the stages then skip get_subtitles
+                waiting_for_subtitles = [
+                    os.path.join(outputs_wd, folder) for folder in folder_list
+                    if os.path.exists(os.path.join(outputs_wd, folder, "audios", "audio_subtitles.mp3"))
+                    and not os.path.exists(os.path.join(outputs_wd, folder, "flattened_transcription.json"))
+                ]
+                if waiting_for_subtitles:  # In a worker: the model (and the threads of torch) never live in the main process
+                    executor.submit(get_subtitles_batch, waiting_for_subtitles).result()
+
+            for folder in folder_list:
+                folder = os.path.join(outputs_wd, folder)
+                print(f"\n\n♻️ Resuming the video: {folder}\n")
+
+                try:
+                    stop = produce_video_folder(Influencer, folder, executor)
+                    if stop:
+                        print("\nText went wrong, the folder is kept to be reviewed\n")
+                        continue
+
+                    title_file = os.path.join(folder, "production_title.txt")
+                    if os.path.exists(title_file):
+                        with open(title_file, "r", encoding="utf-8") as file:
+                            archive_title(influencer_wd, file.read())
+
+                    folder = set_folder_name(folder)
+                    update_folder_status(folder)
+
+                except Exception as e:
+                    print(f"An error occurred: {e}\n With the folder: {folder}")
+                    traceback.print_exc()
+
         os.chdir(base_wd)
 
 
@@ -0,0 +1,351 @@
+import os
+import glob
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from Logic.Videos.Script_Logic import treat_script
+from Logic.Videos.Video_Recording import video_editing_YT
+from Logic.Videos.Thumbnails_Shorts import industrial_thumbnails
+from Logic.Voiceover.Audio_Editing import audio_editing
+from Logic.Voiceover.Subtitles import get_subtitles, get_subtitles_from_parts, correct_subtitles, phonetic_correction
+from Logic.Voiceover.Narration import audio_recording
+from Logic.Tools import params
+from Logic.Tools.Manifest import read_manifest, record_artifacts, artifacts_recorded, artifacts_time
+
+
+"""
+Script to run the stages of a video (from script to video) as a dependency graph instead of one after another.
+
+Each stage declares the files it needs (inputs) and the files it creates (outputs),
+    the same files that update_folder_status checks to know the state of a folder (text.txt, audios/audio_music.mp3, flattened_transcription.json...).
+A stage starts as soon as the stages that create its inputs are finished:
+    - Images and thumbnails do not depend on the voice or the subtitles, so they are done at the same time
+
+Resume mode: stages whose outputs already exist are not executed again
+    - A video that failed (or was stopped with Ctrl-C) continues from the first missing file
+    - The script of the LLM and the audios of the TTS are never paid twice
+    - Unless the outputs are stale: one of the inputs changed after the outputs were created
+        (ex: flattened_transcription.json corrected by hand after the video was edited -> only the video is edited again)
+    - If the folder has a manifest, only the outputs recorded in it are trusted: a file left half written by a stage
+        that was stopped (never recorded) makes the stage run again. Folders created before the manifest trust the files that exist.
+
+Manifest of artifacts (Manifest.py): when a stage finishes, its outputs are recorded (size, hash, stage, time) in the manifest of the folder
+    - The records are written here, in the process that runs the stages (the workers never write the manifest)
+
+Every stage runs in a worker process with the video folder as working directory:
+    - The stages work with relative paths (os.getcwd()), so they cannot share the working directory of a single process
+
+Functions:
+    - production_stages: Declares the stages of a video with their inputs and outputs.
+    - stage_dependencies: Finds which stages must be finished before each stage can start.
+    - run_stages: Runs the stages of a video folder, concurrently when their dependencies allow it.
+    - finish_running_stages: After a stage failed, cancels the stages not started and waits for the running ones.
+    - run_stage_in_folder: Runs one stage from the video folder (executed inside the worker process).
+    - artifacts_exist: Checks if the files of a stage exist (used to resume videos that failed in the middle).
+    - stage_is_stale: Checks if an input of a stage changed after its outputs were created.
+    - print_stage_timings: Prints how long each stage took.
+"""
+
+
+STAGE_WORKERS = 3  # Maximum number of stages of the same video running at the same time
+
+
+
+
+def production_stages(Influencer: object, folder: os.path, resume: str = "", fast_subtitles: str = params.FAST_SUBTITLES,
+                      transcriber: Optional[Any] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Declares the stages to go from the script of the LLM (text.txt) to the edited video.
+
+    Args:
+        Influencer (object): Influencer object.
+        folder (str): Path of the video folder.
+        resume (str, optional): If not empty, the stages that can be resumed by themselves only do the missing work.
+        fast_subtitles (str, optional): If not empty, the subtitles are created from the parts of the TTS instead of transcribing the audio.
+        transcriber (Transcriber, optional): Proxy of a TranscriptionManager: the audio is transcribed by its process
+            (parallel production: a single Whisper model for every influencer, not one per stage worker).
+
+    Returns:
+        Dict[str, Dict[str, Any]]: {stage_name: {"function", "args", "inputs", "outputs"}}
+            - inputs and outputs are paths relative to the video folder (glob patterns are allowed)
+            - "self_resuming": the stage is always executed when resuming, it skips by itself the parts already done
+            - Stages are declared in the order of the sequential workflow
+    """
+    avoid_phonetic_correction_english = Influencer.avoid_phonetic_correction()  # Returns None or not
+    images_path = os.path.join(folder, "images")
+
+    stages = {
+        "treat_script": {
+            "function": treat_script,
+            "args": (),
+            "inputs": ["text.txt"],
+            "outputs": ["script.txt", "title.txt", "thumbnail.txt", "footer.txt", "keywords.txt"],
+        },
+        "get_influencer_images": {
+            "function": Influencer.get_influencer_images,
+            "args": (images_path,),
+            "inputs": ["theme.txt"],
+            "outputs": ["images/*.jpg"],
+        },
+        "phonetic_correction": {
+            "function": phonetic_correction,
+            "args": (avoid_phonetic_correction_english,),
+            "inputs": ["script.txt"],
+            "outputs": ["modified_script.txt"],
+        },
+        "audio_recording": {
+            "function": audio_recording,
+            "args": (Influencer, resume),
+            "inputs": ["modified_script.txt"],
+            "outputs": ["audios/part*.mp4"],
+            "self_resuming": True,  # Only some parts may have been recorded: it records the missing ones
+        },
+        "audio_editing": {
+            "function": audio_editing,
+            "args": (Influencer, "YES"),
+            "inputs": ["audios/part*.mp4"],
+            "outputs": ["audios/audio_subtitles.mp3", "audios/audio_music.mp3", "audios/timeline.json"],
+        },
+        "get_subtitles": {
+            "function": get_subtitles_from_parts if fast_subtitles else get_subtitles,
+            "args": () if fast_subtitles else (transcriber,),
+            "inputs": ["script.txt", "audios/timeline.json"] if fast_subtitles else ["audios/audio_subtitles.mp3"],
+            "outputs": ["flattened_transcription.json"],
+        },
+        "correct_subtitles": {
+            "function": correct_subtitles,
+            "args": ("YES",),
+            "inputs": ["script.txt", "flattened_transcription.json"],
+            "outputs": ["subtitle_corrections.txt"],
+        },
+        "video_editing_YT": {
+            "function": video_editing_YT,
+            "args": (),
+            "inputs": ["images/*.jpg", "audios/audio_music.mp3", "flattened_transcription.json"],
+            "outputs": ["*.mp4"],
+        },
+        "industrial_thumbnails": {
+            "function": industrial_thumbnails,
+            "args": (Influencer, folder),
+            "inputs": ["thumbnail.txt", "images/*.jpg"],
+            "outputs": ["Thumbnails"],
+        },
+    }
+
+    return stages
+
+
+
+
+
+def stage_dependencies(stages: Dict[str, Dict[str, Any]]) -> Dict[str, Set[str]]:
+    """
+    Finds which stages must be finished before each stage can start.
+    A stage depends on the stages that declare one of its inputs as an output.
+
+    Args:
+        stages (Dict[str, Dict[str, Any]]): Stages declared as in production_stages.
+
+    Returns:
+        Dict[str, Set[str]]: {stage_name: names of the stages it depends on}
+    """
+    producers = {}
+    for name, stage in stages.items():
+        for output in stage["outputs"]:
+            producers[output] = name
+
+    dependencies = {}
+    for name, stage in stages.items():
+        dependencies[name] = {producers[file] for file in stage["inputs"] if file in producers and producers[file] != name}
+
+    return dependencies
+
+
+
+
+
+def artifacts_exist(folder: os.path, patterns: List[str]) -> bool:
+    """
+    Checks that every file (or glob pattern) exists inside the video folder.
+
+    Args:
+        folder (str): Path of the video folder.
+        patterns (List[str]): Paths relative to the folder, glob patterns are allowed.
+
+    Returns:
+        bool: True if all of them exist.
+    """
+    return all(glob.glob(os.path.join(glob.escape(folder), pattern)) for pattern in patterns)
+
+
+
+
+
+def stage_is_stale(folder: os.path, stage: Dict[str, Any], manifest: Optional[Dict[str, Any]]) -> bool:
+    """
+    Checks if an input of a stage changed after its outputs were created (ex: a Video.mp4 older than the flattened_transcription.json it was built from).
+
+    Args:
+        folder (str): Path of the video folder.
+        stage (Dict[str, Any]): Stage declared as in production_stages.
+        manifest (Dict[str, Any], optional): Manifest of the folder (time of the records of the artifacts).
+
+    Returns:
+        bool: True if the stage must be executed again.
+    """
+    newest_input = artifacts_time(folder, stage["inputs"], manifest, newest=True)
+    oldest_output = artifacts_time(folder, stage["outputs"], manifest, newest=False)
+
+    return newest_input is not None and oldest_output is not None and newest_input > oldest_output
+
+
+
+
+
+def run_stage_in_folder(function: Any, args: tuple, folder: os.path) -> Tuple[Any, float]:
+    """
+    Runs one stage from the video folder. Executed inside the worker process.
+
+    Args:
+        function (callable): Function of the stage.
+        args (tuple): Arguments of the function.
+        folder (str): Path of the video folder (working directory of the stage).
+
+    Returns:
+        Tuple[Any, float]: Result of the stage and seconds it took.
+    """
+    os.chdir(folder)
+    start = time.time()
+    result = function(*args)
+    return result, time.time() - start
+
+
+
+
+
+def finish_running_stages(running: Dict[Future, str], folder: os.path, stages: Dict[str, Dict[str, Any]]) -> None:
+    """
+    After a stage failed: cancels the stages submitted but not started yet, and waits for the ones already running.
+    The outputs of the stages that finished well are recorded, so that they are skipped when the folder is resumed.
+
+    Args:
+        running (Dict[Future, str]): Futures of the stages still running, with their names.
+        folder (str): Path of the video folder.
+        stages (Dict[str, Dict[str, Any]]): Stages declared as in production_stages.
+    """
+    for future in running:
+        future.cancel()
+    wait(running)
+
+    for future, name in running.items():
+        if not future.cancelled() and future.exception() is None:
+            record_artifacts(folder, name, stages[name]["outputs"])
+    running.clear()
+
+
+
+
+
+def run_stages(stages: Dict[str, Dict[str, Any]], folder: os.path,
+               executor: Optional[ProcessPoolExecutor] = None, resume: str = "") -> Tuple[Optional[str], Dict[str, float]]:
+    """
+    Runs the stages of a video folder, starting each one as soon as its dependencies are finished.
+
+    Args:
+        stages (Dict[str, Dict[str, Any]]): Stages declared as in production_stages.
+        folder (str): Path of the video folder.
+        executor (ProcessPoolExecutor, optional): Pool of workers to reuse between videos. If None, a new one is created.
+        resume (str, optional): If not empty, skip the stages whose outputs already exist
+            (unless they are stale: one of their inputs is newer than their outputs, for example because a dependency was executed again).
+
+    Returns:
+        Tuple[Optional[str], Dict[str, float]]:
+            - "STOP" if a stage asked to stop the production of the video (same convention as audio_recording), otherwise None
+            - Seconds taken by each finished stage
+
+    Raises:
+        FileNotFoundError: If a stage is ready to start but one of its inputs does not exist.
+        ValueError: If some stages can never start (their dependencies are not declared).
+        Exception: The error of a stage that failed, once the other stages of the folder are cancelled or finished.
+    """
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=STAGE_WORKERS) as new_executor:
+            return run_stages(stages, folder, new_executor, resume)
+
+    dependencies = stage_dependencies(stages)
+    has_manifest = read_manifest(folder) is not None  # Before the manifest is created by the first record of this run
+    pending = list(stages)  # Keep the declaration order to start stages in the order of the sequential workflow
+    running = {}
+    done = set()
+    timings = {}
+    stop = None
+
+    try:
+        while pending or running:
+
+            ready = [name for name in pending if dependencies[name] <= done]
+            while ready and not stop:
+                for name in ready:
+                    stage = stages[name]
+                    pending.remove(name)
+
+                    already_done = artifacts_exist(folder, stage["outputs"]) and not stage.get("self_resuming")
+                    if resume and already_done:
+                        manifest = read_manifest(folder)
+                        if has_manifest and not artifacts_recorded(folder, stage["outputs"], manifest):
+                            print(f"\n🔁 Stage {name} was not finished: its outputs are not recorded in the manifest")
+                        elif not stage_is_stale(folder, stage, manifest):
+                            print(f"\n⏭️ Skipping stage: {name} (already done)")
+                            if not has_manifest:
+                                record_artifacts(folder, name, stage["outputs"])  # Folders created before the manifest
+                            done.add(name)
+                            continue
+                        else:
+                            print(f"\n🔁 Stage {name} is stale: an input changed after its outputs were created")
+
+                    if not artifacts_exist(folder, stage["inputs"]):
+                        raise FileNotFoundError(f"\n❌ The stage {name} cannot start, missing inputs: {stage['inputs']}\n")
+
+                    print(f"\n▶️ Starting stage: {name}")
+                    future = executor.submit(run_stage_in_folder, stage["function"], stage["args"], folder)
+                    running[future] = name
+
+                ready = [name for name in pending if dependencies[name] <= done]  # Skipped stages can unblock others
+
+            if not running:
+                if stop or not pending:  # Stopped, or every stage was skipped
+                    break
+                raise ValueError(f"\n❌ These stages cannot start, their dependencies are never created: {pending}\n")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                result, elapsed = future.result()  # If the stage failed, the exception is raised here
+                timings[name] = elapsed
+                record_artifacts(folder, name, stages[name]["outputs"])  # Before its dependent stages start
+                done.add(name)
+
+                if result == "STOP":  # Do not start more stages, only wait for the ones already running
+                    stop = "STOP"
+    except Exception:
+        finish_running_stages(running, folder, stages)  # The pool is reused: it must be idle before the error goes up
+        raise
+
+    return stop, timings
+
+
+
+
+
+def print_stage_timings(timings: Dict[str, float]) -> None:
+    """
+    Prints how long each stage took, from the slowest to the fastest.
+
+    Args:
+        timings (Dict[str, float]): Seconds taken by each stage.
+    """
+    print("\n⏱️ Time per stage:")
+    for name, elapsed in sorted(timings.items(), key=lambda x: x[1], reverse=True):
+        print(f"    {name}: {elapsed:.2f} seconds")
+    print(f"    Total (without concurrency): {sum(timings.values()):.2f} seconds\n")
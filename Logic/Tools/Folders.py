@@ -2,10 +2,14 @@ import os
 from datetime import datetime
 from io import BytesIO
 import re
-import time
 import os
 import shutil
 from typing import List, Optional, Tuple
+from Logic.Tools.Folders_Index import (indexed_folders, indexed_folder_records, next_folder_id, create_indexed_folder,
+                                       rename_indexed_folder, remove_indexed_folder, update_indexed_folder,
+                                       parse_folder_name, folder_record)
+from Logic.Tools import params
+from Logic.Tools.Manifest import read_manifest
 
 
 """
@@ -21,6 +25,9 @@ Script with different functions to handle folders:
 
     Folder Status Update:
         - update_folder_status: Updates the status of a folder based on the files present.
+        - folder_state: Calculates the state of a folder from the files present (without renaming it).
+        - video_exists: Checks if the edited video exists, using the manifest of artifacts.
+        - set_folder_state: Renames a folder to a new state (single atomic rename, returns the new path).
 
     Working Directory Management:
         - get_correct_wd: Ensures that the script runs from the correct directory.
@@ -35,6 +42,15 @@ Script with different functions to handle folders:
         - delete_state1_folders: Deletes folders with state 'State1'.
         - move_state8_folders: Moves folders with state 'State8' to a specific folder.
         - move_state7_folders: Moves folders with state 'State7' to a specific folder.
+
+    Index of folders (Folders_Index.py):
+        - Folders are searched in an SQLite index of Outputs instead of listing and parsing all the folder names
+        - Every function that creates, renames, moves or deletes a folder also updates the index
+
+    Stable folders (params.STABLE_FOLDERS):
+        - New folders are only "ID-##": state, date and title are saved in their manifest.json (Manifest.py) and in the index
+        - update_folder_status and set_folder_name do not rename them: the path of a video never changes during its production
+        - choose_folder and select_multiple_folders work the same with both kinds of folders
 """
 
 
@@ -52,6 +68,8 @@ def template_folders(id: str) -> str:
     "ID-##_State_Date_Title"
 
     --> State being the state the video is in
+
+    With stable folders (params.STABLE_FOLDERS) the folder is only "ID-##" and the rest goes to its manifest.
     """
 
     # saving_path = os.path.join(os.getcwd(), 'Outputs', 'publicaciones')
@@ -59,26 +77,19 @@ def template_folders(id: str) -> str:
     saving_path = os.path.join(os.getcwd(), "Outputs")
     os.makedirs(saving_path, exist_ok=True)
 
-    # List all folders in the target directory
-    existing_folders = [folder for folder in os.listdir(saving_path) if os.path.isdir(os.path.join(saving_path, folder))]
-
-    # Find the highest existing index for today's date and the given team
-    max_index = 0
-    for folder in existing_folders:
-        # if folder.startswith(f"{socialmedia}_{today_date}_{team}_"):
-        # FCB-14_E9_Title_Date
-        unique_num = folder.split('_')[0]
-        folder_index = int(unique_num.split('-')[1])
-        if folder_index > max_index:
-            max_index = folder_index
-
-    # Create the new folder with the next index
+    # Create the new folder with the next index (the highest existing index + 1, from the index of folders)
     state = "State0"  # Empty folder
     title = "NoTitle"
-    new_index = max_index + 1
+    new_index = next_folder_id(saving_path)
+
+    if params.STABLE_FOLDERS:
+        date_folder = os.path.join(saving_path, f"{id}-{new_index}")
+        create_indexed_folder(date_folder, manifest={"state": state.replace("State", ""), "date": today_date, "title": title})
+        return date_folder
+
     folder_name = f"{id}-{new_index}_{state}_{today_date}_{title}"
     date_folder = os.path.join(saving_path, folder_name)
-    os.makedirs(date_folder, exist_ok=True)
+    create_indexed_folder(date_folder)
 
     return date_folder
 
@@ -98,8 +109,6 @@ def set_folder_name(folder_path: str) -> str:
     """
     import unidecode
 
-    rest_time = 2
-
     title_file = os.path.join(folder_path, 'title.txt')
 
     # Get the title of the folder
@@ -113,21 +122,41 @@ def set_folder_name(folder_path: str) -> str:
         print(f"\nError adding title to the folder: {e}\n")
         title = "NoTitle"
 
-    name_parts = folder_path.split('_')
-    if len(name_parts) > 1:
-        name_parts[-1] = f"{title}"  # Assuming the state position is the third in the pattern
-        new_folder_path = "_".join(name_parts)
+    if is_stable_folder(folder_path):  # The title is saved in the manifest, the folder keeps its path
+        update_indexed_folder(folder_path, title=title)
+        return folder_path
+
+    parent_path, folder_name = os.path.split(folder_path)  # Only the name of the folder is changed (the parent path can contain "_")
+    name_parts = folder_name.split('_')
+    if len(name_parts) > 3:
+        name_parts[3:] = [f"{title}"]  # The title is everything after the date: {id}_{state}_{date}_{title}
+        new_folder_path = os.path.join(parent_path, "_".join(name_parts))
     else:
         new_folder_path = folder_path
 
-    os.rename(folder_path, new_folder_path)  # add a time.sleep in between to allow other functions to adapt to the change
-    time.sleep(rest_time)
+    if new_folder_path != folder_path:
+        rename_indexed_folder(folder_path, new_folder_path)  # Atomic rename: use the returned path from now on
 
     return new_folder_path
 
 
 
 
+def is_stable_folder(folder_path: os.path) -> bool:
+    """
+    Checks if a folder is a stable folder ("ID-##" with a manifest) instead of a "ID-##_State_Date_Title" folder.
+
+    Args:
+        folder_path (str): Path of the folder.
+
+    Returns:
+        bool: True if the state and the title are saved in its manifest.
+    """
+    return parse_folder_name(os.path.basename(os.path.abspath(folder_path))) is None and folder_record(folder_path) is not None
+
+
+
+
 def choose_folder(valid_states: List[int]) -> os.path:
     """
     Searches for folders that match the specified states and allows the user to select one.
@@ -141,26 +170,14 @@ def choose_folder(valid_states: List[int]) -> os.path:
     """
             
     saving_path = os.path.join(os.getcwd(), "Outputs")
-    existing_folders = [folder for folder in os.listdir(saving_path) if os.path.isdir(os.path.join(saving_path, folder))]
-
-    folders_dict = {}  # {id}-{number}_{state}_{today_date}_{title}
-    for folder in existing_folders:
-        parts = folder.split('_')
-        state = parts[1]
-        id_raw = parts[0]  # ANI-25
-        _, id = id_raw.split("-")
-        state_num = int(state.replace("State", ""))
-        if state_num in valid_states:
-            folders_dict[int(id)] = folder  # add folder by ID to the folders dictionary
-
-    # Print the found folders with the specified format
+
+    folders_dict = {}  # {id}-{number}_{state}_{today_date}_{title} (or {id}-{number} with a manifest)
+
+    # Print the found folders with the specified format (id, state, date and title come from the index)
     print("\n📂 Folders found:")
-    for id in sorted(folders_dict.keys()):
-        folder = folders_dict[id]
-        parts = folder.split('_')  # {id}-{number}_{state}_{today_date}_{title}
-        state, date, title = parts[1], parts[2], "_".join(parts[3:])
-        id = parts[0].split('-')[1]
-        print(f"id: {id} : {state} | Title: {title} | Date: {date}")
+    for folder, id, state, date, title in indexed_folder_records(saving_path, valid_states):
+        folders_dict[id] = folder  # add folder by ID to the folders dictionary
+        print(f"id: {id} : State{state} | Title: {title} | Date: {date}")
 
     # Allow the user to select a folder
     while True:
@@ -202,48 +219,50 @@ def select_multiple_folders(valid_states: List[int], base_directory: str = "") -
     else:
         saving_path = os.path.join(os.getcwd(), "Outputs")
 
-    existing_folders = [folder for folder in os.listdir(saving_path) if os.path.isdir(os.path.join(saving_path, folder))]
-    folders_info = []  # Store tuples of (ID, folder name)
+    # Names of the folders in the valid states, sorted by ID (answered by the index of folders, without listing Outputs)
+    folders_sorted_by_id = indexed_folders(saving_path, valid_states)
+
+    return folders_sorted_by_id
 
-    for folder in existing_folders:
-        parts = folder.split('_')
-        id_part = parts[0].split('-')[1]
-        state = parts[1]
-        state_num = int(state.replace("State", ""))
 
-        if state_num in valid_states:
-            id = int(id_part)  # Convert ID to integer for numerical sorting
-            folders_info.append((id, folder))
 
-    # Sort the folders by ID
-    folders_info.sort(key=lambda x: x[0])
 
-    # Return only the names of the folders, sorted by ID
-    folders_sorted_by_id = [name for id, name in folders_info]
 
-    return folders_sorted_by_id
 
+def update_folder_status(folder_path: os.path) -> os.path:
+    """
+    Updates the status of a folder based on the files present in it, respecting dependencies between states.
+    
+    Args:
+        folder_path (path): Path of the folder to evaluate.
 
+    Returns:
+        path: New path of the folder with the updated status.
 
+    The rules of each state are in folder_state.
+    The folder is renamed once (atomic rename) and the new path is returned immediately:
+        - Callers must use the returned path, the old one does not exist anymore
+    """
+    state = folder_state(folder_path)
+    return set_folder_state(folder_path, state)
 
 
 
-def update_folder_status(folder_path: os.path) -> os.path:
 
-    rest_time = 2  # Rest time before renaming in seconds
 
+def folder_state(folder_path: os.path) -> object:
     """
-    Updates the status of a folder based on the files present in it, respecting dependencies between states.
-    
+    Calculates the state of a folder based on the files present in it, respecting dependencies between states.
+
     Args:
         folder_path (path): Path of the folder to evaluate.
 
     Returns:
-        path: New path of the folder with the updated status.
+        int or str: State of the folder (0 to 9, or "X" if it has to be re-edited).
 
     Rules for status update:
     - If "text.txt" exists, update to State 1.
-    - If "audios/labs.mp3" exists, update to State 2.
+    - If "audios/labs.mp3" (or "audios/audio_music.mp3", edited in memory without labs.mp3) exists, update to State 2.
     - If "transcription_flat.json" exists, update to State 3.
     - If "Video.mp4" exists, update to State 4.
     - If "thumbnail_vertical.jpg" exists, update to State 5.
@@ -252,59 +271,102 @@ def update_folder_status(folder_path: os.path) -> os.path:
     - If both "Instagram.txt" and "Youtube.txt" exist, update to State 8.
     - If "english.txt" exists, update to State 9.
 
-    The function returns the new name of the folder with the updated status.
+    The folder is not listed: each rule checks its own file, and the video is found in the manifest of artifacts
+        (the folder is only listed if the manifest does not have a video, ex: folders created before the manifest).
     """
     state = 0
-    files = os.listdir(folder_path)
-    audios_exist = os.path.exists(os.path.join(folder_path, "audios"))
-    audios = os.listdir(os.path.join(folder_path, "audios")) if audios_exist else []
+
+    def exists(file: str) -> bool:
+        return os.path.exists(os.path.join(folder_path, file))
 
     # Rules for status update
-    if "denied.txt" in files:
+    if exists("denied.txt"):
         state = "X"
 
     else:
-        if "text.txt" in files:
+        if exists("text.txt"):
             state = 1
-        if "labs.mp3" in audios:
+        if exists(os.path.join("audios", "labs.mp3")) or exists(os.path.join("audios", "audio_music.mp3")):
             state = max(state, 2)
-        if state >= 2 and "flattened_transcription.json" in files:
+        if state >= 2 and exists("flattened_transcription.json"):
             state = 3
         # if state >= 3 and "Video.mp4" in files:
         #     state = 4
-        if state >= 3 and any(file.endswith(".mp4") for file in files):
+        if state >= 3 and video_exists(folder_path):
             state = 4
-        if state >= 4 and "thumbnail_vertical.jpg" in files:
+        if state >= 4 and exists("thumbnail_vertical.jpg"):
             state = 5
-        if state >= 5 and "approved.txt" in files:
+        if state >= 5 and exists("approved.txt"):
             state = 6
-        if state >= 6 and "youtube.txt" in files:
+        if state >= 6 and exists("youtube.txt"):
             state = 7
-        if state >= 7 and "tiktok.txt" in files:
+        if state >= 7 and exists("tiktok.txt"):
             state = 8
         # if state >= 6:
         #     if "tiktok.txt" in files or "youtube.txt" in files:
         #         state = 7
         #         if "tiktok.txt" in files and "youtube.txt" in files:
         #             state = 8
-        if state >= 8 and "english.txt" in files:
+        if state >= 8 and exists("english.txt"):
             state = 9
 
+    return state
+
+
+
+
+
+def video_exists(folder_path: os.path) -> bool:
+    """
+    Checks if the edited video (any .mp4 in the folder) exists, using the videos recorded in the manifest of artifacts.
+
+    Args:
+        folder_path (path): Path of the folder.
+
+    Returns:
+        bool: True if the folder has a video.
+    """
+    artifacts = (read_manifest(folder_path) or {}).get("artifacts", {})
+    recorded_videos = [file for file in artifacts if "/" not in file and file.endswith(".mp4")]
+    if any(os.path.exists(os.path.join(folder_path, file)) for file in recorded_videos):
+        return True
+
+    return any(file.endswith(".mp4") for file in os.listdir(folder_path))  # Video created outside the stages (or before the manifest)
+
+
+
+
+
+def set_folder_state(folder_path: os.path, state: object) -> os.path:
+    """
+    State transition of a folder: renames it to the new state with a single atomic rename (and updates the index of folders).
+    There is no wait: the new path is returned immediately and is the only valid one from now on.
+
+    Args:
+        folder_path (path): Path of the folder.
+        state (int or str): New state (0 to 9, or "X").
+
+    Returns:
+        path: New path of the folder (the same one if the state did not change).
+    """
     # FCB-1_State1_State4_NoTitle
     # FCB-2_State1_2024-02-08_NoTitle
-    # Reconstruct the folder name with the new state
-    name_parts = folder_path.split('_')
+    if is_stable_folder(folder_path):  # The state is saved in the manifest, the folder keeps its path
+        update_indexed_folder(folder_path, state=state)
+        return folder_path
+
+    # Reconstruct the folder name with the new state (only the name of the folder, the parent path can contain "_")
+    parent_path, folder_name = os.path.split(folder_path)
+    name_parts = folder_name.split('_')
     if len(name_parts) > 1:
-        name_parts[1] = f"State{state}"  # Assuming the state position is the third in the pattern
-        new_folder_path = "_".join(name_parts)
+        name_parts[1] = f"State{state}"  # The state is the second part of the pattern
+        new_folder_path = os.path.join(parent_path, "_".join(name_parts))
     else:
         new_folder_path = folder_path
 
     # Rename the folder in the file system
-    print("\n⌛ Wait 4 seconds to rename folder")
-    time.sleep(rest_time)
-    os.rename(folder_path, new_folder_path)  # add a time.sleep in between to allow other functions to adapt to the change
-    time.sleep(rest_time)
+    if new_folder_path != folder_path:
+        rename_indexed_folder(folder_path, new_folder_path)
 
     return new_folder_path
 
@@ -435,19 +497,28 @@ def copy_reference_folder(folder_list: List[str]) -> List[Tuple[str, str]]:
     for folder in folder_list:
         # Extract the folder name and modify it according to the specifications
         folder_name = os.path.basename(folder)
-        name_parts = folder_name.split("_")
 
-        # Change the state to 5 and add "ENG-" prefix to the name
-        name_parts[0] = "ENG-" + name_parts[0]
-        name_parts[1] = "State0"
-        name_parts[2] = today_date  # Replace the date with today's date
+        if is_stable_folder(folder):  # Stable folder: "ENG-ID-##" with the state, date and title in its manifest
+            _, _, _, title = folder_record(folder)
+            new_folder_name = "ENG-" + folder_name
+            manifest = {"state": "0", "date": today_date, "title": title}
+
+        else:
+            name_parts = folder_name.split("_")
+
+            # Change the state to 5 and add "ENG-" prefix to the name
+            name_parts[0] = "ENG-" + name_parts[0]
+            name_parts[1] = "State0"
+            name_parts[2] = today_date  # Replace the date with today's date
 
-        # Reconstruct the name with the modifications
-        new_folder_name = "_".join(name_parts)
+            # Reconstruct the name with the modifications
+            new_folder_name = "_".join(name_parts)
+            manifest = None
 
         # Create the new folder in the current directory
         new_destination_folder = os.path.join(os.getcwd(), "Outputs", new_folder_name)
-        os.makedirs(new_destination_folder, exist_ok=True)
+        os.makedirs(os.path.dirname(new_destination_folder), exist_ok=True)
+        create_indexed_folder(new_destination_folder, manifest=manifest)
 
         # Copy the "config" and "images" folders completely
         for sub_folder in ["config", "images"]:
@@ -490,16 +561,11 @@ def delete_state0_folders(path: os.path) -> None:
         print("\nThe specified path does not exist.")
         return
 
-    # List all items in the path
-    for folder_name in os.listdir(path):
-        # Build the complete path to the item
-        complete_path = os.path.join(path, folder_name)
-
-        # Verify if it is a folder and contains 'State0' in the name
-        if os.path.isdir(complete_path) and 'State0' in folder_name:
-            # Delete the folder
-            shutil.rmtree(complete_path)
-            print(f"\nDeleted folder: {folder_name}")
+    # Folders in 'State0' (from the index of folders)
+    for folder_name in indexed_folders(path, [0]):
+        # Delete the folder (and remove it from the index)
+        remove_indexed_folder(os.path.join(path, folder_name))
+        print(f"\nDeleted folder: {folder_name}")
 
 
 
@@ -517,16 +583,11 @@ def delete_state1_folders(path: os.path) -> None:
         print("\nThe specified path does not exist.")
         return
 
-    # List all items in the path
-    for folder_name in os.listdir(path):
-        # Build the complete path to the item
-        complete_path = os.path.join(path, folder_name)
-
-        # Verify if it is a folder and contains 'State1' in the name
-        if os.path.isdir(complete_path) and 'State1' in folder_name:
-            # Delete the folder
-            shutil.rmtree(complete_path)
-            print(f"\nDeleted folder: {folder_name}")
+    # Folders in 'State1' (from the index of folders)
+    for folder_name in indexed_folders(path, [1]):
+        # Delete the folder (and remove it from the index)
+        remove_indexed_folder(os.path.join(path, folder_name))
+        print(f"\nDeleted folder: {folder_name}")
 
 
 
@@ -546,18 +607,14 @@ def move_state8_folders(path: os.path) -> None:
 
     destination_folder = os.path.join(path, "zID-0_State9_0000-00-00_uploaded videos not english")
     if not os.path.isdir(destination_folder):
-        os.makedirs(destination_folder)
+        create_indexed_folder(destination_folder)
 
 
-    # List all items in the path
-    for folder_name in os.listdir(path):
-        # Build the complete path to the item
+    # Folders in 'State8' (from the index of folders)
+    for folder_name in indexed_folders(path, [8]):
         complete_path = os.path.join(path, folder_name)
-
-        # Verify if it is a folder and contains 'State8' in the name
-        if os.path.isdir(complete_path) and 'State8' in folder_name:
-            complete_destination = os.path.join(destination_folder, folder_name)
-            shutil.move(complete_path, complete_destination)
+        complete_destination = os.path.join(destination_folder, folder_name)
+        remove_indexed_folder(complete_path, destination=complete_destination)  # Moved out of Outputs: removed from the index
 
 
 
@@ -578,15 +635,11 @@ def move_state7_folders(path: os.path) -> None:
 
     destination_folder = os.path.join(path, "zID-0_State9_0000-00-00_uploaded videos not english")
     if not os.path.isdir(destination_folder):
-        os.makedirs(destination_folder)
+        create_indexed_folder(destination_folder)
 
 
-    # List all items in the path
-    for folder_name in os.listdir(path):
-        # Build the complete path to the item
+    # Folders in 'State7' (from the index of folders)
+    for folder_name in indexed_folders(path, [7]):
         complete_path = os.path.join(path, folder_name)
-
-        # Verify if it is a folder and contains 'State7' in the name
-        if os.path.isdir(complete_path) and 'State7' in folder_name:
-            complete_destination = os.path.join(destination_folder, folder_name)
-            shutil.move(complete_path, complete_destination)
+        complete_destination = os.path.join(destination_folder, folder_name)
+        remove_indexed_folder(complete_path, destination=complete_destination)  # Moved out of Outputs: removed from the index
@@ -0,0 +1,406 @@
+import os
+import shutil
+import sqlite3
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Tuple
+from Logic.Tools.Manifest import read_manifest, write_manifest
+
+
+"""
+Persistent index of the video folders of an influencer (Outputs/folders_index.sqlite).
+
+Every folder is named "ID-##_State_Date_Title": instead of listing Outputs and splitting every name
+each time a function needs the folders in some states, the index keeps one row per folder:
+    - name, id, state, date and title, with an index on (state, id)
+    - "all the State6 folders sorted by id" or "next free id" are answered without reading the disk
+
+Folders are created, renamed, moved and deleted through this script, so the disk and the index change in the same transaction
+(if the change on the disk fails, the index is not modified).
+
+Stable folders (params.STABLE_FOLDERS): the directory is only "ID-N" and the state, date and title are read from its manifest.json
+    - Changing the state or the title only updates the manifest and the index (the directory is never renamed)
+
+Self-healing:
+    - The index saves the modification time of Outputs after each of its own changes
+    - If Outputs was changed by someone else (a folder renamed by hand, copied from another computer...),
+        the times do not match and the index is rebuilt from the disk before answering
+    - If the file of the index is damaged (ex: a crash in the middle of a transaction, the journal is kept in memory),
+        it is deleted and rebuilt from the disk
+    - rebuild_folders_index can also be run by hand (Management menu)
+
+Functions:
+    - parse_folder_name: Splits a folder name into id, state, date and title.
+    - folder_record: Id, state, date and title of a folder (from its name, or from its manifest if it is a stable folder).
+    - rebuild_folders_index: Rebuilds the index from the folders that exist in Outputs.
+    - indexed_folders: Names of the folders in some states, sorted by id.
+    - count_indexed_folders: Number of folders in some states.
+    - next_folder_id: Next free id for a new folder.
+    - create_indexed_folder: Creates a folder and adds it to the index.
+    - rename_indexed_folder: Renames a folder (new state or title) and updates the index.
+    - remove_indexed_folder: Deletes a folder (or moves it out of Outputs) and removes it from the index.
+    - update_indexed_folder: Changes the state or the title of a stable folder (manifest and index).
+    - indexed_folder_records: Id, state, date and title of the folders in some states, sorted by id.
+"""
+
+
+INDEX_FILE = "folders_index.sqlite"
+
+
+
+
+def parse_folder_name(folder_name: str) -> Optional[Tuple[int, str, str, str]]:
+    """
+    Splits a folder name "ID-##_State_Date_Title" into its parts.
+
+    Args:
+        folder_name (str): Name of the folder (ex: "FCB-14_State3_2024-02-08_Title").
+
+    Returns:
+        Optional[Tuple[int, str, str, str]]: (id, state, date, title), with the state without "State" (ex: "3", "X").
+            None if the name does not follow the template.
+    """
+    parts = folder_name.split('_')
+    if len(parts) < 3 or not parts[1].startswith("State"):
+        return None
+
+    number = parts[0].rsplit('-', 1)[-1]  # ENG-FCB-6 -> 6
+    if not number.isdigit():
+        return None
+
+    return int(number), parts[1].replace("State", ""), parts[2], "_".join(parts[3:])
+
+
+
+
+
+def folder_record(folder_path: os.path) -> Optional[Tuple[int, str, str, str]]:
+    """
+    Id, state, date and title of a folder: from its name ("ID-##_State_Date_Title"),
+        or from its manifest if it is a stable folder ("ID-##").
+
+    Args:
+        folder_path (str): Path of the folder.
+
+    Returns:
+        Optional[Tuple[int, str, str, str]]: (id, state, date, title), None if it is not a video folder.
+    """
+    folder_name = os.path.basename(os.path.abspath(folder_path))
+    parsed = parse_folder_name(folder_name)
+    if parsed:
+        return parsed
+
+    number = folder_name.rsplit('-', 1)[-1]
+    manifest = read_manifest(folder_path) if number.isdigit() and "_" not in folder_name else None
+    if manifest is None:
+        return None
+
+    return int(number), str(manifest.get("state", "0")), manifest.get("date", ""), manifest.get("title", "NoTitle")
+
+
+
+
+
+def connect_folders_index(outputs_path: os.path) -> sqlite3.Connection:
+    """
+    Opens the index of an Outputs folder, creating it (and filling it from the disk) the first time.
+    If Outputs was changed without updating the index, it is rebuilt before returning.
+
+    Args:
+        outputs_path (str): Path of the Outputs folder of the influencer.
+
+    Returns:
+        sqlite3.Connection: Connection to the index.
+    """
+    try:
+        return open_folders_index(outputs_path)
+    except sqlite3.OperationalError:  # Ex: locked by another process: the index is fine
+        raise
+    except sqlite3.DatabaseError as e:  # The file is damaged: the disk is the truth, the index is built again from it
+        print(f"\n⚠️ The index of folders is damaged ({e}): rebuilding it from {outputs_path}")
+        os.remove(os.path.join(outputs_path, INDEX_FILE))
+        return open_folders_index(outputs_path)
+
+
+
+
+
+def open_folders_index(outputs_path: os.path) -> sqlite3.Connection:
+    """
+    Opens the index of an Outputs folder (used by connect_folders_index), filling it from the disk if it is not up to date.
+    The connection is closed if the index cannot be read.
+    """
+    outputs_mtime = os.stat(outputs_path).st_mtime_ns  # Raises FileNotFoundError like os.listdir if Outputs does not exist
+
+    connection = sqlite3.connect(os.path.join(outputs_path, INDEX_FILE), timeout=30)
+    try:
+        prepare_folders_index(connection, outputs_path, outputs_mtime)
+    except Exception:
+        connection.close()
+        raise
+
+    return connection
+
+
+
+
+
+def prepare_folders_index(connection: sqlite3.Connection, outputs_path: os.path, outputs_mtime: int) -> None:
+    """
+    Creates the tables of the index if they do not exist, and fills it from the disk if Outputs changed since the last fill.
+    """
+    connection.execute("PRAGMA journal_mode=MEMORY")  # A journal file would change the modification time of Outputs on every write (if the index is damaged, it is rebuilt)
+    check = connection.execute("PRAGMA quick_check").fetchone()[0]  # Small file: checked every time it is opened
+    if check != "ok":
+        raise sqlite3.DatabaseError(check)
+    with connection:
+        connection.execute("""CREATE TABLE IF NOT EXISTS folders (
+                                  name TEXT PRIMARY KEY,
+                                  id INTEGER NOT NULL,
+                                  state TEXT NOT NULL,
+                                  date TEXT,
+                                  title TEXT)""")
+        connection.execute("CREATE INDEX IF NOT EXISTS folders_state_id ON folders (state, id)")
+        connection.execute("CREATE INDEX IF NOT EXISTS folders_id ON folders (id)")
+        connection.execute("CREATE TABLE IF NOT EXISTS sync (outputs_mtime INTEGER)")
+
+    row = connection.execute("SELECT outputs_mtime FROM sync").fetchone()
+    if row is None or row[0] != outputs_mtime:
+        fill_folders_index(connection, outputs_path)
+
+
+
+
+
+def save_outputs_mtime(connection: sqlite3.Connection, outputs_path: os.path) -> None:
+    """
+    Saves the modification time of Outputs: the index knows it is up to date with the disk.
+    Must be called inside the transaction of each change, after the change is done in the disk.
+    """
+    connection.execute("DELETE FROM sync")
+    connection.execute("INSERT INTO sync (outputs_mtime) VALUES (?)", (os.stat(outputs_path).st_mtime_ns,))
+
+
+
+
+
+def fill_folders_index(connection: sqlite3.Connection, outputs_path: os.path) -> int:
+    """
+    Replaces all the rows of the index with the folders that exist in Outputs (single transaction).
+
+    Returns:
+        int: Number of folders indexed.
+    """
+    rows = []
+    for folder in os.listdir(outputs_path):
+        if os.path.isdir(os.path.join(outputs_path, folder)):
+            record = folder_record(os.path.join(outputs_path, folder))
+            if record:
+                rows.append((folder, *record))
+
+    with connection:
+        connection.execute("DELETE FROM folders")
+        connection.executemany("INSERT INTO folders (name, id, state, date, title) VALUES (?, ?, ?, ?, ?)", rows)
+        save_outputs_mtime(connection, outputs_path)
+
+    return len(rows)
+
+
+
+
+
+def rebuild_folders_index(outputs_path: os.path = "") -> int:
+    """
+    Rebuilds the index from the folders that exist in Outputs (reconciliation with the file system).
+
+    Args:
+        outputs_path (str, optional): Path of the Outputs folder. If empty, the Outputs of the current directory.
+
+    Returns:
+        int: Number of folders indexed.
+    """
+    outputs_path = outputs_path or os.path.join(os.getcwd(), "Outputs")
+
+    with closing(connect_folders_index(outputs_path)) as connection:
+        number_of_folders = fill_folders_index(connection, outputs_path)
+
+    print(f"\n🗂️ Index of folders rebuilt: {number_of_folders} folders in {outputs_path}")
+    return number_of_folders
+
+
+
+
+
+def indexed_folders(outputs_path: os.path, valid_states: list) -> List[str]:
+    """
+    Names of the folders in some states, sorted by id.
+
+    Args:
+        outputs_path (str): Path of the Outputs folder.
+        valid_states (list): List of valid states (for example, [3, 4, 5, 6] or ["X"]).
+
+    Returns:
+        List[str]: Names of the folders.
+    """
+    states = [str(state) for state in valid_states]
+    if not states:
+        return []
+
+    query = f"SELECT name FROM folders WHERE state IN ({', '.join('?' * len(states))}) ORDER BY id"
+    with closing(connect_folders_index(outputs_path)) as connection:
+        return [name for (name,) in connection.execute(query, states)]
+
+
+
+
+
+def indexed_folder_records(outputs_path: os.path, valid_states: list) -> List[Tuple[str, int, str, str, str]]:
+    """
+    Id, state, date and title of the folders in some states, sorted by id (valid for named and stable folders).
+
+    Args:
+        outputs_path (str): Path of the Outputs folder.
+        valid_states (list): List of valid states.
+
+    Returns:
+        List[Tuple[str, int, str, str, str]]: (name, id, state, date, title) of each folder.
+    """
+    states = [str(state) for state in valid_states]
+    if not states:
+        return []
+
+    query = f"SELECT name, id, state, date, title FROM folders WHERE state IN ({', '.join('?' * len(states))}) ORDER BY id"
+    with closing(connect_folders_index(outputs_path)) as connection:
+        return list(connection.execute(query, states))
+
+
+
+
+
+def count_indexed_folders(outputs_path: os.path, valid_states: list) -> int:
+    """
+    Number of folders in some states.
+
+    Args:
+        outputs_path (str): Path of the Outputs folder.
+        valid_states (list): List of valid states.
+
+    Returns:
+        int: Number of folders.
+    """
+    states = [str(state) for state in valid_states]
+    if not states:
+        return 0
+
+    query = f"SELECT COUNT(*) FROM folders WHERE state IN ({', '.join('?' * len(states))})"
+    with closing(connect_folders_index(outputs_path)) as connection:
+        return connection.execute(query, states).fetchone()[0]
+
+
+
+
+
+def next_folder_id(outputs_path: os.path) -> int:
+    """
+    Next free id for a new folder (the highest id + 1).
+
+    Args:
+        outputs_path (str): Path of the Outputs folder.
+
+    Returns:
+        int: Id for the new folder.
+    """
+    with closing(connect_folders_index(outputs_path)) as connection:
+        return (connection.execute("SELECT MAX(id) FROM folders").fetchone()[0] or 0) + 1
+
+
+
+
+
+def create_indexed_folder(folder_path: os.path, manifest: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Creates a folder inside Outputs and adds it to the index (same transaction).
+
+    Args:
+        folder_path (str): Path of the new folder.
+        manifest (Dict[str, Any], optional): Manifest of a stable folder (state, date, title), written before indexing it.
+    """
+    outputs_path, folder_name = os.path.split(os.path.abspath(folder_path))
+
+    with closing(connect_folders_index(outputs_path)) as connection, connection:
+        os.makedirs(folder_path, exist_ok=True)
+        if manifest:
+            write_manifest(folder_path, **manifest)
+        parsed = folder_record(folder_path)
+        if parsed:
+            connection.execute("INSERT OR REPLACE INTO folders (name, id, state, date, title) VALUES (?, ?, ?, ?, ?)",
+                               (folder_name, *parsed))
+        save_outputs_mtime(connection, outputs_path)
+
+
+
+
+
+def rename_indexed_folder(old_folder_path: os.path, new_folder_path: os.path) -> None:
+    """
+    Renames a folder inside Outputs (new state or new title) and updates the index (same transaction).
+
+    Args:
+        old_folder_path (str): Path of the folder.
+        new_folder_path (str): New path of the folder (in the same Outputs folder).
+    """
+    outputs_path, old_name = os.path.split(os.path.abspath(old_folder_path))
+    new_name = os.path.basename(os.path.abspath(new_folder_path))
+
+    with closing(connect_folders_index(outputs_path)) as connection, connection:
+        os.rename(old_folder_path, new_folder_path)  # If it fails, the index is not changed
+        parsed = folder_record(new_folder_path)
+        connection.execute("DELETE FROM folders WHERE name = ?", (old_name,))
+        if parsed:
+            connection.execute("INSERT OR REPLACE INTO folders (name, id, state, date, title) VALUES (?, ?, ?, ?, ?)",
+                               (new_name, *parsed))
+        save_outputs_mtime(connection, outputs_path)
+
+
+
+
+
+def remove_indexed_folder(folder_path: os.path, destination: Optional[os.path] = None) -> None:
+    """
+    Deletes a folder of Outputs (or moves it out of Outputs) and removes it from the index (same transaction).
+
+    Args:
+        folder_path (str): Path of the folder.
+        destination (str, optional): If given, the folder is moved there instead of deleted.
+    """
+    outputs_path, folder_name = os.path.split(os.path.abspath(folder_path))
+
+    with closing(connect_folders_index(outputs_path)) as connection, connection:
+        if destination:
+            shutil.move(folder_path, destination)
+        else:
+            shutil.rmtree(folder_path)
+        connection.execute("DELETE FROM folders WHERE name = ?", (folder_name,))
+        save_outputs_mtime(connection, outputs_path)
+
+
+
+
+
+def update_indexed_folder(folder_path: os.path, **fields: Any) -> None:
+    """
+    Changes the state, the date or the title of a stable folder: its manifest and its row of the index (same transaction).
+    The directory is not renamed, so its path stays valid.
+
+    Args:
+        folder_path (str): Path of the stable folder.
+        **fields: Fields to change (state, date, title).
+    """
+    outputs_path, folder_name = os.path.split(os.path.abspath(folder_path))
+    fields = {field: str(value) for field, value in fields.items()}
+
+    with closing(connect_folders_index(outputs_path)) as connection, connection:
+        write_manifest(folder_path, **fields)
+        record = folder_record(folder_path)
+        connection.execute("INSERT OR REPLACE INTO folders (name, id, state, date, title) VALUES (?, ?, ?, ?, ?)",
+                           (folder_name, *record))
+        save_outputs_mtime(connection, outputs_path)
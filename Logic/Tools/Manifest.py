@@ -0,0 +1,223 @@
+import os
+import json
+import glob
+import hashlib
+from typing import Any, Dict, List, Optional
+
+
+"""
+Manifest of a video folder (manifest.json inside the folder).
+
+With stable folders (params.STABLE_FOLDERS) the directory of a video is only "ID-N" and never changes:
+    - The state, the date and the title are saved in the manifest instead of in the name of the folder
+    - Paths held by the workers of a video are valid during the whole production (no rename between stages)
+
+Artifacts: every stage of the production adds to the manifest a record of each file it created
+    - {"artifacts": {"audios/audio_music.mp3": {"size", "hash", "stage", "timestamp"}, ...}}
+    - The state of a folder is calculated from these records instead of listing the folder (update_folder_status)
+    - A stage whose inputs changed after its outputs were recorded is stale and can be executed again
+    - The records are written by the process that runs the stages (run_stages), never by the workers: a single writer per folder
+
+Functions:
+    - read_manifest: Reads the manifest of a folder.
+    - write_manifest: Updates some fields of the manifest of a folder (atomic write).
+    - artifact_files: Files that match some patterns inside a folder (the files inside directories included).
+    - file_hash: SHA-256 of a file, read in blocks.
+    - record_artifacts: Adds to the manifest the records of the files created by a stage.
+    - artifacts_recorded: Checks that the files of a stage are recorded in the manifest and did not change after (not left half written).
+    - artifacts_time: Most recent modification of the files that match some patterns.
+"""
+
+
+MANIFEST_FILE = "manifest.json"
+
+
+
+
+def read_manifest(folder_path: os.path) -> Optional[Dict[str, Any]]:
+    """
+    Reads the manifest of a video folder.
+
+    Args:
+        folder_path (str): Path of the video folder.
+
+    Returns:
+        Optional[Dict[str, Any]]: Content of the manifest, None if the folder does not have one.
+    """
+    manifest_path = os.path.join(folder_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+
+
+
+def write_manifest(folder_path: os.path, **fields: Any) -> Dict[str, Any]:
+    """
+    Updates some fields of the manifest of a video folder (creating it if it does not exist).
+    The file is written in a temporary file and then replaced: it is never left half written.
+
+    Args:
+        folder_path (str): Path of the video folder.
+        **fields: Fields to save (ex: state="3", title="My title").
+
+    Returns:
+        Dict[str, Any]: Content of the manifest after the update.
+    """
+    manifest = read_manifest(folder_path) or {}
+    manifest.update(fields)
+
+    manifest_path = os.path.join(folder_path, MANIFEST_FILE)
+    temporary_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=4)
+    os.replace(temporary_path, manifest_path)
+
+    return manifest
+
+
+
+
+
+def artifact_files(folder_path: os.path, patterns: List[str]) -> List[str]:
+    """
+    Files that match some patterns inside a folder. If a pattern is a directory, all the files inside it.
+
+    Args:
+        folder_path (str): Path of the video folder.
+        patterns (List[str]): Paths relative to the folder, glob patterns are allowed.
+
+    Returns:
+        List[str]: Paths of the files relative to the folder (with "/" as separator).
+    """
+    files = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(glob.escape(folder_path), pattern))):
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files.extend(os.path.join(root, name) for name in sorted(names))
+            else:
+                files.append(path)
+
+    return [os.path.relpath(path, folder_path).replace(os.sep, "/") for path in files]
+
+
+
+
+
+def file_hash(path: os.path, block_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file, read in blocks (videos are not loaded in memory).
+
+    Args:
+        path (str): Path of the file.
+        block_size (int): Bytes read each time.
+
+    Returns:
+        str: Hexadecimal hash.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+
+
+
+def record_artifacts(folder_path: os.path, stage: str, patterns: List[str]) -> Dict[str, Any]:
+    """
+    Adds to the manifest a record (size, hash, stage and time) of each file created by a stage.
+    Files whose size and modification did not change since their last record are not hashed again.
+    The time of a record is the modification time of the file: files that existed before the stage ran
+    (folders created before the manifest, parts kept by a self resuming stage) keep their real age,
+    otherwise the stages after them would look stale.
+
+    Args:
+        folder_path (str): Path of the video folder.
+        stage (str): Name of the stage that created the files.
+        patterns (List[str]): Outputs of the stage (paths relative to the folder, glob patterns are allowed).
+
+    Returns:
+        Dict[str, Any]: Content of the manifest after the update.
+    """
+    artifacts = (read_manifest(folder_path) or {}).get("artifacts", {})
+
+    for name in artifact_files(folder_path, patterns):
+        path = os.path.join(folder_path, name)
+        size, modified = os.path.getsize(path), os.path.getmtime(path)
+        previous = artifacts.get(name)
+
+        if previous and previous["size"] == size and previous["timestamp"] >= modified:
+            previous["stage"] = stage
+            continue
+
+        artifacts[name] = {
+            "size": size,
+            "hash": file_hash(path),
+            "stage": stage,
+            "timestamp": modified,
+        }
+
+    return write_manifest(folder_path, artifacts=artifacts)
+
+
+
+
+
+def artifacts_recorded(folder_path: os.path, patterns: List[str], manifest: Dict[str, Any]) -> bool:
+    """
+    Checks that every file of some patterns is recorded in the manifest, with the same size and not modified after its record.
+    A stage stopped in the middle (Ctrl-C, crash) can leave a half written file that is never recorded: it must not be taken as finished.
+
+    Args:
+        folder_path (str): Path of the video folder.
+        patterns (List[str]): Paths relative to the folder, glob patterns are allowed.
+        manifest (Dict[str, Any]): Manifest of the folder.
+
+    Returns:
+        bool: True if all the files are recorded and unchanged.
+    """
+    artifacts = manifest.get("artifacts", {})
+
+    for name in artifact_files(folder_path, patterns):
+        path = os.path.join(folder_path, name)
+        record = artifacts.get(name)
+        if not record or record["size"] != os.path.getsize(path) or os.path.getmtime(path) > record["timestamp"]:
+            return False
+
+    return True
+
+
+
+
+
+def artifacts_time(folder_path: os.path, patterns: List[str], manifest: Optional[Dict[str, Any]] = None, newest: bool = True) -> Optional[float]:
+    """
+    Time of the files that match some patterns: the time of their record in the manifest if they have one,
+        or their modification time (files edited by hand, or created outside the stages).
+
+    Args:
+        folder_path (str): Path of the video folder.
+        patterns (List[str]): Paths relative to the folder, glob patterns are allowed.
+        manifest (Dict[str, Any], optional): Manifest already read, to use the time of the records.
+        newest (bool): True for the most recent time, False for the oldest one.
+
+    Returns:
+        Optional[float]: Time in seconds since the epoch, None if no file matches.
+    """
+    artifacts = (manifest or {}).get("artifacts", {})
+
+    times = []
+    for name in artifact_files(folder_path, patterns):
+        modified = os.path.getmtime(os.path.join(folder_path, name))
+        record = artifacts.get(name)
+        times.append(max(record["timestamp"], modified) if record else modified)
+
+    if not times:
+        return None
+    return max(times) if newest else min(times)
@@ -0,0 +1,55 @@
+import os
+import threading
+import httpx
+from openai import OpenAI
+from Logic.Tools import params
+
+
+"""
+Client of the OpenAI API shared by every call of the process (scripts, descriptions, topics and English voices).
+
+Creating an OpenAI client for each call opened a new pool of connections (and a new TLS handshake) every time:
+    - A single client per process keeps its connections alive and reuses them between calls
+    - The client can be used by several threads at the same time (the stages and the parts of the TTS run concurrently)
+    - Timeouts, retries and maximum connections are set in params.py (OPENAI_TIMEOUT, OPENAI_MAX_RETRIES, OPENAI_MAX_CONNECTIONS)
+    - params.OPENAI_BASE_URL points the client to another server compatible with the API (ex: a local stub server for tests)
+
+Each process has its own client: the connections of a client are never shared with the worker processes created after it (fork).
+
+Functions:
+    - get_openai_client: Returns the client of the process, creating it the first time.
+"""
+
+
+openai_clients = {}  # {process id: client}
+openai_clients_lock = threading.Lock()
+
+
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Returns the OpenAI client of the process (thread-safe), creating it the first time.
+
+    Returns:
+        OpenAI: Client with a pool of keep-alive connections.
+    """
+    process_id = os.getpid()
+
+    with openai_clients_lock:
+        client = openai_clients.get(process_id)
+        if client is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=params.OPENAI_MAX_CONNECTIONS, max_keepalive_connections=params.OPENAI_MAX_CONNECTIONS),
+                timeout=httpx.Timeout(params.OPENAI_TIMEOUT, connect=10),
+            )
+            client = OpenAI(
+                api_key=params.OPENAIKEY,
+                base_url=params.OPENAI_BASE_URL or None,  # None: the official API
+                timeout=params.OPENAI_TIMEOUT,
+                max_retries=params.OPENAI_MAX_RETRIES,
+                http_client=http_client,
+            )
+            openai_clients[process_id] = client
+
+    return client
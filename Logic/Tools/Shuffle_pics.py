@@ -2,9 +2,16 @@ import os
 import random
 import datetime
 import re
-from PIL import Image
+import errno
 import shutil
 
+try:  # Reflinks are only available on Linux (ioctl FICLONE)
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from Logic.Get_Images.Images_Index import update_images_index, images_with_orientation, rename_indexed_images
+
 
 
 """
@@ -25,11 +32,17 @@ Functions:
 
 3. classify_images:
     - Classifies images into "horizontal" or "vertical" subfolders based on their aspect ratio.
-    - Handles images that are square by copying them to both subfolders.
+    - Handles images that are square by linking them to both subfolders.
 
 4. random_order:
     - Randomly shuffles the order of image files in a folder.
     - Renames images with a new date-based prefix to reflect their new order.
+
+5. link_or_copy:
+    - Creates a reflink or a hardlink to an image (same bytes on disk, no copy), copying it only if a link is not possible.
+
+The dimensions of the images come from the index of the folder (Logic/Get_Images/Images_Index.py):
+    - Each image is only opened once (reading its header), not every time it is sorted or classified
 """
 
 
@@ -73,23 +86,14 @@ def sort_by_aspect(folder_path: str) -> None:
     folder = convert_windows_path_to_wsl(folder_path)
     new_date = datetime.datetime.now().strftime("%Y-%m-%d-%s")
 
-    images = []
-    for file in os.listdir(folder):
-        file_path = os.path.join(folder, file)
-        try:
-            with Image.open(file_path) as img:
-                width, height = img.size
-                aspect_ratio = height / width
-                images.append((file, file_path, aspect_ratio))
-        except IOError:
-            pass
+    index = update_images_index(folder)
+    images = sorted(index, key=lambda file: index[file]["aspect"], reverse=True)
 
-    images.sort(key=lambda x: x[2], reverse=True)
-
-    for i, (file_name, file_path, _) in enumerate(images):
+    renames = {}
+    for i, file_name in enumerate(images):
         prefix = "HD_" if file_name.startswith("HD_") else ""
-        new_name = f"{prefix}{new_date}_{i*4+15}.jpg"
-        os.rename(file_path, os.path.join(folder, new_name))
+        renames[file_name] = f"{prefix}{new_date}_{i*4+15}.jpg"
+    rename_indexed_images(folder, renames)
 
     print("\n✅ Sorting by aspect done\n")
 
@@ -104,35 +108,88 @@ def sort_by_aspect(folder_path: str) -> None:
 def classify_images(folder_path: str) -> None:
     """
     Classifies images into subfolders according to their orientation (vertical or horizontal).
+    The orientation comes from the index of the folder, and the subfolders get hardlinks (the bytes are not duplicated).
 
     Args:
         folder_path (str): Path to the folder with the images.
     """
 
     folder = convert_windows_path_to_wsl(folder_path)  # Convert the path
-    horizontal_folder = os.path.join(folder, "horizontal")
-    vertical_folder = os.path.join(folder, "vertical")
-
-    # Create subfolders if they don't exist
-    os.makedirs(horizontal_folder, exist_ok=True)
-    os.makedirs(vertical_folder, exist_ok=True)
-
-    for file in os.listdir(folder):
-        file_path = os.path.join(folder, file)
-        try:
-            with Image.open(file_path) as img:
-                width, height = img.size
-                # Check if it's horizontal, vertical, or square
-                if width > height:
-                    shutil.copy(file_path, horizontal_folder)
-                elif height > width:
-                    shutil.copy(file_path, vertical_folder)
-                else:  # It's square
-                    shutil.copy(file_path, horizontal_folder)
-                    shutil.copy(file_path, vertical_folder)
-        except IOError:
-            pass
+    index = update_images_index(folder)
+
+    for orientation in ("horizontal", "vertical"):  # Square images go to both subfolders
+        orientation_folder = os.path.join(folder, orientation)
+        os.makedirs(orientation_folder, exist_ok=True)  # Create subfolders if they don't exist
+
+        for file in images_with_orientation(index, orientation):
+            link_or_copy(os.path.join(folder, file), os.path.join(orientation_folder, file))
+
+
+
+
+
+
+
+FICLONE = 0x40049409  # ioctl of Linux to clone the extents of a file (Btrfs, XFS...)
+
 
+def reflink(source_path: str, destination_path: str) -> bool:
+    """
+    Creates a copy-on-write clone of a file: it shares the bytes on disk with the original,
+    but it is an independent file (writing one of them does not change the other).
+
+    Args:
+        source_path (str): Path of the original file.
+        destination_path (str): Path of the clone.
+
+    Returns:
+        bool: False if the filesystem does not support reflinks (nothing is left in the destination).
+    """
+    if fcntl is None:
+        return False
+
+    try:
+        with open(source_path, "rb") as source, open(destination_path, "wb") as destination:
+            fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        if os.path.exists(destination_path):
+            os.remove(destination_path)
+        return False
+
+
+def link_or_copy(source_path: str, destination_path: str, hardlink: str = "YES") -> None:
+    """
+    Creates a reflink (where the filesystem supports it) or a hardlink to a file: the same bytes on disk, nothing is copied.
+    The file is only copied if a link is not possible (different filesystems, or a filesystem without hardlinks).
+    An existing file in the destination is replaced, like shutil.copy.
+
+    A hardlink IS the original file: it can be renamed or deleted, but it must never be overwritten in place.
+
+    Args:
+        source_path (str): Path of the original file.
+        destination_path (str): Path of the link.
+        hardlink (str, optional): If empty, no hardlink is made: reflink, or else a copy
+            (for files that may be written in place, which must stay independent from the original).
+    """
+    if os.path.exists(destination_path):
+        if os.path.samefile(source_path, destination_path):
+            return
+        os.remove(destination_path)
+
+    if reflink(source_path, destination_path):
+        return
+
+    if not hardlink:
+        shutil.copy(source_path, destination_path)
+        return
+
+    try:
+        os.link(source_path, destination_path)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP):
+            raise
+        shutil.copy(source_path, destination_path)
 
 
 
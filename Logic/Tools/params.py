@@ -7,6 +7,22 @@ ensuring secure and convenient access to various external services.
 
 # API key from OpenAI
 OPENAIKEY = os.environ.get("OPENAIKEY")
+# OpenAI API address: empty for the official API, or the URL of a compatible server (ex: a local stub server "http://localhost:8000/v1" for tests)
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "")
+# OpenAI client shared by the process: seconds to wait for an answer, retries of the SDK and maximum connections kept in the pool
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "600"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20"))
+# Maximum requests to the LLM at the same time (the scripts of all the titles of themes_production are asked together)
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "4"))
+# Seconds between checks of the status of a job of the Batch API
+LLM_BATCH_POLL_SECONDS = float(os.environ.get("LLM_BATCH_POLL_SECONDS", "60"))
+# Scripts: "YES" to receive the answer of the LLM while it is written (stopped and asked again if its structure is wrong, the script is recorded before the rest arrives)
+LLM_STREAMING = os.environ.get("LLM_STREAMING", "")
+# Streaming: times an answer with a wrong structure is asked again, maximum characters of the script and of the title and thumbnail sections
+LLM_STREAM_RETRIES = int(os.environ.get("LLM_STREAM_RETRIES", "2"))
+LLM_SCRIPT_MAX_CHARS = int(os.environ.get("LLM_SCRIPT_MAX_CHARS", "3000"))
+LLM_SECTION_MAX_CHARS = int(os.environ.get("LLM_SECTION_MAX_CHARS", "300"))
 
 #Telegram API
 TELEGRAMKEY = os.environ.get("TELEGRAMKEY")
@@ -19,3 +35,25 @@ ELEVENLABS_KEY = os.environ.get("ELEVENLABS_API")
 Pexels_key = os.environ.get("Pexels_key")
 Unsplash_key = os.environ.get("Unsplash_key")
 Pixaby_key = os.environ.get("Pixaby_key")
+
+
+# Caches (folders outside the project, shared by all the influencers)
+CACHE_FOLDER = os.environ.get("SOCIALMEDIA_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "SocialMedia"))
+TTS_CACHE_MAX_MB = int(os.environ.get("TTS_CACHE_MAX_MB", "2000"))
+# Cache of the answers of the LLM: days an answer can be used, maximum size, and "YES" to always ask the LLM (ignore the cache)
+LLM_CACHE_TTL_DAYS = float(os.environ.get("LLM_CACHE_TTL_DAYS", "30"))
+LLM_CACHE_MAX_MB = float(os.environ.get("LLM_CACHE_MAX_MB", "200"))
+LLM_CACHE_BYPASS = os.environ.get("LLM_CACHE_BYPASS", "")
+
+
+# Subtitles: "YES" to create them from the parts of the TTS (no Whisper transcription), empty to transcribe the audio
+FAST_SUBTITLES = os.environ.get("FAST_SUBTITLES", "")
+
+# Folders: "YES" to create stable folders "ID-N" (state, date and title in their manifest.json), empty for "ID-N_State_Date_Title"
+STABLE_FOLDERS = os.environ.get("STABLE_FOLDERS", "")
+
+# Images: maximum resolution of the downloaded images, as "width x height" of a vertical image (ex: "1080x1920"), empty to keep the originals
+IMAGES_MAX_SIZE = os.environ.get("IMAGES_MAX_SIZE", "")
+# Images of the videos: "YES" to hardlink them to the database when no reflink is possible (only if the editing never writes the images in place),
+# empty to copy them (a hardlink IS the image of clean_data: a change in the video folder would change the database)
+HARDLINK_VIDEO_IMAGES = os.environ.get("HARDLINK_VIDEO_IMAGES", "")
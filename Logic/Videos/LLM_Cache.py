@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import closing
+from typing import Any, Dict, Optional
+from Logic.Tools import params
+
+
+"""
+Disk cache for the answers of the LLM (llm_cache.sqlite in the cache folder, shared by all the influencers).
+
+The requests to the LLM always use temperature 0: the same instructions give the same answer.
+Re-running a night that failed, re-editing a video or making the English copy asked the LLM again and paid again.
+Each answer is saved under a hash of everything that changes it: model, system instructions, request and settings
+    - If the request was already answered, the LLM is not called
+    - Answers older than LLM_CACHE_TTL_DAYS are not used (the models and the prompts change)
+    - When the cache exceeds LLM_CACHE_MAX_MB, the answers used least recently are deleted
+    - params.LLM_CACHE_BYPASS = "YES" always asks the LLM (the new answers are still saved)
+
+Functions:
+    - llm_cache_key: Builds the key of an answer from the model, instructions, request and settings.
+    - get_cached_response: Returns the answer of a key if it is in the cache and not expired.
+    - save_cached_response: Saves an answer in the cache and deletes the oldest ones if the cache is too big.
+    - forget_cached_response: Deletes an answer that turned out to be wrong (ex: a script that could not be recorded).
+    - evict_llm_cache: Deletes the expired answers and the least recently used ones until the cache fits in its maximum size.
+"""
+
+
+LLM_CACHE_FILE = os.path.join(params.CACHE_FOLDER, "llm_cache.sqlite")
+
+
+
+
+def llm_cache_key(model: str, system_instructions: str, request_instructions: str, settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Builds the key of an answer.
+
+    Args:
+        model (str): Model of the LLM (for example "gpt-4-turbo").
+        system_instructions (str): Instructions of the system.
+        request_instructions (str): Request of the user.
+        settings (Dict[str, Any], optional): Any other parameter that changes the answer (temperature...).
+
+    Returns:
+        str: SHA-256 of all the parameters.
+    """
+    content = json.dumps(
+        {"model": model, "system": system_instructions, "user": request_instructions, "settings": settings or {}},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+
+
+
+def connect_llm_cache() -> sqlite3.Connection:
+    """
+    Opens the cache, creating it the first time.
+
+    Returns:
+        sqlite3.Connection: Connection to the cache (one per call: threads and processes can use the cache at the same time).
+    """
+    os.makedirs(params.CACHE_FOLDER, exist_ok=True)
+
+    connection = sqlite3.connect(LLM_CACHE_FILE, timeout=30)
+    with connection:
+        connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                  key TEXT PRIMARY KEY,
+                                  model TEXT,
+                                  response TEXT NOT NULL,
+                                  size INTEGER NOT NULL,
+                                  created REAL NOT NULL,
+                                  last_used REAL NOT NULL)""")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    return connection
+
+
+
+
+
+def get_cached_response(key: str, ttl_days: float = params.LLM_CACHE_TTL_DAYS) -> Optional[str]:
+    """
+    Returns the answer of a key if it is in the cache and it is not older than ttl_days.
+
+    Args:
+        key (str): Key built with llm_cache_key.
+        ttl_days (float): Days an answer can be used.
+
+    Returns:
+        Optional[str]: Answer of the LLM, or None if it is not in the cache (or it expired).
+    """
+    now = time.time()
+
+    with closing(connect_llm_cache()) as connection:
+        row = connection.execute("SELECT response FROM responses WHERE key = ? AND created >= ?", (key, now - ttl_days * 86400)).fetchone()
+        if row is None:
+            return None
+
+        with connection:
+            connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))  # Mark as recently used
+
+    print("♻️ Answer found in the LLM cache")
+    return row[0]
+
+
+
+
+
+def save_cached_response(key: str, model: str, response: str) -> None:
+    """
+    Saves an answer in the cache and deletes the oldest ones if the cache is too big.
+
+    Args:
+        key (str): Key built with llm_cache_key.
+        model (str): Model that gave the answer.
+        response (str): Answer of the LLM.
+    """
+    now = time.time()
+
+    with closing(connect_llm_cache()) as connection:
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, model, response, len(response.encode("utf-8")), now, now))
+        evict_llm_cache(connection)
+
+
+
+
+
+def forget_cached_response(response: str) -> int:
+    """
+    Deletes an answer from the cache, so the next identical request asks the LLM again.
+    Used when an answer turned out to be wrong (ex: a script too short to be recorded).
+
+    Args:
+        response (str): Answer of the LLM (as saved in the files of the video).
+
+    Returns:
+        int: Number of answers deleted.
+    """
+    with closing(connect_llm_cache()) as connection:
+        with connection:
+            return connection.execute("DELETE FROM responses WHERE response = ?", (response,)).rowcount
+
+
+
+
+
+def evict_llm_cache(connection: sqlite3.Connection, max_megabytes: float = params.LLM_CACHE_MAX_MB,
+                    ttl_days: float = params.LLM_CACHE_TTL_DAYS) -> None:
+    """
+    Deletes the expired answers, and the least recently used ones until the cache fits in its maximum size.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the cache.
+        max_megabytes (float): Maximum size of the answers in MB.
+        ttl_days (float): Days an answer can be used.
+    """
+    max_size = max_megabytes * 1024 * 1024
+
+    with connection:
+        connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - ttl_days * 86400,))
+
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= max_size:
+            return
+
+        expired_keys = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY last_used"):  # Least recently used first
+            if total_size <= max_size:
+                break
+            expired_keys.append((key,))
+            total_size -= size
+
+        connection.executemany("DELETE FROM responses WHERE key = ?", expired_keys)
@@ -1,11 +1,15 @@
 import os
+import json
 import time
 import threading
 import sys
+from contextlib import contextmanager
 from datetime import datetime
-from openai import OpenAI
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from Logic.Tools import params
-from Logic.Videos.Script_Logic import checking_theme
+from Logic.Tools.OpenAI_Clients import get_openai_client
+from Logic.Videos.LLM_Cache import llm_cache_key, get_cached_response, save_cached_response, forget_cached_response
+from Logic.Videos.Script_Logic import checking_theme, script_from_section, SCRIPT_PARTS
 
 """
 Script to interact with an LLM to obtain scripts and descriptions optimized for SEO. Includes the following functions:
@@ -13,47 +17,101 @@ Script to interact with an LLM to obtain scripts and descriptions optimized for
     To interact with GPT:
         - show_timer: Displays a timer in the console while waiting for the LLM response.
         - LLM_OpenAI_GPT: Interacts with the OpenAI GPT model to get a response based on the given instructions.
+            (thread-safe: at most params.LLM_CONCURRENCY requests at the same time, so the scripts of many titles can be asked together)
+            (answers are saved in the LLM cache: the same request is never paid twice, see LLM_Cache.py)
+        - cached_LLM_response: Answer of a request if it is already in the LLM cache.
+
+    Streaming mode for the scripts (params.LLM_STREAMING = "YES"):
+        - ScriptStreamParser: Checks the structure of the script (5 sections separated by $$$$) while the LLM writes it.
+        - stream_LLM_answer: Receives the answer in pieces: a wrong answer is stopped as soon as it is clearly wrong and asked again
+            (ex: the script section is longer than params.LLM_SCRIPT_MAX_CHARS, more than 5 sections...)
+        - As soon as the script section is finished, its sentences are recorded (prerecord_script) while the LLM writes
+          the title, thumbnail, footer and keywords: the audios wait in the TTS cache for audio_recording
     
     To get Script:
         - get_script_from_LLM: Gets scripts from an LLM and saves them in specific files.
+        - save_script: Saves the answer of the LLM in text.txt (and the theme in theme.txt).
+        - script_structure_error: Checks that a script has its 5 sections: answers without them are never saved in the LLM cache.
         
     To get Video Description:
         - get_description_from_LLM: Gets a description to maximize SEO and saves it in the corresponding file.
+        - save_description: Saves the answer of the LLM in footer.txt (the previous footer is kept in footer_PRE.txt).
     
     To get new Topics for videos:
         - get_topics_for_videos_from_LLM
+
+    Offline mode (Batch API: half the price per token, answers within 24 hours, nothing waits for the LLM in the production):
+        - collect_batch_requests: While active, get_script_from_LLM and get_description_from_LLM save their request instead of calling the LLM.
+        - submit_LLM_batch: Sends all the requests collected in a single batch job (the job is saved in a file to be resumed).
+        - wait_for_LLM_batch: Waits for the batch job and saves each answer in its folder (text.txt or footer.txt).
+        - The client can be pointed to a local stub server of the API with params.OPENAI_BASE_URL.
 """
 
 
-timer_active = False
+llm_semaphore = threading.BoundedSemaphore(params.LLM_CONCURRENCY)  # Requests to the LLM at the same time in this process
+batch_requests = None  # List of requests while collect_batch_requests is active
+LLM_SETTINGS = {"temperature": 0, "frequency_penalty": 0, "presence_penalty": 0}  # Same answer for the same request: answers can be cached
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+SHORT_SECTIONS = {1: "title", 2: "thumbnail"}  # Sections of a script limited to params.LLM_SECTION_MAX_CHARS
+
 
-def show_timer() -> None:
+def show_timer(stop_event: threading.Event) -> None:
     """
-    Displays a timer in the console while timer_active is True.
+    Displays a timer in the console until stop_event is set.
     """
-    global timer_active
-    timer_active = True
     start = time.time()
-    while timer_active:
+    while not stop_event.is_set():
         elapsed_time = time.time() - start
         sys.stdout.write(f"\rResponse time: {elapsed_time:.2f} seconds")
         sys.stdout.flush()
-        time.sleep(1)
+        stop_event.wait(1)
 
 
 
 
-def LLM_OpenAI_GPT(system_instructions_LLM: str, specific_request_instructions: str, GPT_model: str = "gpt-4-turbo") -> str:
+def cached_LLM_response(system_instructions_LLM: str, specific_request_instructions: str, GPT_model: str = "gpt-4-turbo",
+                        bypass_cache: str = params.LLM_CACHE_BYPASS) -> Optional[str]:
+    """
+    Answer of a request if it is already in the LLM cache.
+
+    :param system_instructions_LLM: General instructions for the system.
+    :param specific_request_instructions: Specific instructions for the video.
+    :param GPT_model: GPT model to use.
+    :param bypass_cache: If not empty, the cache is not read (always None).
+    :return: Answer saved, or None if the LLM has to be asked.
+    """
+    if bypass_cache:
+        return None
+    return get_cached_response(llm_cache_key(GPT_model, system_instructions_LLM, specific_request_instructions, LLM_SETTINGS))
+
+
+
+
+
+def LLM_OpenAI_GPT(system_instructions_LLM: str, specific_request_instructions: str, GPT_model: str = "gpt-4-turbo",
+                   bypass_cache: str = params.LLM_CACHE_BYPASS, stream_parser: Optional["ScriptStreamParser"] = None,
+                   streaming: str = "YES") -> str:
     """
     Interacts with the OpenAI GPT model to get a response based on the given instructions.
+    If the same request was already answered, the answer is taken from the LLM cache.
 
     :param system_instructions_LLM: General instructions for the system.
     :param specific_request_instructions: Specific instructions for the video.
     :param GPT_model: GPT model to use (default is "gpt-4-turbo").
+    :param bypass_cache: If not empty, the LLM is always asked (the new answer is still saved in the cache).
+    :param stream_parser: If given, the structure of the answer is checked: answers with a wrong structure are never saved in the cache.
+    :param streaming: With stream_parser, if not empty the answer is received in streaming mode and checked while it is written
+        (stream_LLM_answer: only answers with a correct structure are returned). If empty, a wrong answer is returned but not cached.
     :return: GPT model response.
     """
-    global timer_active
-    client = OpenAI(api_key=params.OPENAIKEY)
+    cached_response = cached_LLM_response(system_instructions_LLM, specific_request_instructions, GPT_model, bypass_cache)
+    if cached_response is not None:
+        if stream_parser is None or stream_parser.check_answer(cached_response) is None:
+            return cached_response
+        print("\n⚠️ The answer of the LLM cache does not have the structure of a script: asking the LLM again")
+        forget_cached_response(cached_response)
+
+    client = get_openai_client()  # Shared by every call: the connections are reused
     
     message_history = [
         {
@@ -66,33 +124,211 @@ def LLM_OpenAI_GPT(system_instructions_LLM: str, specific_request_instructions:
         }
     ]
 
-    timer_thread = threading.Thread(target=show_timer)
-    timer_thread.start()
+    timer_stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():  # The timers of concurrent requests would be mixed in the console
+        threading.Thread(target=show_timer, args=(timer_stop,), daemon=True).start()
 
-    chat_completion = client.chat.completions.create(
-        model=GPT_model,
-        messages=message_history,
-        temperature=0,
-        frequency_penalty=0,
-        presence_penalty=0,
-    )
-    timer_active = False
-    
-    response = chat_completion.choices[0].message.content
+    try:
+        with llm_semaphore:
+            if stream_parser is None or not streaming:
+                chat_completion = client.chat.completions.create(
+                    model=GPT_model,
+                    messages=message_history,
+                    **LLM_SETTINGS,
+                )
+                response = chat_completion.choices[0].message.content
+            else:
+                response = stream_LLM_answer(client, GPT_model, message_history, stream_parser)
+    finally:
+        timer_stop.set()  # Also if the request fails: the timer never keeps running
+
+    if stream_parser is not None and not streaming:
+        error = stream_parser.check_answer(response)
+        if error:  # Not cached: the same request asks the LLM again (treat_script stops the video)
+            print(f"\n⚠️ The answer of the LLM does not have the structure of a script ({error}): it is not saved in the LLM cache")
+            return response
+
+    save_cached_response(llm_cache_key(GPT_model, system_instructions_LLM, specific_request_instructions, LLM_SETTINGS), GPT_model, response)
     return response
 
 
 
 
 
-def get_script_from_LLM(video_folder: str, title: str, clean_data_folder: os.path, system_instructions_video_script_LLM: str) -> None:
+class ScriptStreamParser:
+    """
+    Checks the structure of the answer of a script while the LLM writes it:
+        "script $$$$ title $$$$ thumbnail $$$$ footer $$$$ keywords" (the structure that treat_script separates)
+
+    The answer is clearly wrong (no need to wait for the rest) if:
+        - The script section is longer than script_max_chars (the LLM forgot the $$$$ or did not stop writing)
+        - The title or the thumbnail section is longer than section_max_chars
+        - There are more than 5 sections
+    When the answer is finished, it must have exactly 5 sections.
+
+    on_script is called with the text of the script (as saved in script.txt) as soon as the script section is finished,
+        once per attempt: it must return quickly, the answer is still arriving.
+    on_reject is called if an answer whose script was already sent to on_script turns out to be wrong
+        (ex: to stop recording a script that will not be used).
+    """
+
+    def __init__(self, on_script: Optional[Callable[[str], None]] = None, on_reject: Optional[Callable[[], None]] = None,
+                 script_max_chars: int = params.LLM_SCRIPT_MAX_CHARS, section_max_chars: int = params.LLM_SECTION_MAX_CHARS) -> None:
+        self.on_script = on_script
+        self.on_reject = on_reject
+        self.script_max_chars = script_max_chars
+        self.section_max_chars = section_max_chars
+        self.script_sent = False
+        self.text = ""
+
+
+    def reset(self) -> None:
+        """
+        Starts a new answer (new attempt): its script is sent again to on_script when its section is finished.
+        """
+        self.text = ""
+        self.script_sent = False
+
+
+    def reject(self, reason: str) -> str:
+        """
+        Marks the current answer as wrong, calling on_reject if its script was already sent.
+
+        :param reason: Reason why the answer is wrong.
+        :return: The same reason.
+        """
+        if self.script_sent and self.on_reject is not None:
+            self.on_reject()
+        return reason
+
+
+    def feed(self, piece: str) -> Optional[str]:
+        """
+        Adds a piece of the answer and checks the structure of the answer so far.
+
+        :param piece: New text of the answer.
+        :return: Reason why the answer is wrong, or None if it can still be correct.
+        """
+        self.text += piece
+        sections = self.text.split("$$$$")
+        current_section = len(sections) - 1
+
+        if current_section >= SCRIPT_PARTS:
+            return self.reject(f"more than {SCRIPT_PARTS} sections separated by $$$$")
+        if current_section == 0 and len(sections[0]) > self.script_max_chars:
+            return self.reject(f"the script section is longer than {self.script_max_chars} characters")
+        if current_section in SHORT_SECTIONS and len(sections[-1].strip()) > self.section_max_chars:
+            return self.reject(f"the {SHORT_SECTIONS[current_section]} section is longer than {self.section_max_chars} characters")
+
+        if current_section > 0 and not self.script_sent:  # The script section is finished
+            script = script_from_section(sections[0])
+            if not script:
+                return self.reject("the script section is empty")
+            self.script_sent = True
+            if self.on_script is not None:
+                self.on_script(script)
+
+        return None
+
+
+    def finish(self) -> Optional[str]:
+        """
+        Checks the complete answer.
+
+        :return: Reason why the answer is wrong, or None if it has the structure of a script.
+        """
+        number_of_sections = len(self.text.split("$$$$"))
+        if number_of_sections != SCRIPT_PARTS:
+            return self.reject(f"{number_of_sections} sections separated by $$$$ instead of {SCRIPT_PARTS}")
+        return None
+
+
+    def check_answer(self, answer: str) -> Optional[str]:
+        """
+        Checks a complete answer received at once (ex: from the LLM cache).
+
+        :param answer: Answer of the LLM.
+        :return: Reason why the answer is wrong, or None if it has the structure of a script.
+        """
+        self.reset()
+        return self.feed(answer) or self.finish()
+
+
+
+
+
+def script_structure_error(answer: str) -> Optional[str]:
+    """
+    Checks the structure of a complete script answer (5 sections separated by $$$$, see ScriptStreamParser).
+
+    :param answer: Answer of the LLM.
+    :return: Reason why the answer is wrong, or None if it has the structure of a script.
+    """
+    return ScriptStreamParser().check_answer(answer)
+
+
+
+
+
+def stream_LLM_answer(client: Any, GPT_model: str, message_history: List[Dict[str, str]], stream_parser: ScriptStreamParser,
+                      retries: int = params.LLM_STREAM_RETRIES) -> str:
+    """
+    Receives the answer of the LLM in pieces, checking its structure with stream_parser while it is written.
+    As soon as the answer is clearly wrong the stream is closed (the LLM stops writing it) and the request is sent again.
+
+    :param client: OpenAI client.
+    :param GPT_model: GPT model to use.
+    :param message_history: Messages of the request.
+    :param stream_parser: Parser of the structure of the answer.
+    :param retries: Times a wrong answer is asked again.
+    :return: Answer of the LLM with a correct structure.
+    """
+    for attempt in range(1, retries + 2):
+        stream_parser.reset()
+        stream = client.chat.completions.create(
+            model=GPT_model,
+            messages=message_history,
+            stream=True,
+            **LLM_SETTINGS,
+        )
+
+        error = None
+        try:
+            for chunk in stream:
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    error = stream_parser.feed(piece)
+                    if error:
+                        break
+        finally:
+            stream.close()  # Also when the answer is stopped: the connection returns to the pool
+
+        error = error or stream_parser.finish()
+        if error is None:
+            return stream_parser.text
+
+        print(f"\n⚠️ Wrong answer of the LLM (attempt {attempt} of {retries + 1}): {error}")
+
+    raise ValueError(f"\n❌ The LLM did not answer with the structure of a script after {retries + 1} attempts: {error}")
+
+
+
+
+
+def get_script_from_LLM(video_folder: str, title: str, clean_data_folder: os.path, system_instructions_video_script_LLM: str,
+                        Influencer: object = None, streaming: str = params.LLM_STREAMING) -> None:
     """
     Gets scripts from an LLM and saves them in specific files.
 
+    Streaming mode: the structure of the answer is checked while it is written (wrong answers are asked again),
+        and if the Influencer is given, the script is recorded while the LLM writes the rest of the answer.
+
     :param video_folder: Folder where the video will be saved.
     :param title: Title of the video including the theme.
     :param clean_data_folder: Folder where clean data is stored.
     :param system_instructions_video_script_LLM: Specific instructions for the LLM regarding the video.
+    :param Influencer: Influencer object, to record the script in advance (streaming mode).
+    :param streaming: If not empty, the answer is received in streaming mode.
     """
     
     # Check that the theme is legitimate
@@ -100,21 +336,75 @@ def get_script_from_LLM(video_folder: str, title: str, clean_data_folder: os.pat
     video_title = video_title.strip()
     theme = theme.strip()
     checking_theme(theme, specified_folder=clean_data_folder)
+
+    if batch_requests is not None:  # Offline mode: the script is written when the batch job finishes (unless it is in the cache)
+        response = cached_LLM_response(system_instructions_video_script_LLM, video_title, "gpt-4-turbo")
+        if response is not None and script_structure_error(response):  # Broken answer of the cache: asked again in the batch
+            forget_cached_response(response)
+            response = None
+        if response is None:
+            batch_requests.append({"kind": "script", "folder": video_folder, "theme": theme, "model": "gpt-4-turbo",
+                                   "system": system_instructions_video_script_LLM, "user": video_title})
+            return
+        save_script(video_folder, theme, response)
+        return
   
     # Write Script
     print(f"\n🔄 Writing script for the theme {theme}...\n")
-    response = LLM_OpenAI_GPT(system_instructions_video_script_LLM, specific_request_instructions=video_title, GPT_model="gpt-4-turbo")
-    
-    # Save Script:
+    if not streaming:  # The structure is only checked when the answer is complete (wrong answers are not cached)
+        response = LLM_OpenAI_GPT(system_instructions_video_script_LLM, specific_request_instructions=video_title, GPT_model="gpt-4-turbo",
+                                  stream_parser=ScriptStreamParser(), streaming="")
+        save_script(video_folder, theme, response)
+        return
+
+    recordings = []  # (thread, cancel event) of each recording of the script while the rest of the answer arrives
+
+    def record_script(script: str) -> None:
+        from Logic.Voiceover.Narration import prerecord_script
+        cancel = threading.Event()
+        recording = threading.Thread(target=prerecord_script, args=(script, Influencer, cancel))
+        recording.start()
+        recordings.append((recording, cancel))
+
+    def cancel_recording() -> None:  # The answer was rejected: its sentences not started yet are not recorded
+        recordings[-1][1].set()
+
+    stream_parser = ScriptStreamParser(
+        on_script=record_script if Influencer is not None else None,
+        on_reject=cancel_recording if Influencer is not None else None,
+    )
+    response = None
+    try:
+        response = LLM_OpenAI_GPT(system_instructions_video_script_LLM, specific_request_instructions=video_title, GPT_model="gpt-4-turbo",
+                                  stream_parser=stream_parser)
+    finally:
+        for recording, cancel in recordings:  # The stages of the video start after the recording: the parts are never recorded twice at the same time
+            if response is None:  # The LLM failed: the script will not be used
+                cancel.set()
+            recording.join()
+    save_script(video_folder, theme, response)
+
+
+
+
+
+def save_script(video_folder: os.path, theme: str, response: str) -> None:
+    """
+    Saves the script of the LLM in text.txt and the theme in theme.txt.
+
+    :param video_folder: Folder where the video will be saved.
+    :param theme: Theme of the video (folder of images).
+    :param response: Answer of the LLM.
+    """
+    # Save Script (text.txt is written last and replaced at once: if it exists, the script is complete)
     text_file = os.path.join(video_folder, "text.txt")
     theme_file = os.path.join(video_folder, "theme.txt")
-    with open(text_file, "w") as file:
-        file.write(response)
     with open(theme_file, "w") as file_t:
         file_t.write(theme)
-    print("\n\n🐒 Script successfully saved")
-    print("\nWait 2 seconds to save the scripts...")
-    time.sleep(2)
+    with open(f"{text_file}.tmp", "w") as file:
+        file.write(response)
+    os.replace(f"{text_file}.tmp", text_file)
+    print("\n\n🐒 Script successfully saved")  # The files are closed (written) when the with blocks end: no need to wait
 
 
 
@@ -140,18 +430,39 @@ def get_description_from_LLM(video_folder: os.path, system_instructions_descript
     # Get Footer
     title = open(os.path.join(video_folder, "title.txt"), "r").read().strip()        
     video_metadata = f"Title: {title}"
+
+    if batch_requests is not None:  # Offline mode: the description is written when the batch job finishes (unless it is in the cache)
+        response = cached_LLM_response(system_instructions_description_LLM, video_metadata, "gpt-4-turbo")
+        if response is None:
+            batch_requests.append({"kind": "description", "folder": video_folder, "model": "gpt-4-turbo",
+                                   "system": system_instructions_description_LLM, "user": video_metadata})
+            return None
+        save_description(video_folder, response)
+        return None
+
     print(f"\n🔄 Writing description for the video {title}...\n")
     response = LLM_OpenAI_GPT(system_instructions_description_LLM, specific_request_instructions=video_metadata, GPT_model="gpt-4-turbo")
     print("\n\n🧠 New description created")
-    
+    save_description(video_folder, response)
+
+
+
+
+
+def save_description(video_folder: os.path, response: str) -> None:
+    """
+    Saves the description of the LLM in footer.txt, keeping the previous footer in footer_PRE.txt.
+
+    :param video_folder: Folder where the video is saved.
+    :param response: Answer of the LLM.
+    """
     # Add AI Voice disclaimer
     response += "\n ---- \n Voice in the video is AI Generated from a script I provided to a TTS Model \n ---"
     
     # Saving logic
         # Rename keyword file PART 1 (save to variable)
     with open(os.path.join(video_folder, "footer.txt"), 'r') as file:
-        previous_keywords = file.readlines()
-    time.sleep(1)  # ensure enough time to read the file into the variable
+        previous_keywords = file.readlines()  # Read completely before the file is opened again to write it
         # Save new keyword file
     with open(os.path.join(video_folder, "footer.txt"), "w") as file:
         file.write(response)   
@@ -165,6 +476,141 @@ def get_description_from_LLM(video_folder: os.path, system_instructions_descript
 
 
 
+#### Offline mode: Batch API
+
+@contextmanager
+def collect_batch_requests() -> Iterator[List[Dict[str, Any]]]:
+    """
+    While active, get_script_from_LLM and get_description_from_LLM save their request in the list instead of calling the LLM.
+    The influencers build their instructions as always (Influencer.main_ScriptGPT, Influencer.get_keywords).
+
+    :return: List where the requests are collected.
+    """
+    global batch_requests
+    batch_requests = []
+    try:
+        yield batch_requests
+    finally:
+        batch_requests = None
+
+
+
+
+
+def submit_LLM_batch(requests: List[Dict[str, Any]], job_file: os.path) -> Dict[str, Any]:
+    """
+    Sends the requests in a single batch job of the Batch API.
+    The job (id of the batch and the requests with their folders) is saved in job_file, so it can be resumed after a restart.
+
+    :param requests: Requests collected with collect_batch_requests.
+    :param job_file: JSON file where the job is saved.
+    :return: Job saved.
+    """
+    client = get_openai_client()
+
+    batch_file = f"{os.path.splitext(job_file)[0]}_requests.jsonl"
+    with open(batch_file, "w", encoding="utf-8") as file:
+        for i, request in enumerate(requests):
+            request["custom_id"] = f"{request['kind']}-{i}"
+            line = {
+                "custom_id": request["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": request["model"],
+                    "messages": [
+                        {"role": "system", "content": request["system"]},
+                        {"role": "user", "content": request["user"]},
+                    ],
+                    **LLM_SETTINGS,
+                },
+            }
+            file.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    with open(batch_file, "rb") as file:
+        input_file = client.files.create(file=file, purpose="batch")
+    batch = client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window="24h")
+    os.remove(batch_file)
+
+    job = {"batch_id": batch.id, "submitted": datetime.now().strftime("%Y-%m-%d-%H-%M-%S"), "requests": requests}
+    with open(f"{job_file}.tmp", "w", encoding="utf-8") as file:
+        json.dump(job, file, ensure_ascii=False, indent=4)
+    os.replace(f"{job_file}.tmp", job_file)
+
+    print(f"\n📦 Batch {batch.id} sent with {len(requests)} requests")
+    return job
+
+
+
+
+
+def wait_for_LLM_batch(job_file: os.path, poll_seconds: float = params.LLM_BATCH_POLL_SECONDS) -> List[Dict[str, Any]]:
+    """
+    Waits for the batch job saved in job_file and saves each answer in its folder:
+        - Scripts in text.txt (save_script), descriptions in footer.txt (save_description)
+    The job file is deleted when the batch is finished (completed, failed, expired or cancelled).
+
+    :param job_file: JSON file of the job (created by submit_LLM_batch).
+    :param poll_seconds: Seconds between checks of the status of the batch.
+    :return: Requests of the job, each one with "saved" (True if its answer was saved in its folder).
+    """
+    client = get_openai_client()
+
+    with open(job_file, "r", encoding="utf-8") as file:
+        job = json.load(file)
+
+    batch = client.batches.retrieve(job["batch_id"])
+    while batch.status not in BATCH_FINAL_STATUSES:
+        counts = batch.request_counts
+        progress = f"{counts.completed + counts.failed} of {counts.total}" if counts else "waiting"
+        print(f"\r⏳ Batch {batch.id}: {batch.status} ({progress})", end="")
+        time.sleep(poll_seconds)
+        batch = client.batches.retrieve(job["batch_id"])
+
+    print(f"\n📦 Batch {batch.id} {batch.status}")
+
+    answers = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if line.strip():
+                result = json.loads(line)
+                answers[result["custom_id"]] = result
+
+    saved = 0
+    for request in job["requests"]:
+        request["saved"] = False
+        result = answers.get(request["custom_id"], {})
+        response = result.get("response") or {}
+        folder = request["folder"]
+
+        if response.get("status_code") != 200:
+            print(f"\n❌ No answer for the {request['kind']} of {folder}: {result.get('error') or response.get('body') or batch.status}")
+            continue
+        if not os.path.isdir(folder):
+            print(f"\n⚠️ The folder of the {request['kind']} does not exist anymore: {folder}")
+            continue
+
+        content = response["body"]["choices"][0]["message"]["content"]
+        if request["kind"] != "script" or not script_structure_error(content):  # Broken scripts are not cached (treat_script stops them)
+            save_cached_response(llm_cache_key(request["model"], request["system"], request["user"], LLM_SETTINGS), request["model"], content)
+        if request["kind"] == "script":
+            save_script(folder, request["theme"], content)
+        else:
+            save_description(folder, content)
+        request["saved"] = True
+        saved += 1
+
+    os.remove(job_file)
+    print(f"\n✅ {saved} of {len(job['requests'])} answers of the batch saved\n")
+    return job["requests"]
+
+
+
+
+
+
 # Get Topics for Future Videos   
 
 def verify_correct_topics(filename: str, management_folder: os.path, clean_data_folder: os.path) -> None:
@@ -1,6 +1,7 @@
 import re
 import os
 import sys
+from typing import Optional
 from Logic.Tools.Folders import update_folder_status
 
 
@@ -9,15 +10,49 @@ from Logic.Tools.Folders import update_folder_status
 Manage and handle scripts coming from an LLM. Includes the following functions:
 
     - treat_script: Processes a script and its footer, separating and saving its components in separate files.
+    - clean_LLM_text: Removes the unwanted characters that the LLM adds to its answers.
+    - script_from_section: Text of the script (script.txt) from the first section of the answer of the LLM.
     - checking_theme: Checks that the video theme corresponds to a photo folder, avoiding failures during recording and API calls if the folder does not exist.
     - GPT_script_main: Main function to manage and handle scripts coming from an LLM, creating and updating folders as needed.
 """
 
 
+SCRIPT_PARTS = 5  # Sections of the answer of the LLM separated by $$$$: script, title, thumbnail, footer and keywords
+UNWANTED_CHARACTERS = ('"', '{', '}', '<', '>')
 
-def treat_script() -> None:
+
+
+
+def clean_LLM_text(text: str) -> str:
+    """
+    Removes the unwanted characters that the LLM adds to its answers (quotes and the brackets of the template).
+    """
+    for character in UNWANTED_CHARACTERS:
+        text = text.replace(character, '')
+    return text
+
+
+
+
+
+def script_from_section(section: str) -> str:
+    """
+    Text of the script (as saved in script.txt) from the first section of the answer of the LLM.
+    Used by treat_script, and to record the script while the LLM is still writing the rest of the answer.
+    """
+    script = clean_LLM_text(section).strip()
+    return script.replace('#', '')
+
+
+
+
+
+def treat_script() -> Optional[str]:
     """
     Processes a script and its footer, separating and saving its components in separate files.
+
+    Returns:
+        Optional[str]: "STOP" if the answer of the LLM does not have its 5 parts (same convention as audio_recording), otherwise None.
     """
 
     def separate_script_and_footer_and_save(text: str) -> None:
@@ -26,19 +61,14 @@ def treat_script() -> None:
         """
 
         # Clean up possible issues from the LLM: unwanted characters
-        text = text.replace('"', '') 
-        text = text.replace('{', '')
-        text = text.replace('}', '')
-        text = text.replace('<', '')
-        text = text.replace('>', '')
+        text = clean_LLM_text(text)
         
         # Separate text into parts        
         parts = text.split('$$$$')
-        if len(parts) != 5:
+        if len(parts) != SCRIPT_PARTS:
             raise ValueError("\n❌ The code could not be separated correctly.\n")
         script, title, thumbnail, footer, seo = parts
-        script = script.strip()
-        script = script.replace('#', '')
+        script = script_from_section(script)
         footer = footer.strip()
         title = title.strip()
         thumbnail = thumbnail.strip()
@@ -70,10 +100,14 @@ def treat_script() -> None:
             text = file.read()
             separate_script_and_footer_and_save(text)
             print("\n✅ The script and the footer have been saved correctly.\n")
-    except ValueError as e:
+    except ValueError as e:  # The script is useless: the production of the video stops (instead of failing later without script.txt)
         print(e)
+        return "STOP"
     except Exception as e:
         print("An error occurred:", e)
+        raise
+
+    return None
 
 
 
@@ -75,7 +75,9 @@ def process_option(folder: os.path, Influencer: object) -> bool:
         from Logic.Voiceover.Subtitles import phonetic_correction
         from Logic.Videos.Script_Logic import treat_script
         from Logic.Voiceover.Narration import audio_recording
-        treat_script()
+        if treat_script() == "STOP":  # The text.txt does not have its 5 parts: correct it before recording
+            process_option(folder, Influencer)  # recursion
+            return True
         folder = set_folder_name(folder)
         phonetic_correction()
         audio_recording(Influencer)
@@ -109,8 +111,7 @@ def update_level(old_folder: os.path, Influencer: object) -> str:
         str: New path to the folder.
     """
     new_folder = update_folder_status(old_folder)
-    os.chdir(new_folder)  # change to the new folder
-    time.sleep(2)  # give time to change cwd
+    os.chdir(new_folder)  # change to the new folder (the rename is already done when update_folder_status returns)
     process_option(new_folder, Influencer)
 
 
@@ -1,7 +1,9 @@
 import os
-import shutil
-import random
-from Logic.Tools.Shuffle_pics import random_order
+import json
+import datetime
+from Logic.Tools import params
+from Logic.Tools.Shuffle_pics import link_or_copy
+from Logic.Get_Images.Images_Catalog import select_images
 
 
 
@@ -9,18 +11,31 @@ from Logic.Tools.Shuffle_pics import random_order
 """
 Script to add multimedia content to videos
 
-For now, it only handles images
+For now, it only handles images:
+    - The images of the video are reflinks to the images of the database (Clean Data Folder), not copies:
+      the same photo used in hundreds of videos is stored only once, but each video can change its images without changing the database
+    - Without reflinks (filesystem that does not support them) they are copied; hardlinks only with params.HARDLINK_VIDEO_IMAGES,
+      when the editing is known to never write the images in place (a hardlink shares the file with clean_data)
+    - The selection is also saved in images.json, in the video folder (order of the images and original file of each one),
+      so the images can be read from the database without the files of the video folder
+    - The images of each theme come from the catalog of images (Images_Catalog.py): the theme folder is not listed for every video,
+      and the images used in fewer videos are preferred
 """
 
 
+IMAGES_PER_VIDEO = 30
+SELECTION_FILE = "images.json"
+
+
 def video_photos_selector(video_folder: os.path, clean_data_folder: os.path) -> None:
     """
-    Function to copy 30 random images from a database (Clean Data Folder) to the folder of a video.
+    Function to link 30 random images from a database (Clean Data Folder) to the folder of a video, preferring the least used ones.
+    The images are named directly in a random order (no copy and rename afterwards, as random_order did).
 
     :param video_folder: Path to the folder where the video images will be saved.
     :param clean_data_folder: Path to the clean data folder containing the images.
     """
-    
+
     # Access the images folder corresponding to the video's theme
     theme_file = os.path.join(os.getcwd(), "theme.txt")
     with open(theme_file, 'r', encoding='utf-8') as file:
@@ -29,23 +44,37 @@ def video_photos_selector(video_folder: os.path, clean_data_folder: os.path) ->
     video_theme = video_theme.capitalize()
     original_images_folder = os.path.join(clean_data_folder, video_theme)
 
-    # Get the list of files in the original folder (Clean Data)
-    files = os.listdir(original_images_folder)
-    images = [file for file in files if (file.endswith('.jpg') or file.endswith('.jpeg'))]
-    random.shuffle(images)  # Randomly shuffle the list of images
-    images_to_copy = images[:30]  # Take the first 30 images from the random list
+    # Choose the images from the catalog of the original folder (Clean Data), already in random order
+    images_to_link = select_images(original_images_folder, IMAGES_PER_VIDEO)
 
-    # Copy the selected images to the destination folder
-    for image in images_to_copy:
-        source_path = os.path.join(original_images_folder, image)
-        destination_path = os.path.join(video_folder, image)
-        shutil.copy(source_path, destination_path)
+    # Link the selected images to the destination folder, already in their random order
+    os.makedirs(video_folder, exist_ok=True)
+    new_date = datetime.datetime.now().strftime("%Y-%m-%d-%s")
+    selection = []
+    for i, image in enumerate(images_to_link):
+        source_path = os.path.abspath(os.path.join(original_images_folder, image))
+        new_name = f"{new_date}_{15 + 4 * i}.{image.split('.')[-1]}"
+        link_or_copy(source_path, os.path.join(video_folder, new_name), hardlink=params.HARDLINK_VIDEO_IMAGES)
+        selection.append({"file": new_name, "source": source_path})
 
-    # Shuffle the images
-    random_order(video_folder)
+    save_selection(video_folder, video_theme, selection)
+    print("\n✅ Photo selection done\n")
 
 
 
 
 
+def save_selection(video_folder: os.path, theme: str, selection: list) -> None:
+    """
+    Saves the images selected for a video (images.json), in the order they appear.
+    The file is saved in the folder of the video, next to the images folder: the images folder only has images.
 
+    :param video_folder: Path to the folder with the video images (the images folder of the video).
+    :param theme: Theme of the video.
+    :param selection: {"file": name in the video folder, "source": path of the original image} of each image.
+    """
+    selection_path = os.path.join(os.path.dirname(os.path.abspath(video_folder)), SELECTION_FILE)
+    temporary_path = f"{selection_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump({"theme": theme, "images": selection}, file, ensure_ascii=False, indent=4)
+    os.replace(temporary_path, selection_path)
@@ -1,9 +1,10 @@
 from pydub import AudioSegment
+from Logic.Voiceover.Audio_Mixing import segment_to_array, array_to_segment, match_segment_format, mix_format, build_voice_track, voiced_bounds, load_background_music, overlay_music
 import os
 from datetime import datetime
 import re
 import json
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 
 """
@@ -24,11 +25,20 @@ Functions:
 3. audio_editing:
     - Edits the audio by adjusting volume, speed, and adding background music.
     - Saves the audio with and without background music for further processing.
+    - Works in memory with the NumPy mixing engine (Audio_Mixing): each part is decoded once and only the two final audios are encoded
+      (adjust_volume_to_common_level and combine_audios are the versions that save every step in files)
+    - Saves where each part sounds in the final audio (audios/timeline.json), used to create the subtitles without Whisper.
 
-4. save_configuration:
+4. load_voice_parts:
+    - Decodes each recorded part (partN.mp4) once, in the order of the script.
+
+5. save_timeline:
+    - Saves the second where the voice of each part starts and ends in the final audio.
+
+6. save_configuration:
     - Saves the audio configuration (song path, volume, voice increase) to a JSON file.
 
-5. load_configurations:
+7. load_configurations:
     - Loads the audio configuration from a JSON file.
 """
 
@@ -109,6 +119,60 @@ def combine_audios(audio_folder: os.path = 'audios', output_name: str = 'labs.mp
 
 
 
+def load_voice_parts(audio_folder: os.path = 'audios') -> Tuple[List[int], List[AudioSegment]]:
+    """
+    Decodes each recorded part (partN.mp4) once, in the order of the script.
+
+    Args:
+        audio_folder (str): Folder where the audio files are located.
+
+    Returns:
+        Tuple[List[int], List[AudioSegment]]: Numbers of the parts and the parts, sorted by their number.
+    """
+    file_pattern = re.compile(r'^part(\d+)\.mp4$')
+
+    parts = []
+    for file in os.listdir(audio_folder):
+        match = file_pattern.match(file)
+        if match:
+            parts.append((int(match.group(1)), file))
+    parts.sort()
+
+    return [number for number, _ in parts], [AudioSegment.from_file(os.path.join(audio_folder, file)) for _, file in parts]
+
+
+
+
+
+def save_timeline(part_numbers: List[int], voice_parts: list, positions: List[Tuple[int, int]],
+                  frame_rate: int, time_scale: float, audio_folder: os.path = 'audios') -> None:
+    """
+    Saves the second where the voice of each part starts and ends in the final audio (audios/timeline.json).
+
+    Args:
+        part_numbers (List[int]): Number of each part.
+        voice_parts (list): Samples of each part (to skip the silences of the TTS).
+        positions (List[Tuple[int, int]]): (start, end) frame of each part in the voice before the speed up.
+        frame_rate (int): Frame rate of the parts.
+        time_scale (float): Length of the final audio divided by the length of the voice before the speed up.
+        audio_folder (str): Folder where the timeline is saved.
+    """
+    timeline = []
+    for number, samples, (position, _) in zip(part_numbers, voice_parts, positions):
+        voice_start, voice_end = voiced_bounds(samples, frame_rate)
+        timeline.append({
+            "part": number,
+            "start": round((position + voice_start) / frame_rate * time_scale, 3),
+            "end": round((position + voice_end) / frame_rate * time_scale, 3),
+        })
+
+    with open(os.path.join(audio_folder, "timeline.json"), "w", encoding="utf-8") as json_file:
+        json.dump(timeline, json_file, indent=4)
+
+
+
+
+
 def audio_editing(Influencer: object, mass_production: str = ""):
     """
     Function to edit the audio:
@@ -123,15 +187,10 @@ def audio_editing(Influencer: object, mass_production: str = ""):
     Output:
         - An audio without music to send to the function that makes the subtitles.
         - An audio with music to use in the video.
-    """
 
-    # Set all to similar volume level
-    print("\n🔄 Adjusting the volume of the audios...")
-    adjust_volume_to_common_level()
-
-    # Combine previous audios
-    print("\n🔄 Combining audios...")
-    combine_audios()
+    Every part is decoded only once and all the edition is done in memory with the mixing engine (Audio_Mixing):
+        - Only the two outputs are encoded to MP3 (no quality lost in intermediate files)
+    """
 
     # Import Background Music:
     current_dir = os.getcwd()
@@ -150,39 +209,40 @@ def audio_editing(Influencer: object, mass_production: str = ""):
 
     mp3_path = os.path.join(current_dir, "..", "..", "..", "data", "music", song_path)
 
-    # Load the audio file
-    main_audio = AudioSegment.from_file("audios/labs.mp3")
-    silence = AudioSegment.silent(duration=250)  # 1000 milliseconds, 1 second
-    main_audio = silence + main_audio
+    # Decode every part once, all in the format of the first one
+    print("\n🔄 Loading the audios...")
+    part_numbers, voice_parts = load_voice_parts()
+    frame_rate = voice_parts[0].frame_rate if voice_parts else 44100
+    channels = voice_parts[0].channels if voice_parts else 1
+    voice_parts = [segment_to_array(match_segment_format(part, frame_rate, channels)) for part in voice_parts]
 
-    # Increase the volume of the original audio
-    volume_increase = voice_increase  # Increase by 10 dB
-    main_audio = main_audio + volume_increase
+    # Set all to similar volume level, combine them and increase the volume of the voice
+    print("\n🔄 Adjusting the volume and combining the audios...")
+    voice_track, positions = build_voice_track(voice_parts, frame_rate, gain_db=voice_increase)
 
     # Speed up the original audio
     speed_factor = 1.125  # Speed factor (1.3 for 30% faster)
-    main_audio = main_audio.speedup(playback_speed=speed_factor)
+    main_audio = array_to_segment(voice_track, frame_rate).speedup(playback_speed=speed_factor)
 
     # Save without music for subtitles
     audio_subtitles_path = os.path.join("audios", "audio_subtitles.mp3")
     main_audio.export(audio_subtitles_path, format="mp3")
     print("\n🎧 Audio for subtitles created")
 
-    # Add background music
-    background_music = AudioSegment.from_file(mp3_path)
-    volume_reduction = decibels  # Reduce the volume of the background music by -10 with classical
-    background_music = background_music + volume_reduction
-
-    # Ensure the background music is the same length as the main audio
-    final_length = len(main_audio)
-    background_music = background_music[:final_length]
+    # Where each part sounds in the final audio (the real length after the speed up, not exactly 1 / speed_factor)
+    time_scale = len(main_audio) / (1000 * len(voice_track) / frame_rate) if len(voice_track) else 1
+    save_timeline(part_numbers, voice_parts, positions, frame_rate, time_scale)
 
-    # Overlay the background music with the main audio
-    combined_audio = main_audio.overlay(background_music)
+    # Add background music (decoded only once per song), cut to the length of the voice
+    # Mixed at the highest frame rate and channels of the voice and the music, as pydub overlay: the voice is converted up, never the music down
+    mix_frame_rate, mix_channels = mix_format(main_audio, mp3_path)
+    main_audio = match_segment_format(main_audio, mix_frame_rate, mix_channels)
+    background_music = load_background_music(mp3_path, decibels, mix_frame_rate, mix_channels)
+    combined_audio = overlay_music(segment_to_array(main_audio), background_music)
 
     # Save the sped-up audio
     audio_path = os.path.join("audios", "audio_music.mp3")
-    combined_audio.export(audio_path, format="mp3")
+    array_to_segment(combined_audio, mix_frame_rate).export(audio_path, format="mp3")
     print("\n🎧 Audio with music created")
 
     # Save chosen configurations:
@@ -0,0 +1,295 @@
+import os
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import mediainfo_json
+from typing import Dict, List, Tuple
+from Logic.Tools import params
+
+
+"""
+Mixing engine for the narration, working with NumPy arrays of samples instead of editing AudioSegments step by step.
+
+Samples are kept as float32 arrays with shape (frames, channels) and values between -1 and 1:
+    - The volume of all the parts is measured in one pass
+    - Gains and pauses are written in a single buffer created with its final size (no copy of the whole track on every append)
+    - The background music is added as a vector operation
+    - Values are only clipped once, when the track is converted back to an AudioSegment
+
+Functions:
+    - segment_to_array: Converts an AudioSegment to an array of samples.
+    - array_to_segment: Converts an array of samples to a 16 bits AudioSegment.
+    - match_segment_format: Converts an AudioSegment to a frame rate and a number of channels.
+    - music_format: Frame rate and channels of a song, without decoding it.
+    - mix_format: Format of the mix of the voice and the music (the highest frame rate and channels of both, as pydub overlay).
+    - rms_dbfs: Measures the volume (RMS in dBFS) of an array of samples.
+    - build_voice_track: Joins the parts of the voice at the same volume level, with the pauses between them.
+    - voiced_bounds: Finds where the voice starts and ends inside a part (without the silences of the TTS).
+    - load_background_music: Returns the decoded music with its volume adjusted, decoding each song only once.
+    - overlay_music: Adds the background music under the voice.
+
+Background music cache:
+    - The same few songs are used in dozens of videos every night: each (song, decibels) is decoded once per process
+    - The decoded samples are also saved as .npy files, read as memory maps in later runs (no MP3 decoding at all)
+    - The music is kept in the format of the mix: it is never converted down to the format of the voice (mono at the rate of the TTS)
+"""
+
+
+GAP_MS = 375  # Pause between parts
+END_MS = 1000  # Final pause to avoid immediate ending
+LEAD_IN_MS = 250  # Silence before the voice starts
+SILENCE_DBFS = -40  # Windows below this volume are considered silence
+
+MUSIC_CACHE_FOLDER = os.path.join(params.CACHE_FOLDER, "music")
+music_cache: Dict[Tuple[str, float, int, int], np.ndarray] = {}  # {(song, decibels, frame_rate, channels): samples}
+music_formats: Dict[str, Tuple[int, int]] = {}  # {path of the song: (frame_rate, channels)}
+
+
+
+
+def segment_to_array(segment: AudioSegment) -> np.ndarray:
+    """
+    Converts an AudioSegment to an array of samples.
+
+    Args:
+        segment (AudioSegment): Audio to convert.
+
+    Returns:
+        np.ndarray: float32 samples with shape (frames, channels), between -1 and 1.
+    """
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    full_scale = float(1 << (8 * segment.sample_width - 1))
+    return samples.reshape(-1, segment.channels) / full_scale
+
+
+
+
+
+def array_to_segment(samples: np.ndarray, frame_rate: int) -> AudioSegment:
+    """
+    Converts an array of samples to a 16 bits AudioSegment.
+
+    Args:
+        samples (np.ndarray): float32 samples with shape (frames, channels).
+        frame_rate (int): Frame rate of the samples.
+
+    Returns:
+        AudioSegment: Audio ready to be exported.
+    """
+    pcm = (np.clip(samples, -1.0, 32767 / 32768) * 32768).astype("<i2")
+    return AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=frame_rate, channels=samples.shape[1])
+
+
+
+
+
+def match_segment_format(segment: AudioSegment, frame_rate: int, channels: int) -> AudioSegment:
+    """
+    Converts an AudioSegment to a frame rate and a number of channels (only if they are different).
+
+    Args:
+        segment (AudioSegment): Audio to convert.
+        frame_rate (int): Desired frame rate.
+        channels (int): Desired number of channels.
+
+    Returns:
+        AudioSegment: Audio in the desired format.
+    """
+    if segment.frame_rate != frame_rate:
+        segment = segment.set_frame_rate(frame_rate)
+    if segment.channels != channels:
+        segment = segment.set_channels(channels)
+    return segment
+
+
+
+
+
+def music_format(mp3_path: os.path) -> Tuple[int, int]:
+    """
+    Frame rate and channels of a song, read from its header with ffprobe (the song is not decoded).
+
+    Args:
+        mp3_path (str): Path of the song.
+
+    Returns:
+        Tuple[int, int]: Frame rate and number of channels.
+    """
+    if mp3_path not in music_formats:
+        streams = mediainfo_json(mp3_path).get("streams", [])
+        audio = next(stream for stream in streams if stream.get("codec_type") == "audio")
+        music_formats[mp3_path] = (int(audio["sample_rate"]), int(audio["channels"]))
+    return music_formats[mp3_path]
+
+
+
+
+
+def mix_format(voice: AudioSegment, mp3_path: os.path) -> Tuple[int, int]:
+    """
+    Format of the mix of the voice and the music: the highest frame rate and number of channels of both,
+    as pydub does in overlay (the voice is converted up, the music is never converted down).
+
+    Args:
+        voice (AudioSegment): Voice of the video.
+        mp3_path (str): Path of the song.
+
+    Returns:
+        Tuple[int, int]: Frame rate and number of channels of the mix.
+    """
+    music_frame_rate, music_channels = music_format(mp3_path)
+    return max(voice.frame_rate, music_frame_rate), max(voice.channels, music_channels)
+
+
+
+
+
+def rms_dbfs(samples: np.ndarray) -> float:
+    """
+    Measures the volume of an array of samples (same measure as AudioSegment.dBFS).
+
+    Args:
+        samples (np.ndarray): float32 samples with shape (frames, channels).
+
+    Returns:
+        float: RMS in dBFS (-inf if the audio is silent).
+    """
+    if samples.size == 0:
+        return float("-inf")
+    rms = np.sqrt(np.mean(np.square(samples, dtype=np.float64)))
+    return float(20 * np.log10(rms)) if rms > 0 else float("-inf")
+
+
+
+
+
+def build_voice_track(parts: List[np.ndarray], frame_rate: int, gain_db: float = 0) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """
+    Joins the parts of the voice at the same volume level (the average of all of them),
+        with a silence at the beginning, a pause between parts and a final pause.
+
+    Args:
+        parts (List[np.ndarray]): Samples of each part, all with the same frame rate and channels.
+        frame_rate (int): Frame rate of the parts.
+        gain_db (float): Extra gain applied to the whole voice (voice_increase of the influencer).
+
+    Returns:
+        Tuple[np.ndarray, List[Tuple[int, int]]]:
+            - Samples of the whole voice
+            - (start, end) frame of each part inside the voice
+    """
+    channels = parts[0].shape[1] if parts else 1
+    frames_per_ms = frame_rate / 1000
+    lead_in, gap, end = (int(ms * frames_per_ms) for ms in (LEAD_IN_MS, GAP_MS, END_MS))
+
+    # Volume of every part, and gain to reach the average (silent parts are left as they are)
+    levels = np.array([rms_dbfs(part) for part in parts], dtype=np.float64)
+    audible = np.isfinite(levels)
+    target = levels[audible].mean() if audible.any() else 0.0
+    gains_db = np.where(audible, target - levels, 0.0) + gain_db
+    gains = (10 ** (gains_db / 20)).astype(np.float32)
+
+    # Single buffer with the final length: every part is written in its place
+    total_frames = lead_in + sum(len(part) + gap for part in parts) + end
+    track = np.zeros((total_frames, channels), dtype=np.float32)
+
+    positions = []
+    position = lead_in
+    for part, gain in zip(parts, gains):
+        np.multiply(part, gain, out=track[position:position + len(part)])
+        positions.append((position, position + len(part)))
+        position += len(part) + gap
+
+    return track, positions
+
+
+
+
+
+def voiced_bounds(samples: np.ndarray, frame_rate: int, window_ms: int = 10, threshold_db: float = SILENCE_DBFS) -> Tuple[int, int]:
+    """
+    Finds where the voice starts and ends inside a part, skipping the silences that the TTS adds at the beginning and the end.
+
+    Args:
+        samples (np.ndarray): float32 samples of the part with shape (frames, channels).
+        frame_rate (int): Frame rate of the part.
+        window_ms (int): Length of the windows where the volume is measured.
+        threshold_db (float): Windows below this volume are considered silence.
+
+    Returns:
+        Tuple[int, int]: (start, end) frame of the voice inside the part (the whole part if it is all silence).
+    """
+    window = max(1, int(frame_rate * window_ms / 1000))
+    windows = len(samples) // window
+    if windows == 0:
+        return 0, len(samples)
+
+    energy = np.mean(np.square(samples[:windows * window], dtype=np.float64).reshape(windows, -1), axis=1)
+    voiced = np.flatnonzero(energy > 10 ** (threshold_db / 10))
+    if voiced.size == 0:
+        return 0, len(samples)
+
+    return int(voiced[0] * window), int(min(len(samples), (voiced[-1] + 1) * window))
+
+
+
+
+
+def load_background_music(mp3_path: os.path, decibels: float, frame_rate: int, channels: int, persist: str = "YES") -> np.ndarray:
+    """
+    Returns the decoded music with its volume adjusted, decoding each song only once.
+
+    Args:
+        mp3_path (str): Path of the song (data/music).
+        decibels (float): Gain of the music (negative to put it under the voice).
+        frame_rate (int): Frame rate of the mix (mix_format).
+        channels (int): Channels of the mix (mix_format).
+        persist (str, optional): If not empty, the samples are also saved as .npy to skip decoding in later runs.
+
+    Returns:
+        np.ndarray: float32 samples with shape (frames, channels), read only.
+    """
+    song = os.path.basename(mp3_path)
+    key = (song, float(decibels), frame_rate, channels)
+    if key in music_cache:
+        return music_cache[key]
+
+    cache_file = os.path.join(MUSIC_CACHE_FOLDER, f"{os.path.splitext(song)[0]}_{decibels}dB_{frame_rate}Hz_{channels}ch.npy")
+    cache_is_valid = os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(mp3_path)
+
+    if persist and cache_is_valid:
+        samples = np.load(cache_file, mmap_mode="r")  # Only the frames used are read from disk
+
+    else:
+        print(f"\n🔄 Decoding the song {song}...")
+        music = match_segment_format(AudioSegment.from_file(mp3_path), frame_rate, channels)
+        samples = segment_to_array(music) * np.float32(10 ** (decibels / 20))
+        samples.setflags(write=False)  # Shared by all the videos: nobody can modify it
+
+        if persist:
+            os.makedirs(MUSIC_CACHE_FOLDER, exist_ok=True)
+            temporary_file = f"{cache_file}.{os.getpid()}.tmp.npy"  # Several processes can decode the same song
+            np.save(temporary_file, samples)
+            os.replace(temporary_file, cache_file)
+
+    music_cache[key] = samples
+    return samples
+
+
+
+
+
+def overlay_music(voice: np.ndarray, music: np.ndarray) -> np.ndarray:
+    """
+    Adds the background music under the voice, cut to the length of the voice.
+
+    Args:
+        voice (np.ndarray): Samples of the voice.
+        music (np.ndarray): Samples of the music with its volume already adjusted (same frame rate and channels as the voice: mix_format).
+
+    Returns:
+        np.ndarray: Samples of the voice with music.
+    """
+    mixed = voice.copy()
+    length = min(len(voice), len(music))
+    mixed[:length] += music[:length]
+    return mixed
@@ -1,7 +1,11 @@
 import os
 import re
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from Logic.Tools import params
-from typing import Optional
+from typing import Any, Callable, List, Optional, Tuple
 
 
 """
@@ -14,13 +18,35 @@ Functions:
     - read_text: Reads the content of a text file based on the part number.
     - record_audio: Records the audio of a specific part of the text.
     - re_record_audio: Allows the user to re-record a specific audio.
+    - split_sentences: Splits a complete text into sentences, with the number of the part of each one.
     - split_and_save_text: Splits a complete text into sentences and saves each sentence in a separate file.
-    - audio_recording: Processes the text, splits it into sentences, and calls the recording function for each sentence.
+    - audio_recording: Processes the text, splits it into sentences, and records all the sentences at the same time.
+    - phonetic_text: Changes the words that the Spanish voice mispronounces (text of modified_script.txt).
+    - prerecord_script: Records the sentences of a script before its files exist (the audios are kept in the TTS cache).
+    - call_tts_with_backoff: Calls a TTS provider respecting its maximum of simultaneous requests and retrying on rate limits.
+    - is_rate_limit_error: Checks if an error of a TTS provider is a rate limit.
     - Spanish_voice: Generates audio in Spanish using ElevenLabs.
     - English_voice: Generates audio in English using OpenAI.
+
+Both voices go through the TTS cache (TTS_Cache.py): a sentence already recorded with the same voice is not paid again.
+    - prerecord_script uses it to record a script while the LLM is still writing the rest of its answer (streaming mode):
+      audio_recording then finds every sentence in the cache
 """
 
 
+# Maximum number of simultaneous requests to each TTS provider (the parts of a video are recorded at the same time)
+TTS_CONCURRENCY = {
+    "elevenlabs": 3,
+    "openai": 6,
+}
+TTS_MAX_RETRIES = 5  # Retries when the provider answers with a rate limit
+TTS_BACKOFF_SECONDS = 2  # First wait before retrying, doubled in every retry
+
+tts_semaphores = {provider: threading.BoundedSemaphore(limit) for provider, limit in TTS_CONCURRENCY.items()}
+
+
+
+
 def read_text(part_number: int) -> Optional[str]:
     """
     Function to read the content of a text file based on the part number.
@@ -64,13 +90,14 @@ def record_audio(part_number: int, Influencer: object) -> None:
     audio = Influencer.record_voice(text)  # Influencer object to determine if the recording is done with an English or Spanish voice
 
     directory = "audios"
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+    os.makedirs(directory, exist_ok=True)  # Several parts are recorded at the same time
 
     audio_file_name = f"part{part_number}.mp4"
     audio_file_path = os.path.join(directory, audio_file_name)
-    with open(audio_file_path, "wb") as file:
+    temporary_file_path = f"{audio_file_path}.tmp"  # Write first to a temporary file: a cut recording never looks finished
+    with open(temporary_file_path, "wb") as file:
         file.write(audio)
+    os.replace(temporary_file_path, audio_file_path)
 
 
 
@@ -93,6 +120,25 @@ def re_record_audio(Influencer: object) -> None:
 
 
 
+def split_sentences(full_text: str) -> List[Tuple[int, str]]:
+    """
+    Splits the full text into sentences, numbered as the parts of the audio (part1, part2...).
+    Sentences without meaningful content (ex: a final period) are skipped, but keep their number free.
+
+    Args:
+        full_text (str): Full text to split.
+
+    Returns:
+        List[Tuple[int, str]]: (part number, sentence) of each sentence.
+    """
+    sentences = re.split(r'(?<=[.!?])\s+', full_text)
+    return [(i, sentence.strip()) for i, sentence in enumerate(sentences, start=1) if sentence and not sentence.isspace()]
+
+
+
+
+
+
 def split_and_save_text(full_text: str) -> int:
     """
     Splits the full text into sentences and saves each sentence in a separate file.
@@ -109,17 +155,14 @@ def split_and_save_text(full_text: str) -> int:
     if not os.path.exists(texts_directory):
         os.makedirs(texts_directory)
 
-    sentences = re.split(r'(?<=[.!?])\s+', full_text)
+    sentences = split_sentences(full_text)  # If there is a final period or not, it can generate an empty sentence or not. Only the ones with content are saved
 
-    counter = 0  # If there is a final period or not, it can generate an empty sentence or not. So we need to be careful to count only the ones that are saved
-
-    for i, sentence in enumerate(sentences, start=1):
-        if sentence and not sentence.isspace():  # Verify that the sentence has meaningful content
-            file_name = os.path.join(texts_directory, f"part{i}.txt")
-            with open(file_name, "w", encoding="utf-8") as file:
-                file.write(sentence.strip())
-            counter += 1
+    for i, sentence in sentences:
+        file_name = os.path.join(texts_directory, f"part{i}.txt")
+        with open(file_name, "w", encoding="utf-8") as file:
+            file.write(sentence)
 
+    counter = len(sentences)
     print(f"\n\n✂️ The text has been split into {counter} parts. \nCheck them before recording\n")
     return counter
 
@@ -128,12 +171,13 @@ def split_and_save_text(full_text: str) -> int:
 
 
 
-def audio_recording(Influencer: object) -> Optional[str]:
+def audio_recording(Influencer: object, resume: str = "") -> Optional[str]:
     """
     Function to process a text, split it into sentences, and call the recording function for each sentence.
 
     Args:
         Influencer: Object with a `record_voice` method to record the text.
+        resume (str, optional): If not empty, the parts already recorded are not recorded again (avoid paying twice after a failure).
 
     Returns:
         Optional[str]: "STOP" if the text has less than 4 sentences, otherwise None.
@@ -147,9 +191,19 @@ def audio_recording(Influencer: object) -> Optional[str]:
     if number_of_sentences < 4: 
         return "STOP"  # Basically: if the video lasts less than 4 sentences stop it because it will not record anything good
 
+    parts_to_record = []
     for i in range(1, number_of_sentences + 1):  # Correct the range:
-        record_audio(i, Influencer)
-        print(f"Audio number {i} of {number_of_sentences} has been recorded")
+        if resume and os.path.exists(os.path.join("audios", f"part{i}.mp4")):
+            print(f"Audio number {i} of {number_of_sentences} was already recorded")
+            continue
+        parts_to_record.append(i)
+
+    # Record all the parts at the same time: each TTS provider limits by itself its simultaneous requests
+    with ThreadPoolExecutor(max_workers=max(TTS_CONCURRENCY.values())) as executor:
+        futures = {executor.submit(record_audio, i, Influencer): i for i in parts_to_record}
+        for future in as_completed(futures):
+            future.result()  # If a part failed, the error is raised here (once the rest have finished)
+            print(f"Audio number {futures[future]} of {number_of_sentences} has been recorded")
     
     return None  # If the video lasts at least 4 sentences return "None" and the video production does not stop
 
@@ -157,9 +211,150 @@ def audio_recording(Influencer: object) -> Optional[str]:
 
 
 
+def phonetic_text(text: str, english: str = "") -> Tuple[str, List[str]]:
+    """
+    Changes the words that the Spanish voice mispronounces:
+        - Isolated words with a mispronounced "H" (hacia, hace...)
+        - Ceceos ("z" and "c" when applicable) changed to "θθ": the Audio AI pronounces them as s otherwise
+
+    Args:
+        text (str): Text of the script (script.txt).
+        english (str, optional): If not empty, only the "H" words are changed (no ceceos in English).
+
+    Returns:
+        Tuple[str, List[str]]: Text for the TTS (modified_script.txt) and the words changed to θθ.
+    """
+    replacements_dictionary = {
+        'hacia': 'acia',
+        'hace': 'ace',
+        'hazaña': 'azaña'
+    }
+    for original_word, replacement in replacements_dictionary.items():  # Replace words with mispronounced H
+        text = text.replace(original_word, replacement)
+
+    if english:  # If the text is in English skip the ceceos
+        return text, []
+
+    modified_words = []
+
+    # Function to add the modified word to the list
+    def add_modified_word(match):
+        original_word = match.group(0)
+        modified_word = re.sub(r'c([eéií])', r'θθ\1', original_word, flags=re.IGNORECASE) # Words with accent (ex: césped) were not being changed
+        modified_word = re.sub(r'z', 'θθ', modified_word, flags=re.IGNORECASE)
+        modified_words.append(modified_word)
+        return modified_word
+
+    # Apply the changes and collect modified words
+    text = re.sub(r'\b\w*[cz]\w*\b', add_modified_word, text, flags=re.IGNORECASE)
+    return text, modified_words
+
+
+
+
+
+def prerecord_script(script: str, Influencer: object, cancel: Optional[threading.Event] = None) -> int:
+    """
+    Records the sentences of a script before its files exist (script.txt, modified_script.txt, texts/partN.txt).
+    The audios are not saved in the video folder: they stay in the TTS cache, where audio_recording finds them later.
+
+    The sentences are the same ones that audio_recording will record (same phonetic changes, same split).
+    It is a best effort: a sentence that fails here is simply recorded again by audio_recording.
+
+    Args:
+        script (str): Text of the script (as saved in script.txt).
+        Influencer: Object with the `record_voice` and `avoid_phonetic_correction` methods.
+        cancel (threading.Event, optional): When set, the sentences not started yet are not recorded (ex: the answer of the LLM was rejected).
+
+    Returns:
+        int: Number of sentences recorded.
+    """
+    text, _ = phonetic_text(script, Influencer.avoid_phonetic_correction())
+    sentences = split_sentences(text)
+    if len(sentences) < 4:
+        return 0  # audio_recording will stop the video: nothing to record
+
+    def record_sentence(sentence: str) -> bool:
+        if cancel is not None and cancel.is_set():
+            return False
+        try:
+            Influencer.record_voice(sentence)
+            return True
+        except Exception as e:
+            print(f"\n⚠️ A sentence could not be recorded in advance (it will be recorded with the video): {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(TTS_CONCURRENCY.values())) as executor:
+        recorded = sum(executor.map(record_sentence, [sentence for _, sentence in sentences]))
+
+    if cancel is not None and cancel.is_set():
+        print(f"\n🎙️ Recording in advance cancelled: {recorded} of {len(sentences)} sentences were already recorded")
+    else:
+        print(f"\n🎙️ {recorded} of {len(sentences)} sentences recorded in advance")
+    return recorded
+
+
+
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Checks if an error of a TTS provider means that too many requests were sent.
+
+    Args:
+        error (Exception): Error raised by the provider library.
+
+    Returns:
+        bool: True if it is worth waiting and trying again.
+    """
+    response = getattr(error, "response", None)
+    status_code = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    message = str(error).lower()
+
+    return (
+        status_code == 429
+        or "ratelimit" in type(error).__name__.lower()
+        or "rate limit" in message
+        or "too_many_concurrent_requests" in message
+    )
+
+
+
+
+
+def call_tts_with_backoff(provider: str, function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Calls a TTS provider without exceeding its maximum of simultaneous requests,
+        and retries with exponential backoff if the provider answers with a rate limit.
+
+    Args:
+        provider (str): Key of the provider in TTS_CONCURRENCY ("elevenlabs" or "openai").
+        function (callable): Function that calls the API.
+        *args, **kwargs: Arguments of the function.
+
+    Returns:
+        Any: Result of the function.
+    """
+    for attempt in range(TTS_MAX_RETRIES + 1):
+        with tts_semaphores[provider]:
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                if attempt == TTS_MAX_RETRIES or not is_rate_limit_error(e):
+                    raise
+
+        waiting_time = TTS_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, 1)  # Random part: avoid all threads retrying together
+        print(f"\n⏳ Rate limit of {provider}, trying again in {waiting_time:.1f} seconds")
+        time.sleep(waiting_time)
+
+
+
+
+
 def spanish_voice(text: str) -> bytes:
     """
     Generates audio in Spanish using ElevenLabs.
+    Sentences already recorded with the same voice and settings are taken from the TTS cache.
 
     Args:
         text (str): Text to convert to audio.
@@ -167,19 +362,33 @@ def spanish_voice(text: str) -> bytes:
     Returns:
         bytes: Generated audio in binary format.
     """
+    from Logic.Voiceover.TTS_Cache import tts_cache_key, get_cached_audio, save_cached_audio
+
+    voice_id = 'Your_Eleven-Labs_Voice_ID'
+    model = "eleven_multilingual_v2"
+    settings = {"stability": 1, "similarity_boost": 1, "style": 0.01, "use_speaker_boost": True}
+
+    cache_key = tts_cache_key(text, voice_id, model, settings)
+    audio = get_cached_audio(cache_key)
+    if audio is not None:
+        return audio
+
     from elevenlabs import generate, Voice, VoiceSettings, set_api_key
     ElevenLabs_Key = params.ELEVENLABS_KEY
     set_api_key(ElevenLabs_Key)
 
-    audio = generate(  
+    audio = call_tts_with_backoff(
+        "elevenlabs",
+        generate,
         text=text,
         voice=Voice(
-            voice_id='Your_Eleven-Labs_Voice_ID',
-            settings=VoiceSettings(stability=1, similarity_boost=1, style=0.01, use_speaker_boost=True)
+            voice_id=voice_id,
+            settings=VoiceSettings(**settings)
         ),
-        model="eleven_multilingual_v2"
+        model=model
     )
 
+    save_cached_audio(cache_key, audio)
     return audio
 
 
@@ -189,6 +398,7 @@ def spanish_voice(text: str) -> bytes:
 def english_voice(text: str) -> bytes:
     """
     Generates audio in English using OpenAI.
+    Sentences already recorded with the same voice and model are taken from the TTS cache.
 
     Args:
         text (str): Text to convert to audio.
@@ -196,18 +406,29 @@ def english_voice(text: str) -> bytes:
     Returns:
         bytes: Generated audio in binary format.
     """
+    from Logic.Voiceover.TTS_Cache import tts_cache_key, get_cached_audio, save_cached_audio
+
+    voice = "echo"
+    model = "tts-1-hd"
+
+    cache_key = tts_cache_key(text, voice, model)
+    audio_bytes = get_cached_audio(cache_key)
+    if audio_bytes is not None:
+        return audio_bytes
 
-    from openai import OpenAI
-    from Logic.Tools import params
+    from Logic.Tools.OpenAI_Clients import get_openai_client
 
-    client = OpenAI(api_key=params.OPENAIKEY)
+    client = get_openai_client()  # Shared by all the parts (threads) of the recording
 
-    audio = client.audio.speech.create(
-        model="tts-1-hd",
-        voice="echo",
+    audio = call_tts_with_backoff(
+        "openai",
+        client.audio.speech.create,
+        model=model,
+        voice=voice,
         input=text,
     )
 
     audio_bytes = audio.content
 
+    save_cached_audio(cache_key, audio_bytes)
     return audio_bytes
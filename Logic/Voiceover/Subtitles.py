@@ -1,10 +1,12 @@
 import whisper_timestamped
+from Logic.Voiceover.Narration import split_sentences, phonetic_text
 import json
 import string
 import os
+import threading
+from multiprocessing.managers import BaseManager
 from datetime import datetime
-import re
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 
 
 """
@@ -12,35 +14,225 @@ Script to obtain and correct subtitles from audios:
 - Generates subtitles using the OpenAI model
 - Verifies and corrects discrepancies between the original script and the generated subtitles
 - Makes specific phonetic corrections to improve pronunciation for Spanish inlfuencers (writes text in Spanish phonetics)
+
+The Whisper model is loaded only once per process and kept in memory (get_whisper_model):
+- Every video produced by the same process reuses it
+- get_subtitles_batch transcribes the audios of many folders one after another with the same model
+- In a parallel production, a TranscriptionManager owns the only model: the stages of every process send their audios to it (Transcriber)
+
+Fast mode (get_subtitles_from_parts): no transcription at all
+- The text of each part of the audio is already known (script.txt split as in split_and_save_text)
+- audio_editing saves where each part sounds in the final audio (audios/timeline.json)
+- The words of each part are placed proportionally to their length: the subtitles always match the script
 """
 
 
+whisper_models = {}  # {model_name: model} loaded in this process
+whisper_models_lock = threading.Lock()
+transcription_lock = threading.Lock()  # whisper_timestamped adds hooks to the model while transcribing: one transcription at a time
+
+
+
+
+def get_whisper_model(model_name: str = "base") -> Any:
+    """
+    Returns the Whisper model, loading it only the first time it is used in the process.
+
+    Args:
+        model_name (str): Name of the Whisper model.
+
+    Returns:
+        Any: Whisper model ready to transcribe.
+    """
+    with whisper_models_lock:
+        if model_name not in whisper_models:
+            print(f"\n🔄 Loading the Whisper model '{model_name}' (only once)...\n")
+            whisper_models[model_name] = whisper_timestamped.load_model(model_name)
+        return whisper_models[model_name]
+
+
+
+
+
+class Transcriber:
+    """
+    Transcribes the audios of video folders in the process that owns it (the process of a TranscriptionManager).
+    The proxies returned by manager.Transcriber() can be sent to other processes: all of them use the same Whisper model.
+    """
+
+    def transcribe(self, folder: os.path) -> None:
+        transcribe_folder(folder)
+
+
+
+class TranscriptionManager(BaseManager):
+    """
+    Process that keeps the only Whisper model of a parallel production (one transcription at a time, see transcription_lock).
+    """
+
+
+TranscriptionManager.register("Transcriber", Transcriber)
+
 
 
 
-def get_subtitles() -> None:
+
+def flatten_transcription(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Function to flatten the structure of the results: list of words with their timings.
+    """
+    transcription_words = []
+    for segment in results["segments"]:
+        transcription_words.extend(segment["words"])
+    return transcription_words
+
+
+
+
+
+def transcribe_folder(folder: os.path, model_name: str = "base") -> None:
+    """
+    Transcribes the audio of a video folder and saves its subtitles (flattened_transcription.json).
+
+    Args:
+        folder (str): Path of the video folder.
+        model_name (str): Name of the Whisper model.
+    """
+    audio = os.path.join(folder, "audios", "audio_subtitles.mp3")
+    model = get_whisper_model(model_name)
+
+    with transcription_lock:
+        results = whisper_timestamped.transcribe(model, audio)
+
+    # Flatten the transcription
+    flattened_transcription = flatten_transcription(results)
+
+    with open(os.path.join(folder, 'flattened_transcription.json'), 'w', encoding='utf-8') as f:
+        json.dump(flattened_transcription, f, ensure_ascii=False, indent=4)
+
+
+
+
+
+def get_subtitles(transcriber: Optional[Any] = None) -> None:
     """
     Function to obtain subtitles from an audio:
     - Uses the audio without music but already edited (speed, silences, etc.) so that the timings match the final audio with music.
-    - Uses the OpenAI model running LOCALLY.
+    - Uses the OpenAI model running LOCALLY (loaded once per process).
+
+    Args:
+        transcriber (Transcriber, optional): Proxy of a TranscriptionManager. If given, the audio is transcribed by its process
+            instead of loading the model in this one.
     """
     
     print("\n🔄 Generating Subtitles...\n")
 
-    # Function to flatten the structure of the results
-    def flatten_transcription(results: Dict[str, Any]) -> List[Dict[str, Any]]:
-        transcription_words = []
-        for segment in results["segments"]:
-            transcription_words.extend(segment["words"])
-        return transcription_words
+    if transcriber is not None:
+        transcriber.transcribe(os.getcwd())
+    else:
+        transcribe_folder(os.getcwd())
 
-    # Get subtitles
-    audio = os.path.join("audios", "audio_subtitles.mp3")
-    model = whisper_timestamped.load_model("base")
-    results = whisper_timestamped.transcribe(model, audio)
+    print("\n📄 Subtitles created")
 
-    # Flatten the transcription
-    flattened_transcription = flatten_transcription(results)
+
+
+
+
+def get_subtitles_batch(folders: List[os.path], cpu_threads: Optional[int] = None) -> List[os.path]:
+    """
+    Function to obtain the subtitles of many video folders one after another, with the model loaded only once.
+
+    Args:
+        folders (List[str]): Paths of the video folders (each one with audios/audio_subtitles.mp3).
+        cpu_threads (int, optional): Number of CPU threads used by the model for each transcription
+            (restored to the previous number when the batch finishes: the setting is for the whole process).
+
+    Returns:
+        List[str]: Folders whose subtitles could not be created.
+    """
+    previous_threads = None
+    if cpu_threads:
+        import torch
+        previous_threads = torch.get_num_threads()
+        torch.set_num_threads(cpu_threads)
+
+    failed_folders = []
+    try:
+        get_whisper_model()  # Load it before starting the loop
+
+        for i, folder in enumerate(folders, start=1):
+            print(f"\n🔄 Generating Subtitles {i} of {len(folders)}: {folder}\n")
+            try:
+                transcribe_folder(folder)
+            except Exception as e:  # One audio failing should not stop the rest
+                print(f"\n❌ Could not create the subtitles of {folder}: {e}\n")
+                failed_folders.append(folder)
+    finally:
+        if previous_threads is not None:
+            torch.set_num_threads(previous_threads)
+
+    print(f"\n📄 Subtitles created for {len(folders) - len(failed_folders)} of {len(folders)} videos")
+    return failed_folders
+
+
+
+
+
+
+
+
+def words_timings(sentence: str, start: float, end: float) -> List[Dict[str, Any]]:
+    """
+    Places the words of a sentence between two seconds, each one taking a time proportional to its length.
+
+    Args:
+        sentence (str): Text of the sentence.
+        start (float): Second where the voice of the sentence starts.
+        end (float): Second where the voice of the sentence ends.
+
+    Returns:
+        List[Dict[str, Any]]: Words with the same format as the transcription of Whisper (text, start, end, confidence).
+    """
+    words = sentence.split()
+    weights = [len(word) + 1 for word in words]  # +1: the short pause after every word
+    seconds_per_weight = (end - start) / sum(weights) if words else 0
+
+    timings = []
+    position = start
+    for word, weight in zip(words, weights):
+        word_end = position + weight * seconds_per_weight
+        timings.append({"text": word, "start": round(position, 3), "end": round(word_end, 3), "confidence": 1.0})
+        position = word_end
+
+    return timings
+
+
+
+
+
+def get_subtitles_from_parts() -> None:
+    """
+    Function to obtain the subtitles without transcribing the audio (fast mode):
+    - The text of each part is taken from script.txt (the original words, not the phonetic ones of modified_script.txt).
+    - The time of each part is taken from audios/timeline.json (created by audio_editing).
+    - Inside each part, the words are placed proportionally to their length.
+    """
+
+    print("\n🔄 Generating Subtitles from the parts of the audio...\n")
+
+    with open("script.txt", "r", encoding="utf-8") as file:
+        sentences = dict(split_sentences(file.read()))
+
+    with open(os.path.join("audios", "timeline.json"), "r", encoding="utf-8") as f:
+        timeline = json.load(f)
+
+    flattened_transcription = []
+    for part in timeline:
+        sentence = sentences.get(part["part"])
+        if sentence is None:  # The script was changed after recording: use the text that was recorded
+            with open(os.path.join("texts", f"part{part['part']}.txt"), "r", encoding="utf-8") as file:
+                sentence = file.read()
+        flattened_transcription.extend(words_timings(sentence, part["start"], part["end"]))
 
     with open('flattened_transcription.json', 'w', encoding='utf-8') as f:
         json.dump(flattened_transcription, f, ensure_ascii=False, indent=4)
@@ -146,6 +338,7 @@ def phonetic_correction(english: str = "") -> None:
     """
     Function to change the ceceos ("z" and "c" when applicable) to this symbol "θ"
     - Reason: Audio AI pronounces ceceos as s if this symbol is not used
+    - The changes are made by phonetic_text (Narration.py), also used to record the script before it is saved
     
     Args:
         english (str, optional): Parameter to not apply this function if the original file is in English.
@@ -159,56 +352,16 @@ def phonetic_correction(english: str = "") -> None:
     - But still pass it here to change the file name and follow the Workflow correctly
     """
 
-    def change_sounds(text):
-        modified_words = []
-
-        # Function to add the modified word to the list
-        def add_modified_word(match):
-            original_word = match.group(0)
-            # modified_word = re.sub(r'c([ei])', r'θ\1', original_word, flags=re.IGNORECASE)
-            modified_word = re.sub(r'c([eéií])', r'θθ\1', original_word, flags=re.IGNORECASE) # Words with accent (ex: césped) were not being changed
-            modified_word = re.sub(r'z', 'θθ', modified_word, flags=re.IGNORECASE)
-            # modified_word = re.sub(r'x([aeiou])', r'ch\1', modified_word, flags=re.IGNORECASE)
-            modified_words.append(modified_word)
-            return modified_word
-
-        # Apply the changes and collect modified words
-        text = re.sub(r'\b\w*[cz]\w*\b', add_modified_word, text, flags=re.IGNORECASE)
-        # text = re.sub(r'\b\w*([cz]|x[aeiou])\w*\b', add_modified_word, text, flags=re.IGNORECASE)
-
-        return text, modified_words
-
-    """
-    Since "H" causes pronunciation problems only in some words in Spanish, simply fix the isolated cases
-    """
-    replacements_dictionary = {
-        'hacia': 'acia',
-        'hace': 'ace',
-        'hazaña': 'azaña'
-    }
-
     # Read the text file
     with open("script.txt", "r", encoding="utf-8") as file:
         original_text = file.read()
 
-    for original_word, replacement in replacements_dictionary.items():  # Replace words with mispronounced H
-        original_text = original_text.replace(original_word, replacement)
-
-    if english:  # If the text is in English skip all this
-
-        with open("modified_script.txt", "w", encoding="utf-8") as modified_file:
-            modified_file.write(original_text)
+    modified_text, modified_words = phonetic_text(original_text, english)
 
-    else:  # If not (Spanish) apply transformation
-
-        # Apply the changes and obtain modified words
-        modified_text, modified_words = change_sounds(original_text)
+    with open("modified_script.txt", "w", encoding="utf-8") as modified_file:
+        modified_file.write(modified_text)
 
+    if not english:  # Spanish: show the changes
         # Print modified words in a single line
         print("\nModified words:", ', '.join(modified_words))
-
-        # Optionally, save the modified text in a new file
-        with open("modified_script.txt", "w", encoding="utf-8") as modified_file:
-            modified_file.write(modified_text)
-
         print("\nThe text has been modified and saved as 'modified_script.txt'")
@@ -0,0 +1,152 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+from Logic.Tools import params
+
+
+"""
+Disk cache for the audios generated by the TTS models (ElevenLabs and OpenAI).
+
+The same sentence is often recorded again with the same voice (re-recordings, re-editions, English copies).
+Each audio is saved under a hash of everything that changes the result: text, voice, model and settings
+    - If the sentence was already recorded, the API is not called (no waiting, no paying per character)
+    - When the cache exceeds TTS_CACHE_MAX_MB, the audios used least recently are deleted
+      (the folder is only scanned when a running total of the size of the cache passes the limit, not after every audio)
+
+Functions:
+    - tts_cache_key: Builds the key of an audio from the text, voice, model and settings.
+    - get_cached_audio: Returns the audio of a key if it was already recorded.
+    - save_cached_audio: Saves an audio in the cache and deletes the oldest ones if the cache is too big.
+    - evict_tts_cache: Deletes the least recently used audios until the cache fits in its maximum size.
+"""
+
+
+TTS_CACHE_FOLDER = os.path.join(params.CACHE_FOLDER, "tts")
+
+EVICTION_TARGET = 0.9  # When the cache is too big, it is reduced to this fraction of its maximum size (not scanned again for every new audio)
+cache_size = None  # Size of the cache in bytes known by this process (None: not scanned yet)
+cache_size_lock = threading.Lock()
+
+
+
+
+def tts_cache_key(text: str, voice: str, model: str, settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Builds the key of an audio.
+
+    Args:
+        text (str): Text sent to the TTS model.
+        voice (str): Voice ID (or name) used.
+        model (str): TTS model (for example "tts-1-hd" or "eleven_multilingual_v2").
+        settings (Dict[str, Any], optional): Any other parameter that changes the audio.
+
+    Returns:
+        str: SHA-256 of all the parameters.
+    """
+    content = json.dumps(
+        {"text": text, "voice": voice, "model": model, "settings": settings or {}},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+
+
+
+def get_cached_audio(key: str) -> Optional[bytes]:
+    """
+    Returns the audio of a key if it was already recorded.
+
+    Args:
+        key (str): Key built with tts_cache_key.
+
+    Returns:
+        Optional[bytes]: Audio in binary format, or None if it is not in the cache.
+    """
+    audio_path = os.path.join(TTS_CACHE_FOLDER, f"{key}.audio")
+
+    try:
+        with open(audio_path, "rb") as file:
+            audio = file.read()
+        os.utime(audio_path)  # Mark as recently used (the oldest ones are deleted first)
+    except FileNotFoundError:
+        return None
+
+    print("♻️ Audio found in the TTS cache")
+    return audio
+
+
+
+
+
+def save_cached_audio(key: str, audio: bytes) -> None:
+    """
+    Saves an audio in the cache and deletes the oldest ones if the cache is too big.
+    The size of the cache is added up in memory: the folder is only scanned the first time and when the total passes the limit.
+
+    Args:
+        key (str): Key built with tts_cache_key.
+        audio (bytes): Audio in binary format.
+    """
+    global cache_size
+
+    os.makedirs(TTS_CACHE_FOLDER, exist_ok=True)
+    audio_path = os.path.join(TTS_CACHE_FOLDER, f"{key}.audio")
+    temporary_path = f"{audio_path}.{os.getpid()}.{threading.get_ident()}.tmp"  # Several parts (threads or processes) can write the same sentence
+
+    with open(temporary_path, "wb") as file:
+        file.write(audio)
+    os.replace(temporary_path, audio_path)
+
+    with cache_size_lock:
+        if cache_size is not None:
+            cache_size += len(audio)  # Other processes also write: the scan corrects the total when it passes the limit
+        if cache_size is None or cache_size > params.TTS_CACHE_MAX_MB * 1024 * 1024:
+            cache_size = evict_tts_cache()
+
+
+
+
+
+def evict_tts_cache(max_megabytes: int = params.TTS_CACHE_MAX_MB) -> int:
+    """
+    Deletes the least recently used audios until the cache fits in its maximum size
+    (down to EVICTION_TARGET of the maximum, so the next audios do not pass the limit again at once).
+
+    Args:
+        max_megabytes (int): Maximum size of the cache in MB.
+
+    Returns:
+        int: Size of the cache in bytes after deleting.
+    """
+    entries = []
+    total_size = 0
+
+    for entry in os.scandir(TTS_CACHE_FOLDER):
+        if entry.name.endswith(".audio"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # Deleted by another process meanwhile
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+    max_size = max_megabytes * 1024 * 1024
+    if total_size <= max_size:
+        return total_size
+
+    target_size = max_size * EVICTION_TARGET
+    entries.sort()  # Least recently used first
+    for _, size, path in entries:
+        if total_size <= target_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+    return total_size
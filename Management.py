@@ -24,6 +24,8 @@ def choose_action(Influencer):
     print("\n🖼️ Download Photos\n3- Download photos for the videos")
     print("\n✈️ Bulk Uploading:\n4- Upload videos to TIKTOK")
     print("\n🧹 Cleanups:\n5- Clean Folders")
+    print("6- Rebuild the index of folders (after changing folders by hand)")
+    print("7- Remove near-duplicate photos of a theme folder (clean_data/<Theme>)")
 
     print("\n\n👤 Change influencer:")
     print(f"0- Change influencer --> Current: {greeting}")
@@ -48,6 +50,16 @@ def choose_action(Influencer):
         outputs = os.path.join(os.getcwd(), "Outputs")
         move_state7_folders(outputs)
 
+    elif user == 6:
+        from Logic.Tools.Folders_Index import rebuild_folders_index
+        rebuild_folders_index(os.path.join(os.getcwd(), "Outputs"))
+
+    elif user == 7:
+        from Logic.Tools.Shuffle_pics import convert_windows_path_to_wsl
+        from Logic.Get_Images.Images_Dedup import dedup_folder
+        theme_folder = convert_windows_path_to_wsl(input("\n👉 Path of the theme folder: ").strip())
+        dedup_folder(theme_folder)
+
     elif user == 0:
         from Influencers.Manage_Influencers import choose_influencer
         Influencer = choose_influencer()
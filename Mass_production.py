@@ -13,7 +13,10 @@ def choose_action(user_input=None):
     if user_input is None:
         print("\n💼 Choose an action:\n")
         print("\n🏭 Mass Production: \n1- Produce videos from the available topics for each influencer")
+        print("6- Produce videos from the available topics for all influencers AT THE SAME TIME (one process per influencer)")
+        print("8- Write the scripts of the available topics and the pending descriptions with the Batch API (cheaper, answers within 24 hours)")
         print("\n🔨 Fixes: \n2- Mass edit all those videos marked with an 'X' to be edited again")
+        print("7- Finish the videos left in the middle by a failure (without paying the APIs again)")
         print("\n✅ Approval Machine:\n3- Approve all videos that meet the requirement to be approved in bulk")
         print("\n🚀 Uploading Machine:\n4- Upload 6 videos that meet the requirement to be approved in bulk")
         print("\n🥊 FORCED Approval Machine:\n5- Approve videos without reviewing them based on level (reviewed by workflow)")
@@ -48,6 +51,18 @@ def choose_action(user_input=None):
         from Logic.Industrialization.Manage_Mass_POSTING import bulk_approve
         bulk_approve(forced="Activated")
 
+    elif user == 6:
+        from Logic.Industrialization.Manage_Mass_PRODUCTION import from_title_to_video
+        from_title_to_video(parallel="Activated")
+
+    elif user == 7:
+        from Logic.Industrialization.Manage_Mass_PRODUCTION import resume_production
+        resume_production()
+
+    elif user == 8:
+        from Logic.Industrialization.Manage_Mass_PRODUCTION import batch_scripts_and_descriptions
+        batch_scripts_and_descriptions()
+
     elif user == 987:  # Single upload config
         from Logic.Uploads.Uploading import post_ONE_SINGLE_video
         from Influencers.Manage_Influencers import choose_influencer
@@ -207,7 +207,7 @@ class Influencer_NEW_INFLUENCER(INFLUENCER):
         """
         main_directory_folder = os.getcwd()
         original_clean_data_folder = os.path.join(main_directory_folder, 'clean_data')
-        get_script_NEW_INFLUENCER(title, video_folder, original_clean_data_folder)
+        get_script_NEW_INFLUENCER(title, video_folder, original_clean_data_folder, self)
 
 
 
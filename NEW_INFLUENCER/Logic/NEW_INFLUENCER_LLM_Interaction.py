@@ -25,13 +25,14 @@ Usage:
 """
 
 
-def get_script_NEW_INFLUENCER(title: str, video_folder: os.path, clean_data_original_folder: os.path) -> None:
+def get_script_NEW_INFLUENCER(title: str, video_folder: os.path, clean_data_original_folder: os.path, Influencer: object = None) -> None:
     """
     Function to get the scripts for the NEW_INFLUENCER's Youtube Shorts account.
 
     :param title: Title of the video that includes the topic.
     :param video_folder: Path to the folder where the video will be saved.
     :param clean_data_original_folder: Path to the clean data folder that contains the images.
+    :param Influencer: Influencer object, to record the script while the LLM writes the rest of the answer (params.LLM_STREAMING).
     """
     
     instructions_video_script_LLM = """
@@ -66,7 +67,8 @@ def get_script_NEW_INFLUENCER(title: str, video_folder: os.path, clean_data_orig
         video_folder=video_folder, 
         title=title, 
         clean_data_folder=clean_data_original_folder, 
-        system_instructions_video_script_LLM=instructions_video_script_LLM
+        system_instructions_video_script_LLM=instructions_video_script_LLM,
+        Influencer=Influencer
     )
 
 